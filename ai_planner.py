@@ -0,0 +1,248 @@
+import gc
+import pickle
+from io import BytesIO
+from operator import attrgetter
+from random import Random
+from concurrent.futures import ProcessPoolExecutor
+from faction import CenterOfGravity
+from faction_type import FactionType
+from location import Location
+
+# Runs the AI factions' turns in two phases. First every faction plans against its own copy of a
+# TurnSnapshot, in a pool of worker processes, so a turn takes about as long as the slowest faction
+# rather than all of them one after another. Then the orders from every plan are committed to the
+# real map one faction at a time, in the same order the factions run in serially.
+#
+# Because every faction plans against the map as it was at the start of the AI phase, factions no
+# longer see the fleets launched by the factions which ran before them that turn, and each one draws
+# from its own random stream (seeded from the game's AI stream), so a seed plays out differently
+# than with serial planning. It plays out the same way for any number of workers.
+#
+# Most of a big map never changes once it's made (the systems' names and positions, the spatial
+# index, the fuel-range graph), so each worker is handed a copy of the whole map once, when the pool
+# starts, and a TurnSnapshot only carries what can change from one turn to the next. A worker only
+# puts back the systems which differ from the snapshot it last planned against, along with those the
+# faction it last planned for could have changed.
+
+# Location and StarMap attributes which are fixed once the map is made, and so aren't in a TurnSnapshot
+LOCATION_STATIC_FIELDS = ["name", "pos", "locationType", "grid_pos", "index", "starfield_seed", "rect"]
+# Location attributes which refer to another system (or None), sent as its index
+LOCATION_REFERENCE_FIELDS = ["rally_target"]
+STAR_MAP_STATIC_FIELDS = ["locations", "grid", "star_names", "spatial_index", "neighbor_offsets", "neighbor_indices",
+                          "neighbor_distances"]
+
+# What a worker keeps from one task to the next: its copy of the map, loaded once when the worker
+# starts (see AIPlanner.start_pool()), and the snapshot last restored on it
+class Worker:
+    def __init__(self, star_map_bytes):
+        self.star_map = pickle.loads(star_map_bytes)
+        # the map lives as long as the worker, so the garbage collector needn't keep looking through it
+        gc.freeze()
+        self.snapshot_number = None
+        self.location_fields = None
+        self.location_states = None
+        # the systems which may have been changed since the snapshot was restored
+        self.changed = []
+
+    # Puts a snapshot on the map, which is then the map planned against
+    def restore(self, snapshot_number, snapshot):
+        locations = self.star_map.locations
+        fields = snapshot.location_fields
+        if snapshot_number != self.snapshot_number:
+            self.snapshot_number = snapshot_number
+            states = pickle.loads(snapshot.location_bytes)
+            if fields != self.location_fields:
+                self.changed = locations
+            else:
+                last_states = self.location_states
+                self.changed = self.changed + [locations[i] for i in range(len(states)) if states[i] != last_states[i]]
+            self.location_fields = fields
+            self.location_states = states
+        for loc in self.changed:
+            state = self.location_states[loc.index]
+            loc.__dict__.update(zip(fields, state))
+            for field, index in zip(LOCATION_REFERENCE_FIELDS, state[len(fields):]):
+                setattr(loc, field, None if index is None else locations[index])
+        self.star_map.__dict__.update(snapshot.star_map_fields)
+        snapshot.star_map = self.star_map
+
+worker = None
+
+def start_worker(star_map_bytes):
+    global worker
+    worker = Worker(star_map_bytes)
+
+# Snapshots are pickled with the map's systems written as their index, and unpickled with those
+# indices turned back in to the systems on the worker's copy of the map
+class SnapshotPickler(pickle.Pickler):
+    def persistent_id(self, obj):
+        if type(obj) is Location:
+            return obj.index
+        return None
+
+class SnapshotUnpickler(pickle.Unpickler):
+    def __init__(self, data, star_map):
+        super().__init__(BytesIO(data))
+        self.locations = star_map.locations
+
+    def persistent_load(self, index):
+        return self.locations[index]
+
+# The parts of a TurnEngine which Faction.run_behavior() reads and which can change from turn to turn,
+# along with the factions themselves. It's pickled once per turn, and every faction's plan starts by
+# restoring it on the worker's copy of the map (see Worker.restore()), so whatever planned on that worker
+# before, each faction plans against the map as it was at the start of the AI phase.
+class TurnSnapshot:
+    def __init__(self, game, factions):
+        star_map = game.star_map
+        locations = star_map.locations
+        self.location_fields = [i for i in filter(lambda x: x not in LOCATION_STATIC_FIELDS and x not in LOCATION_REFERENCE_FIELDS,
+                                                  vars(locations[0]))]
+        # each system's state is its location_fields, followed by the index of each of its references
+        references = [[None if i is None else i.index for i in map(attrgetter(field), locations)] for field in LOCATION_REFERENCE_FIELDS]
+        states = [state + indices for state, indices in zip(map(attrgetter(*self.location_fields), locations), zip(*references))]
+        # the systems are most of a snapshot, and they're quicker to pickle without the persistent ids
+        self.location_bytes = pickle.dumps(states, pickle.HIGHEST_PROTOCOL)
+        self.star_map_fields = {k: v for k, v in vars(star_map).items() if k not in STAR_MAP_STATIC_FIELDS}
+        self.watch_mode = game.watch_mode
+        self.player_reenforcement_pool = game.player_reenforcement_pool
+        self.factions = factions
+        self.star_map = None
+
+    def dumps(self):
+        data = BytesIO()
+        SnapshotPickler(data, pickle.HIGHEST_PROTOCOL).dump(self)
+        return data.getvalue()
+
+# The orders one faction gives while planning, in the order given
+class FactionPlan:
+    def __init__(self, seed):
+        self.rng = Random(seed)
+        self.orders = []
+
+    def deployed(self, source, dest, num_ships, ai_threat_check_flag, pre_waypoints):
+        self.orders.append(("deploy", source, dest, num_ships, ai_threat_check_flag, pre_waypoints))
+
+    def reenforced(self, loc):
+        self.orders.append(("reenforce", loc))
+
+# Plans one faction's turn in a worker. What comes back only refers to systems and fleets by their
+# index on the map, so they can be found again on the real one.
+def plan_faction(snapshot_number, snapshot_bytes, faction_index, seed):
+    star_map = worker.star_map
+    snapshot = SnapshotUnpickler(snapshot_bytes, star_map).load()
+    worker.restore(snapshot_number, snapshot)
+    faction = snapshot.factions[faction_index]
+    faction.game = snapshot
+    owned_fleets = [(index, fleet) for index, fleet in enumerate(star_map.deployed_fleets) if fleet.faction_type == faction.faction_type]
+    waypoints_before = {index: list(fleet.waypoints) for index, fleet in owned_fleets}
+    owned_systems = [i for i in filter(lambda x: x.faction_type == faction.faction_type, star_map.locations)]
+    cached_paths = set(faction.path_trees.keys())
+
+    plan = FactionPlan(seed)
+    faction.run_behavior(plan)
+    # a plan only changes the faction's own systems, and the ones it gave orders to
+    worker.changed = owned_systems + [order[1] for order in plan.orders]
+
+    def indices(locs):
+        if locs is None:
+            return None
+        return [loc.index for loc in locs]
+
+    orders = []
+    for order in plan.orders:
+        if order[0] == "deploy":
+            _, source, dest, num_ships, ai_threat_check_flag, pre_waypoints = order
+            orders.append(("deploy", source.index, dest.index, num_ships, ai_threat_check_flag, indices(pre_waypoints)))
+        else:
+            orders.append(("reenforce", order[1].index))
+    waypoints = [(index, indices(fleet.waypoints)) for index, fleet in owned_fleets if fleet.waypoints != waypoints_before[index]]
+    rallies = [(loc.index, loc.rallying, None if loc.rally_target is None else loc.rally_target.index, loc.rally_amount)
+               for loc in owned_systems]
+    # path trees worked out while planning are kept, so they needn't be worked out again next turn
+    path_trees = []
+    for start_loc, via in faction.path_trees.items():
+        if start_loc not in cached_paths:
+            path_trees.append((start_loc.index, [(loc.index, None if node is None else node.index) for loc, node in via.items()]))
+    return {
+        "orders": orders,
+        "waypoints": waypoints,
+        "rallies": rallies,
+        "centers_of_gravity": [(cog.loc.index, cog.turns) for cog in faction.centers_of_gravity],
+        "path_trees": path_trees,
+    }
+
+class AIPlanner:
+    def __init__(self, workers):
+        self.workers = workers
+        # started by run_turn(), and started again whenever the game's map is replaced (by loading a game)
+        self.pool = None
+        self.star_map = None
+        # tells the workers which snapshot a task is for, so each restores a snapshot in full only once
+        self.snapshots = 0
+
+    # Starts a pool of workers which each load a copy of star_map as they start
+    def start_pool(self, star_map):
+        self.shutdown()
+        self.star_map = star_map
+        star_map_bytes = pickle.dumps(star_map, pickle.HIGHEST_PROTOCOL)
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=start_worker, initargs=(star_map_bytes,))
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    def run_turn(self, game):
+        star_map = game.star_map
+        if star_map is not self.star_map:
+            self.start_pool(star_map)
+        factions = [i for i in filter(lambda x: x.faction_type != FactionType.PLAYER or game.watch_mode, game.ai_factions)]
+        # The systems a faction owns can't change during the AI phase, so the path trees shipped
+        # with the snapshot are brought up to date first, and stay valid while it plans.
+        owned_systems = {}
+        for loc in star_map.locations:
+            if loc.faction_type not in owned_systems:
+                owned_systems[loc.faction_type] = []
+            owned_systems[loc.faction_type].append(loc)
+        for faction in factions:
+            faction.path_cache_check(owned_systems.get(faction.faction_type, []))
+        snapshot_bytes = TurnSnapshot(game, factions).dumps()
+        self.snapshots += 1
+        # fleets are found again by their index in the snapshot, before any new ones are launched
+        fleets = list(star_map.deployed_fleets)
+        futures = []
+        for faction_index in range(len(factions)):
+            futures.append(self.pool.submit(plan_faction, self.snapshots, snapshot_bytes, faction_index, game.rng.ai.getrandbits(64)))
+        for faction, future in zip(factions, futures):
+            self.commit(game, faction, fleets, future.result())
+
+    # Applies a faction's orders to the real map. Orders are carried out in the order they were
+    # given, and if a system no longer has the ships a deployment asked for (or is no longer the
+    # faction's) it sends what it can spare, or nothing. The same plans always commit the same way.
+    def commit(self, game, faction, fleets, plan):
+        star_map = game.star_map
+        locations = star_map.locations
+        for fleet_index, waypoints in plan["waypoints"]:
+            fleets[fleet_index].waypoints = [locations[i] for i in waypoints]
+        for order in plan["orders"]:
+            if order[0] == "deploy":
+                _, source_index, dest_index, num_ships, ai_threat_check_flag, pre_waypoints = order
+                source = locations[source_index]
+                if source.faction_type != faction.faction_type:
+                    continue
+                num_ships = min(num_ships, source.ships - 1)
+                if pre_waypoints is not None:
+                    pre_waypoints = [locations[i] for i in pre_waypoints]
+                star_map.deploy_fleet(source, locations[dest_index], num_ships, ai_threat_check_flag, pre_waypoints)
+            elif game.player_reenforcement_pool > 0:
+                locations[order[1]].ships += 1
+                game.player_reenforcement_pool -= 1
+        for loc_index, rallying, target_index, amount in plan["rallies"]:
+            loc = locations[loc_index]
+            loc.rallying = rallying
+            loc.rally_target = None if target_index is None else locations[target_index]
+            loc.rally_amount = amount
+        faction.centers_of_gravity = [CenterOfGravity(locations[i], turns, game) for i, turns in plan["centers_of_gravity"]]
+        for start_index, via in plan["path_trees"]:
+            faction.path_trees[locations[start_index]] = {locations[i]: None if j is None else locations[j] for i, j in via}
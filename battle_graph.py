@@ -1,14 +1,17 @@
 class BattleGraph: 
     def __init__(self, atk_ships, def_ships):
         self.starting_ships = {"attacker": atk_ships, "defender": def_ships}
-        self.ships_by_side_per_round = [self.starting_ships] # dicts
-        self.outnumber_dice_by_side_per_round = [] # dicts
-        self.brilliancies_by_side_per_round = [] # dicts
-        self.fleet_width_per_round = [] # ints
+        self.record = None # CombatRecord, filled in once the battle is resolved
         self.colors = {}
         self.xp_bonuses = {}
         self.charge = False
         self.last_stand = False
         self.battle_name = None
         self.battle_turn = 0
+
+    # Ships on each side after each round, starting with the ships each side started with
+    def ships_by_side_per_round(self):
+        attackers = [self.starting_ships["attacker"]] + self.record.attackers_remaining
+        defenders = [self.starting_ships["defender"]] + self.record.defenders_remaining
+        return (attackers, defenders)
         
@@ -1,9 +1,39 @@
 import pygame 
 from constants import *
 from faction_type import faction_type_to_color, FactionType
-from random import choice, randrange, randint
-from utility import d10000, d20, d100, coin_flip
-from pygame.math import Vector2
+from utility import d10000
+from text_cache import text_cache
+from math import sqrt
+
+# NumPy is optional. With it, every missile in flight is moved and checked for arrival in one batch a
+# frame; without it the same is worked out in plain Python, a missile at a time.
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# A Surface in the display's pixel format, which is quicker to blit to the screen. Sprites can be made
+# before there's a display (headless benchmarks, for one), in which case they're left as they are.
+def display_format(surface):
+    if pygame.display.get_surface() is None:
+        return surface
+    return surface.convert()
+
+# Every way a frame can be drawn in a battle, as [upscaled][flipped][frame index]: as it is or scaled
+# up 2x, and facing right or flipped to face left. Frames which appear more than once in frames (the
+# invaders repeat theirs) are only baked once.
+def bake_frames(frames):
+    baked = {}
+    variants = [[[], []], [[], []]]
+    for frame in frames:
+        if id(frame) not in baked:
+            upscaled_frame = pygame.transform.scale2x(frame)
+            baked[id(frame)] = [[display_format(frame), display_format(pygame.transform.flip(frame, True, False))],
+                                [display_format(upscaled_frame), display_format(pygame.transform.flip(upscaled_frame, True, False))]]
+        for upscaled in range(2):
+            for flipped in range(2):
+                variants[upscaled][flipped].append(baked[id(frame)][upscaled][flipped])
+    return variants
 
 class MissileSprite: 
     def __init__(self, ):
@@ -20,35 +50,151 @@ class MissileSprite:
             pygame.draw.circle(frame, "red", (20 // 2, 20 // 2), MISSILE_CORE_RADIUS_PX)
             pygame.draw.circle(frame, "white", (20 // 2, 20 // 2), MISSILE_CORE_RADIUS_PX + MISSILE_CORE_PADDING_PX, MISSILE_CORE_PADDING_PX)
             self.frames.append(frame)
+        self.frames = [display_format(i) for i in self.frames]
 
-class MissileObject:
-    def __init__(self, pos, sprite, target_sprite):
-        self.velocity = 0 
-        self.target = target_sprite
-        self.sprite = sprite 
-        self.pos = pos      
-        self.arrived = False
-        self.frames_index = 0
+# Every missile in flight in a battle, kept as an array for each thing about a missile rather than an
+# object per missile: its position, its velocity, the index in targets of the sprite it's homing in on
+# (-1 if it has none), and which of MissileSprite's frames it's showing. Each frame a missile speeds up
+# by a pixel and moves that far straight at where its target is now, and it has arrived once it gets
+# there (one with no target arrives straight away). The arrays are allocated up front and only grow
+# when there are more missiles than they have room for.
+class Missiles:
+    def __init__(self, sprite, targets, capacity=MISSILE_CAPACITY):
+        self.sprite = sprite
+        self.targets = targets
+        self.count = 0
+        if numpy is not None:
+            self.x = numpy.zeros(capacity)
+            self.y = numpy.zeros(capacity)
+            self.velocity = numpy.zeros(capacity)
+            self.target = numpy.full(capacity, -1, dtype=numpy.int64)
+            self.frame = numpy.zeros(capacity, dtype=numpy.int64)
+            self.arrived = numpy.zeros(capacity, dtype=bool)
+        else:
+            self.x = []
+            self.y = []
+            self.velocity = []
+            self.target = []
+            self.frame = []
+            self.arrived = []
 
-    def draw(self, surface):
-        surface.blit(self.sprite.frames[self.frames_index], self.pos)
-        self.frames_index = (self.frames_index + 1) % NUM_PULSE_FRAMES
-        if self.target is not None:
-            if self.target.pos == self.pos:
-                self.target.hit = True  
-                pygame.draw.circle(surface, COLOR_EXPLOSION, self.pos, MISSILE_CORE_RADIUS_PX * 3) 
+    def launch(self, pos, target):
+        target_index = -1 if target is None else target.index
+        if numpy is None:
+            self.x.append(pos[0])
+            self.y.append(pos[1])
+            self.velocity.append(0)
+            self.target.append(target_index)
+            self.frame.append(0)
+            self.arrived.append(False)
+            self.count += 1
+            return
+        if self.count == len(self.x):
+            self.grow()
+        i = self.count
+        self.x[i] = pos[0]
+        self.y[i] = pos[1]
+        self.velocity[i] = 0
+        self.target[i] = target_index
+        self.frame[i] = 0
+        self.arrived[i] = False
+        self.count += 1
+
+    def grow(self):
+        capacity = len(self.x) * 2
+        for name in ["x", "y", "velocity", "target", "frame", "arrived"]:
+            array = getattr(self, name)
+            grown = numpy.zeros(capacity, dtype=array.dtype)
+            grown[:len(array)] = array
+            setattr(self, name, grown)
 
+    # Moves every missile towards its target (the same steps as Vector2.move_towards()), and marks the
+    # ones which have got there as arrived
     def update(self):
-        self.velocity += 1 
-        if self.target is not None:
-            self.pos = Vector2(self.pos).move_towards(self.target.pos, self.velocity)
-        if self.target is None:
-            self.arrived = True 
-        elif self.pos == self.target.pos:
-            self.arrived = True
+        n = self.count
+        if n == 0:
+            return
+        positions = [sprite.pos for sprite in self.targets]
+        if numpy is None:
+            for i in range(n):
+                self.velocity[i] += 1
+                if self.target[i] < 0:
+                    self.arrived[i] = True
+                    continue
+                target_x, target_y = positions[self.target[i]]
+                dx = target_x - self.x[i]
+                dy = target_y - self.y[i]
+                distance = sqrt(dx * dx + dy * dy)
+                if distance <= self.velocity[i]:
+                    self.x[i], self.y[i] = target_x, target_y
+                    self.arrived[i] = True
+                else:
+                    self.x[i] += dx * (self.velocity[i] / distance)
+                    self.y[i] += dy * (self.velocity[i] / distance)
+            return
+        x, y, velocity, target = self.x[:n], self.y[:n], self.velocity[:n], self.target[:n]
+        velocity += 1
+        has_target = target >= 0
+        positions = numpy.array(positions, dtype=numpy.float64).reshape(-1, 2)
+        # a missile with no target is aimed at where it is, which it has already reached
+        target_x = numpy.where(has_target, positions[target, 0], x) if len(positions) > 0 else x
+        target_y = numpy.where(has_target, positions[target, 1], y) if len(positions) > 0 else y
+        dx = target_x - x
+        dy = target_y - y
+        distance = numpy.sqrt(dx * dx + dy * dy)
+        arrived = distance <= velocity
+        step = velocity / numpy.where(arrived, 1, distance)
+        x[:] = numpy.where(arrived, target_x, x + dx * step)
+        y[:] = numpy.where(arrived, target_y, y + dy * step)
+        self.arrived[:n] = arrived
+
+    # Blits the missiles in batches, and blows up the ones which have hit their targets. Each blast is
+    # drawn over the missiles before it and under the ones after, as they always were.
+    def draw(self, surface):
+        n = self.count
+        if n == 0:
+            return
+        if numpy is None:
+            xs = [int(i) for i in self.x]
+            ys = [int(i) for i in self.y]
+            frames = self.frame
+            hits = [i for i in filter(lambda x: self.arrived[x] and self.target[x] >= 0, range(n))]
+        else:
+            xs = self.x[:n].astype(numpy.int64).tolist()
+            ys = self.y[:n].astype(numpy.int64).tolist()
+            frames = self.frame[:n].tolist()
+            hits = numpy.flatnonzero(self.arrived[:n] & (self.target[:n] >= 0)).tolist()
+        sprite_frames = self.sprite.frames
+        start = 0
+        for i in hits:
+            surface.blits([(sprite_frames[frames[j]], (xs[j], ys[j])) for j in range(start, i + 1)], False)
+            start = i + 1
+            self.targets[self.target[i]].hit = True
+            pygame.draw.circle(surface, COLOR_EXPLOSION, (xs[i], ys[i]), MISSILE_CORE_RADIUS_PX * 3)
+        surface.blits([(sprite_frames[frames[j]], (xs[j], ys[j])) for j in range(start, n)], False)
+        if numpy is None:
+            self.frame = [(i + 1) % NUM_PULSE_FRAMES for i in self.frame]
+        else:
+            self.frame[:n] = (self.frame[:n] + 1) % NUM_PULSE_FRAMES
+
+    # Drops the missiles which have arrived
+    def remove_arrived(self):
+        n = self.count
+        if numpy is None:
+            keep = [i for i in filter(lambda x: not self.arrived[x], range(n))]
+            for name in ["x", "y", "velocity", "target", "frame", "arrived"]:
+                array = getattr(self, name)
+                setattr(self, name, [array[i] for i in keep])
+            self.count = len(keep)
+            return
+        keep = ~self.arrived[:n]
+        self.count = int(keep.sum())
+        for name in ["x", "y", "velocity", "target", "frame", "arrived"]:
+            array = getattr(self, name)
+            array[:self.count] = array[:n][keep]
 
 class BattleSprite:  
-    def __init__(self, faction_type, shape):
+    def __init__(self, faction_type, shape, rng):
         self.width = DESTROYER_WIDTH
         if faction_type != FactionType.EXOGALACTIC_INVASION:
             self.length = DESTROYER_LENGTH
@@ -106,36 +252,42 @@ class BattleSprite:
         # Explosion frames 
         self.explosion_frames = [] 
         for frame in range(NUM_EXPLOSION_FRAMES):
-            explosion_frame = choice(self.frames).copy()
+            explosion_frame = rng.choice(self.frames).copy()
             for mark in range(NUM_EXPLOSION_MARKS):
-                x = randrange(0, self.length)
-                y = randrange(0, self.width)
-                radius = randint(1, 2)
-                color = choice([ENGINE_COLOR_1, ENGINE_COLOR_2])
+                x = rng.randrange(0, self.length)
+                y = rng.randrange(0, self.width)
+                radius = rng.randint(1, 2)
+                color = rng.choice([ENGINE_COLOR_1, ENGINE_COLOR_2])
                 pygame.draw.circle(explosion_frame, color, (x, y), radius)
             self.explosion_frames.append(explosion_frame)
+        # Everything Destroyer.draw() blits, made once here rather than on every frame
+        self.baked_frames = bake_frames(self.frames)
+        self.baked_explosion_frames = bake_frames(self.explosion_frames)
 
 class Destroyer: 
-    def __init__(self, battle, sprite, upscaled, pos, faction_type, hit=False, explosion=False, retreating=False):
+    def __init__(self, battle, sprite, upscaled, pos, faction_type, hit=False, explosion=False, retreating=False, value=DESTROYER_VALUE):
         self.pos = pos
         self.faction_type = faction_type
-        self.value = 1
+        # how many ships this sprite stands for
+        self.value = value
         self.explosion = explosion
         self.retreating = retreating
         self.width = DESTROYER_WIDTH
         self.length = DESTROYER_LENGTH
-        self.speed = BASE_TACTICAL_SPEED_PX + randint(0, 1)
+        self.speed = BASE_TACTICAL_SPEED_PX + battle.rng.randint(0, 1)
         self.battle = battle
-        self.move_ticker = randrange(0, 100)
-        self.laser_ticker = randrange(0, DESTROYER_LASER_FREQUENCY)
-        self.missile_ticker = randrange(0, MISSILE_TICKER_COUNT)
+        self.move_ticker = battle.rng.randrange(0, 100)
+        self.laser_ticker = battle.rng.randrange(0, DESTROYER_LASER_FREQUENCY)
+        self.missile_ticker = battle.rng.randrange(0, MISSILE_TICKER_COUNT)
         self.hit = hit
         self.upscaled = upscaled
         self.sprite = sprite
         self.sprite_pos = (self.pos[0] - self.length // 2, self.pos[1] - self.width // 2, self.length, self.width)
-        self.frame_index = randrange(0, len(sprite.frames))
-        self.explosion_frame_index = randrange(0, len(sprite.explosion_frames))
+        self.frame_index = battle.rng.randrange(0, len(sprite.frames))
+        self.explosion_frame_index = battle.rng.randrange(0, len(sprite.explosion_frames))
         self.at_line = False
+        # where it is in its battle's sprites (see TacticalBattle.deploy_sprites())
+        self.index = None
 
     def fire_laser(self, surface):
         ticker_limit = DESTROYER_LASER_FREQUENCY
@@ -151,10 +303,10 @@ class Destroyer:
                 target = None
                 if self.faction_type == self.battle.attacker_faction:
                     if len(self.battle.defender_sprites) > 0:
-                        target = choice(self.battle.defender_sprites)
+                        target = self.battle.rng.choice(self.battle.defender_sprites)
                 elif self.faction_type == self.battle.defender_faction:
                     if len(self.battle.attacker_sprites) > 0:
-                        target = choice(self.battle.attacker_sprites)
+                        target = self.battle.rng.choice(self.battle.attacker_sprites)
                 if target is not None:
                     if not target.explosion:
                         target.hit = True
@@ -168,12 +320,12 @@ class Destroyer:
         self.laser_ticker += 1
 
     def draw(self, surface): 
-        retreat_rounds = self.battle.round >= len(self.battle.rounds) // 2
+        retreat_rounds = self.battle.round >= self.battle.record.num_rounds() // 2
+        # defenders face left, and so do attackers once they've turned to retreat
+        flipped = self.faction_type == self.battle.defender_faction or \
+            (self.faction_type == self.battle.attacker_faction and retreat_rounds and self.battle.retreat)
         if self.explosion: 
-            frame = self.sprite.explosion_frames[self.explosion_frame_index]
-            if self.upscaled:
-                frame = pygame.transform.scale2x(frame)
-            if d10000()[0] <= TACTICAL_BATTLE_CRITICAL_EXPLOSION_CHANCE_OUT_OF_10000:
+            if d10000(rng=self.battle.rng)[0] <= TACTICAL_BATTLE_CRITICAL_EXPLOSION_CHANCE_OUT_OF_10000:
                 radius = EXPLOSION_RADIUS
                 pygame.draw.circle(surface, COLOR_EXPLOSION, self.pos, radius)
                 if self.faction_type == self.battle.attacker_faction:
@@ -181,38 +333,26 @@ class Destroyer:
                 elif self.faction_type == self.battle.defender_faction:
                     self.battle.defender_sprites.remove(self)
             else:
-                if self.faction_type == self.battle.defender_faction:
-                    flipped = pygame.transform.flip(frame, True, False)
-                    surface.blit(flipped, self.sprite_pos)
-                elif self.faction_type == self.battle.attacker_faction and retreat_rounds and self.battle.retreat:
-                    flipped = pygame.transform.flip(frame, True, False)
-                    surface.blit(flipped, self.sprite_pos)
-                else:
-                    surface.blit(frame, self.sprite_pos)
+                frame = self.sprite.baked_explosion_frames[self.upscaled][flipped][self.explosion_frame_index]
+                surface.blit(frame, self.sprite_pos)
                 self.explosion_frame_index = (self.explosion_frame_index + 1) % NUM_EXPLOSION_FRAMES
         else:
-            frame = self.sprite.frames[self.frame_index]
-            if self.upscaled:
-                frame = pygame.transform.scale2x(frame)
-            if self.faction_type == self.battle.defender_faction:
-                flipped = pygame.transform.flip(frame, True, False)
-                surface.blit(flipped, self.sprite_pos)
-            elif retreat_rounds and self.battle.retreat and self.faction_type == self.battle.attacker_faction and not self.explosion:
-                flipped = pygame.transform.flip(frame, True, False)
-                surface.blit(flipped, self.sprite_pos)
-            else:
-                surface.blit(frame, self.sprite_pos)
+            frame = self.sprite.baked_frames[self.upscaled][flipped][self.frame_index]
+            surface.blit(frame, self.sprite_pos)
+            if self.value > 1:
+                label = text_cache.render(str(self.value), TACTICAL_SQUADRON_FONT_SIZE, faction_type_to_color(self.faction_type))
+                surface.blit(label, (self.sprite_pos[0], self.sprite_pos[1] + frame.get_height()))
             if self.faction_type != FactionType.EXOGALACTIC_INVASION:
                 self.frame_index = (self.frame_index + 1) % NUM_ENGINE_FRAMES 
             else:
                 self.frame_index = (self.frame_index + 1) % INVADER_ENGINE_FRAMES_TOTAL 
 
     def move(self): 
-        if self.battle.round == len(self.battle.rounds) // 2:
+        if self.battle.round == self.battle.record.num_rounds() // 2:
             self.speed = 1 
         if self.move_ticker % MOVE_FREQUENCY == 0:
-            retreat_rounds = self.battle.round >= len(self.battle.rounds) // 2
-            end_rounds = self.battle.round >= len(self.battle.rounds)
+            retreat_rounds = self.battle.round >= self.battle.record.num_rounds() // 2
+            end_rounds = self.battle.round >= self.battle.record.num_rounds()
             delta = self.speed
             if self.faction_type == self.battle.defender_faction:
                 delta *= -1
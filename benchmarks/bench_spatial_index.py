@@ -0,0 +1,79 @@
+# Compares StarMap-style location queries through the SpatialIndex against the
+# old linear scans over every location, on synthetic maps of growing size but
+# constant star density (one star per PARTITION_GRID_SIDE cell, as generate_map
+# does). Query cost through the index should stay flat as the star count grows.
+#
+# Run from the repository root with: python -m benchmarks.bench_spatial_index
+
+import argparse
+from random import Random
+from time import perf_counter
+from constants import *
+from spatial_index import SpatialIndex
+
+NUM_FACTIONS = 9
+
+class BenchLocation:
+    def __init__(self, pos, faction_type):
+        self.pos = pos
+        self.faction_type = faction_type
+
+def build_locations(rng, cells_side):
+    locations = []
+    for x in range(cells_side):
+        for y in range(cells_side):
+            pos = (rng.randrange(x * PARTITION_GRID_SIDE, (x + 1) * PARTITION_GRID_SIDE),
+                   rng.randrange(y * PARTITION_GRID_SIDE, (y + 1) * PARTITION_GRID_SIDE))
+            locations.append(BenchLocation(pos, rng.randrange(NUM_FACTIONS)))
+    return locations
+
+def linear_in_range_of(locations, pos, radius_px):
+    radius_squared = radius_px * radius_px
+    return [i for i in filter(lambda x: (x.pos[0] - pos[0]) ** 2 + (x.pos[1] - pos[1]) ** 2 <= radius_squared, locations)]
+
+def linear_nearest(locations, pos, faction_type):
+    closest = None
+    closest_distance_squared = None
+    for loc in locations:
+        if loc.faction_type == faction_type:
+            distance_squared = (loc.pos[0] - pos[0]) ** 2 + (loc.pos[1] - pos[1]) ** 2
+            if closest is None or distance_squared < closest_distance_squared:
+                closest = loc
+                closest_distance_squared = distance_squared
+    return closest
+
+def time_queries(queries, func):
+    start = perf_counter()
+    for query in queries:
+        func(query)
+    return (perf_counter() - start) / len(queries) * 1000000
+
+def run(sizes, num_queries, seed):
+    rows = []
+    for cells_side in sizes:
+        rng = Random(seed)
+        locations = build_locations(rng, cells_side)
+        index = SpatialIndex(PARTITION_GRID_SIDE)
+        for loc in locations:
+            index.insert(loc)
+        side_px = cells_side * PARTITION_GRID_SIDE
+        queries = [((rng.uniform(0, side_px), rng.uniform(0, side_px)), rng.randrange(NUM_FACTIONS)) for _ in range(num_queries)]
+        radius_px = DEFAULT_FUEL_RANGE_LY * LY
+        rows.append({
+            "stars": len(locations),
+            "range_index_us": time_queries(queries, lambda q: index.in_range_of(q[0], radius_px)),
+            "range_linear_us": time_queries(queries, lambda q: linear_in_range_of(locations, q[0], radius_px)),
+            "nearest_index_us": time_queries(queries, lambda q: index.nearest(q[0], lambda x: x.faction_type == q[1])),
+            "nearest_linear_us": time_queries(queries, lambda q: linear_nearest(locations, q[0], q[1])),
+        })
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks SpatialIndex queries against linear scans.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 20, 40, 80, 160], help="map sides, in grid cells")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=34)
+    args = parser.parse_args()
+    print("{:>8} {:>12} {:>12} {:>12} {:>12}   (microseconds per query)".format("stars", "range/index", "range/scan", "near/index", "near/scan"))
+    for row in run(args.sizes, args.queries, args.seed):
+        print("{:>8} {:>12.1f} {:>12.1f} {:>12.1f} {:>12.1f}".format(row["stars"], row["range_index_us"], row["range_linear_us"], row["nearest_index_us"], row["nearest_linear_us"]))
@@ -0,0 +1,239 @@
+# Times the expensive parts of the game with fixed seeds, so that the numbers can be compared from one
+# version to the next: StarMap construction, one AI turn for each Faction, the whole AI phase (serial and
+# in parallel), combat at several stack sizes, a full draw_display(), and a frame of tactical mode.
+# Everything but map construction is measured at a few stages of a game (after so many turns of watch
+# mode), as the map fills up with fleets over time. map_scaling times building, playing and drawing maps
+# of several sizes, for the curve of how the game scales with the number of stars.
+# Results are written as JSON.
+#
+# Run from the repository root with: python -m benchmarks.suite --output results.json
+# It uses SDL's dummy video driver unless SDL_VIDEODRIVER is already set, so no window is opened.
+
+import argparse
+import json
+import os
+import platform
+from time import perf_counter
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+# keeps pygame's greeting out of JSON written to stdout
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import pygame
+from constants import *
+from star_map import StarMap, map_size_for_stars
+from turn_engine import TurnEngine
+from fleet import Fleet
+from faction_type import FactionType, ai_empire_faction_types
+from combat_resolver import numpy
+from rng import GameRandom
+
+def timed(func):
+    start = perf_counter()
+    func()
+    return perf_counter() - start
+
+def result(benchmark, params, seed, samples):
+    return {
+        "benchmark": benchmark,
+        "params": params,
+        "seed": seed,
+        "samples": len(samples),
+        "mean_seconds": sum(samples) / len(samples),
+        "min_seconds": min(samples),
+        "max_seconds": max(samples),
+    }
+
+# A game with the player's empire in watch mode, played on for `stage` turns
+def game_at_stage(game_class, seed, stage, map_size=(MAP_WIDTH_PX, MAP_HEIGHT_PX)):
+    game = game_class(seed=seed, map_size=map_size)
+    game.set_watch_mode(True)
+    game.run(stage)
+    return game
+
+def bench_star_map(seeds, repeats):
+    results = []
+    for seed in seeds:
+        samples = []
+        star_maps = []
+        for repeat in range(repeats):
+            rng = GameRandom(seed + repeat)
+            samples.append(timed(lambda: star_maps.append(StarMap(False, rng.map))))
+        results.append(result("star_map", {"stars": len(star_maps[0].locations)}, seed, samples))
+    return results
+
+def bench_ai_turns(seeds, stages):
+    results = []
+    for seed in seeds:
+        for stage in stages:
+            game = game_at_stage(TurnEngine, seed, stage)
+            for faction in game.ai_factions:
+                sample = timed(faction.run_behavior)
+                results.append(result("ai_turn", {"stage": stage, "faction": faction.name, "personality": faction.personality.name}, seed, [sample]))
+    return results
+
+# The whole AI phase of a turn, planned serially (0 workers) or in a pool of worker processes, on
+# maps of about so many stars (None for the standard map). The first call starts the pool, and isn't
+# counted. Parallel planning only pays off with a core per worker, so compare "cpus" in the report.
+def bench_ai_phase(seeds, stages, worker_counts, star_counts):
+    results = []
+    for seed in seeds:
+        for num_stars in star_counts:
+            map_size = (MAP_WIDTH_PX, MAP_HEIGHT_PX) if num_stars is None else map_size_for_stars(num_stars)
+            for stage in stages:
+                for workers in worker_counts:
+                    game = game_at_stage(TurnEngine, seed, stage, map_size)
+                    game.set_ai_workers(workers)
+                    game.run_ai_behavior()
+                    sample = timed(game.run_ai_behavior)
+                    game.set_ai_workers(0)
+                    params = {"stars": game.star_map.num_stars, "stage": stage, "workers": workers}
+                    results.append(result("ai_phase", params, seed, [sample]))
+    return results
+
+# Stages a battle between two AI empires on a fresh map and resolves it through
+# TurnEngine.resolve_fleet_arrivals(), the same way as one happening in a game.
+def bench_combat(seeds, stack_sizes, repeats):
+    results = []
+    for seed in seeds:
+        for attackers, defenders in stack_sizes:
+            engine = TurnEngine(seed=seed)
+            attacker_faction, defender_faction = ai_empire_faction_types[0], ai_empire_faction_types[1]
+            loc = engine.star_map.locations[0]
+            samples = []
+            # the first battle is a warm-up, and isn't counted
+            for repeat in range(repeats + 1):
+                loc.faction_type = defender_faction
+                loc.ships = defenders
+                fleet = Fleet("Benchmark", loc.pos, attacker_faction, attackers, loc, 0)
+                fleet.waypoints.append(loc)
+                engine.star_map.deployed_fleets = [fleet]
+                sample = timed(engine.resolve_fleet_arrivals)
+                if repeat > 0:
+                    samples.append(sample)
+            results.append(result("combat", {"attackers": attackers, "defenders": defenders}, seed, samples))
+    return results
+
+def bench_draw_display(seeds, stages, frames):
+    from sector34 import Game
+    results = []
+    for seed in seeds:
+        for stage in stages:
+            game = game_at_stage(Game, seed, stage)
+            game.tactical_battles = []
+            game.game_loop(max_frames=0)
+            samples = []
+            for _ in range(frames):
+                game.display_changed = True
+                samples.append(timed(game.draw_display))
+            results.append(result("draw_display", {"stage": stage}, seed, samples))
+    return results
+
+# Building a map of about so many stars, playing turns of watch mode on it, and drawing it while
+# the view scrolls across it. Turns are timed from the start of the game.
+def bench_map_scaling(seeds, star_counts, turns, frames):
+    from sector34 import Game
+    results = []
+    for seed in seeds:
+        for num_stars in star_counts:
+            games = []
+            build = timed(lambda: games.append(Game(seed=seed, map_size=map_size_for_stars(num_stars))))
+            game = games[0]
+            params = {"stars": game.star_map.num_stars, "width_px": game.star_map.width_px, "height_px": game.star_map.height_px}
+            game.set_watch_mode(True)
+            turn_samples = [timed(game.advance_turn) for _ in range(turns)]
+            game.tactical_battles = []
+            game.game_loop(max_frames=0)
+            draw_samples = []
+            for _ in range(frames):
+                game.move_camera_to(game.camera[0] + CAMERA_SCROLL_PX, game.camera[1])
+                game.display_changed = True
+                draw_samples.append(timed(game.draw_display))
+            results.append(result("map_scaling_build", params, seed, [build]))
+            results.append(result("map_scaling_turn", params, seed, turn_samples))
+            results.append(result("map_scaling_draw", params, seed, draw_samples))
+    return results
+
+# The first frame of a battle deploys its sprites, so it's reported apart from the rest
+def bench_tactical_frame(seeds, stack_sizes, frames):
+    from sector34 import Game
+    from tactical_battles import TacticalBattle
+    from combat_resolver import resolve_combat
+    results = []
+    for seed in seeds:
+        game = Game(seed=seed)
+        game.game_loop(max_frames=0)
+        loc = [i for i in filter(lambda x: x.faction_type is not None and x.faction_type != FactionType.PLAYER, game.star_map.locations)][0]
+        for attackers, defenders in stack_sizes:
+            fleet = Fleet("Benchmark", loc.pos, FactionType.PLAYER, attackers, loc, 0)
+            battle = TacticalBattle(fleet, loc, FactionType.PLAYER, loc.faction_type, attackers, defenders, game.rng.cosmetic)
+            battle.battle_number = 0
+            battle.attacker_vet_bonus = 0
+            battle.defender_vet_bonus = 0
+            battle.record = resolve_combat(attackers, defenders, 0, 0, False, lambda: False, game.rng.combat, True)
+            battle.retreat = battle.record.retreat
+            battle.winner = FactionType.PLAYER if battle.record.defenders() <= 0 else loc.faction_type
+            game.tactical_battles = [battle]
+            game.tactical_battle_ticker = 0
+            game.tactical_battle_over = False
+            first = timed(game.tactical_mode)
+            samples = []
+            while len(samples) < frames and len(game.tactical_battles) > 0:
+                samples.append(timed(game.tactical_mode))
+            params = {"attackers": attackers, "defenders": defenders}
+            results.append(result("tactical_first_frame", params, seed, [first]))
+            results.append(result("tactical_frame", params, seed, samples))
+    return results
+
+def stack_size(text):
+    attackers, defenders = text.split("x")
+    return (int(attackers), int(defenders))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Times map generation, AI turns, combat and rendering with fixed seeds.")
+    parser.add_argument("--seeds", type=int, nargs="+", default=[34, 35, 36])
+    parser.add_argument("--stages", type=int, nargs="+", default=[0, 50, 150], help="turns of watch mode played before measuring")
+    parser.add_argument("--stacks", type=stack_size, nargs="+", default=[(10, 10), (100, 100), (1000, 1000), (5000, 3000)],
+                        help="combat stack sizes, as ATTACKERSxDEFENDERS")
+    parser.add_argument("--tactical-stacks", type=stack_size, nargs="+", default=[(20, 20), (200, 150), (2000, 2000)])
+    parser.add_argument("--ai-workers", type=int, nargs="+", default=[0, 2], help="worker processes to time the AI phase with")
+    parser.add_argument("--ai-phase-stars", type=int, nargs="+", default=[None], help="map sizes for ai_phase, in stars (default: the standard map)")
+    parser.add_argument("--map-stars", type=int, nargs="+", default=[140, 1000, 5000, 10000], help="map sizes for map_scaling, in stars")
+    parser.add_argument("--map-turns", type=int, default=10, help="turns played on each map_scaling map")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--frames", type=int, default=30)
+    parser.add_argument("--only", nargs="+", choices=["star_map", "ai_turn", "ai_phase", "combat", "draw_display", "tactical_frame", "map_scaling"])
+    parser.add_argument("--output", default=None, help="where to write the JSON results (default: stdout)")
+    args = parser.parse_args()
+
+    pygame.init()
+    pygame.display.set_mode((SCREEN_WIDTH_PX, SCREEN_HEIGHT_PX))
+    benchmarks = {
+        "star_map": lambda: bench_star_map(args.seeds, args.repeats),
+        "ai_turn": lambda: bench_ai_turns(args.seeds, args.stages),
+        "ai_phase": lambda: bench_ai_phase(args.seeds, args.stages, args.ai_workers, args.ai_phase_stars),
+        "combat": lambda: bench_combat(args.seeds, args.stacks, args.repeats),
+        "draw_display": lambda: bench_draw_display(args.seeds, args.stages, args.frames),
+        "tactical_frame": lambda: bench_tactical_frame(args.seeds, args.tactical_stacks, args.frames),
+        "map_scaling": lambda: bench_map_scaling(args.seeds, args.map_stars, args.map_turns, args.frames),
+    }
+    results = []
+    for name, bench in benchmarks.items():
+        if args.only is None or name in args.only:
+            results += bench()
+    report = {
+        "version": VERSION,
+        "python": platform.python_version(),
+        "pygame": pygame.version.ver,
+        "numpy": None if numpy is None else numpy.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "results": results,
+    }
+    if args.output is None:
+        print(json.dumps(report, indent=2))
+    else:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        for row in results:
+            print("{:<22} {:<60} {:>10.3f} ms".format(row["benchmark"], json.dumps(row["params"]), row["mean_seconds"] * 1000))
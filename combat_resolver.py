@@ -0,0 +1,202 @@
+from constants import *
+from utility import d20, d100
+
+# NumPy is optional. With it, big battles have their dice drawn, sorted and compared a whole block of
+# rounds at a time; without it (and for small battles, where it wouldn't pay off) they're rolled a round
+# at a time in plain Python, as they always were.
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# The two roll different dice for the same seed, and NumPy's own dice may change from version to version,
+# so which a game rolls with is part of the game (see TurnEngine.combat_numpy). This is the NumPy version
+# big battles are rolled with here, or None if they're rolled a round at a time.
+NUMPY_VERSION = None if numpy is None else numpy.__version__
+
+def combat_dice_name(numpy_version):
+    return "plain Python" if numpy_version is None else "NumPy {}".format(numpy_version)
+
+# Returns the dice a game which was rolling with numpy_version can roll with here: the same ones if they
+# can be, and otherwise the ones here, along with a warning that the game won't play out as it would have
+def combat_dice_for(numpy_version):
+    if numpy_version is None or numpy_version == NUMPY_VERSION:
+        return numpy_version, None
+    warning = "This game's battles were rolled with {}, which isn't installed here. They'll be rolled with {}, so the game won't play out as it would have.".format(
+        combat_dice_name(numpy_version), combat_dice_name(NUMPY_VERSION))
+    return NUMPY_VERSION, warning
+
+# What happened in each round of a battle, kept as one flat list per quantity rather than a dict per
+# round. BattleGraph and TacticalBattle both read from this. The rolls (already sorted, with bonuses,
+# one pair of dice per ship lost) are only kept when asked for, as only battles the player watches show them.
+class CombatRecord:
+    def __init__(self, attackers, defenders, attacker_bonus, defender_bonus, keep_rolls):
+        self.starting_attackers = attackers
+        self.starting_defenders = defenders
+        self.attacker_bonus = attacker_bonus
+        self.defender_bonus = defender_bonus
+        self.keep_rolls = keep_rolls
+        self.attacker_losses = []
+        self.defender_losses = []
+        self.attackers_remaining = []
+        self.defenders_remaining = []
+        self.fleet_widths = []
+        self.attacker_bonus_dice = []
+        self.defender_bonus_dice = []
+        self.attacker_brilliancies = []
+        self.defender_brilliancies = []
+        self.attacker_rolls = []
+        self.defender_rolls = []
+        self.retreat = False
+
+    def num_rounds(self):
+        return len(self.attacker_losses)
+
+    def attackers(self):
+        if self.num_rounds() == 0:
+            return self.starting_attackers
+        return self.attackers_remaining[-1]
+
+    def defenders(self):
+        if self.num_rounds() == 0:
+            return self.starting_defenders
+        return self.defenders_remaining[-1]
+
+    def total_attacker_losses(self):
+        return self.starting_attackers - self.attackers()
+
+    def total_defender_losses(self):
+        return self.starting_defenders - self.defenders()
+
+    def push_round(self, attacker_losses, defender_losses, attackers_width, defenders_width, brilliancies):
+        measure_width = min(attackers_width, defenders_width)
+        self.attackers_remaining.append(self.attackers() - attacker_losses)
+        self.defenders_remaining.append(self.defenders() - defender_losses)
+        self.attacker_losses.append(attacker_losses)
+        self.defender_losses.append(defender_losses)
+        self.fleet_widths.append(measure_width)
+        self.attacker_bonus_dice.append(attackers_width - measure_width)
+        self.defender_bonus_dice.append(defenders_width - measure_width)
+        self.attacker_brilliancies.append(brilliancies[0])
+        self.defender_brilliancies.append(brilliancies[1])
+
+def get_outnumber_margin(more, less):
+    outnumber_margin = 0
+    count = 1
+    while True:
+        if more >= less * BASE_OUTNUMBER_MARGIN * count:
+            outnumber_margin += 1
+            count += 1
+        else:
+            break
+    return outnumber_margin
+
+def fleet_widths(attackers, defenders):
+    default_width = min((attackers + defenders) // FLEET_WIDTH_DIVISOR, FLEET_WIDTH_MAX)
+    if default_width < DEFAULT_FLEET_WIDTH:
+        default_width = DEFAULT_FLEET_WIDTH
+    if attackers > defenders:
+        outnumber_margin = get_outnumber_margin(attackers, defenders)
+        attackers_width = default_width + outnumber_margin
+        defenders_width = default_width
+    elif attackers < defenders:
+        outnumber_margin = get_outnumber_margin(defenders, attackers)
+        attackers_width = default_width
+        defenders_width = default_width + outnumber_margin
+    else:
+        attackers_width = default_width
+        defenders_width = default_width
+    if attackers < DEFAULT_FLEET_WIDTH:
+        attackers_width = attackers
+    if defenders < DEFAULT_FLEET_WIDTH:
+        defenders_width = defenders
+    return (attackers_width, defenders_width)
+
+def might_retreat(rounds, attackers, defenders, charge):
+    return rounds > 1 and attackers > 0 and not charge and attackers < defenders
+
+def retreat_chance_out_of_100(attackers, defenders):
+    outnumber_margin = get_outnumber_margin(defenders, attackers)
+    return min(DEFAULT_RETREAT_CHANCE_OUT_OF_100 * outnumber_margin, DEFAULT_RETREAT_CHANCE_HARD_CAP)
+
+# Fights a battle out to the end, or until the attackers retreat, and returns its CombatRecord.
+# The bonuses passed in are the ones which hold for every round (charge, last stand, veterancy);
+# brilliancies are rolled per round. can_retreat() is only called if a retreat is rolled. Dice are
+# rolled with rng, the game's combat stream, and big battles are only batched if batched is True.
+def resolve_combat(attackers, defenders, attacker_bonus, defender_bonus, charge, can_retreat, rng, keep_rolls=False,
+                   batched=NUMPY_VERSION is not None):
+    record = CombatRecord(attackers, defenders, attacker_bonus, defender_bonus, keep_rolls)
+    if batched and attackers + defenders >= COMBAT_BATCH_MIN_SHIPS:
+        resolve_combat_batched(record, charge, can_retreat, rng)
+    else:
+        resolve_combat_by_round(record, charge, can_retreat, rng)
+    return record
+
+def resolve_combat_by_round(record, charge, can_retreat, rng):
+    attackers = record.starting_attackers
+    defenders = record.starting_defenders
+    rounds = 1
+    while True:
+        brilliancies = (d100(rng=rng)[0] <= BRILLIANCY_CHANCE_OUT_OF_100, d100(rng=rng)[0] <= BRILLIANCY_CHANCE_OUT_OF_100)
+        if attackers <= 0 or defenders <= 0:
+            break
+        attacker_bonus = record.attacker_bonus + BRILLIANCY_BONUS * brilliancies[0]
+        defender_bonus = record.defender_bonus + BRILLIANCY_BONUS * brilliancies[1]
+        attackers_width, defenders_width = fleet_widths(attackers, defenders)
+        measure_width = min(attackers_width, defenders_width)
+        attackers_roll = d20(num_dice=attackers_width, bonus=attacker_bonus, rng=rng)[:measure_width]
+        defenders_roll = d20(num_dice=defenders_width, bonus=defender_bonus, rng=rng)[:measure_width]
+        # defenders win ties
+        defender_losses = sum(1 for die in range(measure_width) if attackers_roll[die] > defenders_roll[die])
+        attacker_losses = measure_width - defender_losses
+        attackers -= attacker_losses
+        defenders -= defender_losses
+        record.push_round(attacker_losses, defender_losses, attackers_width, defenders_width, brilliancies)
+        if record.keep_rolls:
+            record.attacker_rolls.append(attackers_roll)
+            record.defender_rolls.append(defenders_roll)
+        if might_retreat(rounds, attackers, defenders, charge):
+            if d100(rng=rng)[0] <= retreat_chance_out_of_100(attackers, defenders) and can_retreat():
+                record.retreat = True
+                break
+        rounds += 1
+
+# Fleet widths only change every so often as a battle wears on, so while they hold, the dice for a block
+# of rounds are drawn and compared in one go. The block is cut short at the first round where the widths
+# would have changed, the battle ended, or the attackers retreated, and the unused rolls are thrown away.
+def resolve_combat_batched(record, charge, can_retreat, rng):
+    generator = numpy.random.default_rng(rng.getrandbits(64))
+    attackers = record.starting_attackers
+    defenders = record.starting_defenders
+    rounds = 1
+    while attackers > 0 and defenders > 0:
+        attackers_width, defenders_width = fleet_widths(attackers, defenders)
+        measure_width = min(attackers_width, defenders_width)
+        block = min(max(min(attackers, defenders) // measure_width, 1), COMBAT_BATCH_MAX_ROUNDS)
+        brilliancies = generator.integers(1, 101, size=(block, 2)) <= BRILLIANCY_CHANCE_OUT_OF_100
+        attacker_bonuses = record.attacker_bonus + BRILLIANCY_BONUS * brilliancies[:, 0]
+        defender_bonuses = record.defender_bonus + BRILLIANCY_BONUS * brilliancies[:, 1]
+        # each side's best measure_width dice, highest first, as in d20()
+        attackers_rolls = numpy.sort(generator.integers(1, 21, size=(block, attackers_width)), axis=1)[:, ::-1][:, :measure_width]
+        defenders_rolls = numpy.sort(generator.integers(1, 21, size=(block, defenders_width)), axis=1)[:, ::-1][:, :measure_width]
+        attackers_rolls = attackers_rolls + attacker_bonuses[:, None]
+        defenders_rolls = defenders_rolls + defender_bonuses[:, None]
+        # defenders win ties
+        defender_losses = (attackers_rolls > defenders_rolls).sum(axis=1).tolist()
+        retreat_rolls = generator.integers(1, 101, size=block).tolist()
+        brilliancies = brilliancies.tolist()
+        for i in range(block):
+            if i > 0 and (attackers <= 0 or defenders <= 0 or fleet_widths(attackers, defenders) != (attackers_width, defenders_width)):
+                break
+            attacker_losses = measure_width - defender_losses[i]
+            attackers -= attacker_losses
+            defenders -= defender_losses[i]
+            record.push_round(attacker_losses, defender_losses[i], attackers_width, defenders_width, brilliancies[i])
+            if record.keep_rolls:
+                record.attacker_rolls.append(attackers_rolls[i].tolist())
+                record.defender_rolls.append(defenders_rolls[i].tolist())
+            if might_retreat(rounds, attackers, defenders, charge):
+                if retreat_rolls[i] <= retreat_chance_out_of_100(attackers, defenders) and can_retreat():
+                    record.retreat = True
+                    return
+            rounds += 1
@@ -13,8 +13,11 @@ SCREEN_HEIGHT_PX = 720
 
 FPS = 24
 
+# The size of the view of the map, and of the standard map. Bigger maps scroll
+# under the view, CAMERA_SCROLL_PX a frame.
 MAP_WIDTH_PX = 800
 MAP_HEIGHT_PX = 600
+CAMERA_SCROLL_PX = 16
 
 HUD_WIDTH_PX = 300
 HUD_HEIGHT_PX = 600
@@ -50,11 +53,22 @@ GAME_OVER_SPLASH_FONT_SIZE = 18
 VICTORY_SPLASH_FONT_SIZE = 16
 LOADING_SCREEN_FONT_SIZE = 40
 POLITICAL_MAP_FONT_SIZE = 9
+TACTICAL_SQUADRON_FONT_SIZE = 10
+
+# The turn profiler overlay (Ctrl + Shift + P)
+PROFILER_FONT_SIZE = 12
+
+# The progress bar shown while a turn is being run
+PROCESSING_BAR_WIDTH_PX = 200
+# How often, in seconds, the thread running a turn lets the window have a go (see Game)
+TURN_THREAD_SWITCH_INTERVAL = 0.0005
 
 # The chance to spice up the stock names
 # with prefixes and suffixes
 SYSTEM_PREFIX_CHANCE_OUT_OF_100 = 1
 SYSTEM_SECONDARY_CHANCE_OUT_OF_100 = 5
+# tries at a name nobody has before falling back to catalogue numbers (see StarMap.name_a_star_system())
+SYSTEM_NAME_ATTEMPTS = 1000
 
 # NOTE: Reenforcements happen automatically, based on
 # on the reenforce_chance_out_of_100 of a given
@@ -106,6 +120,11 @@ CHARGE_D20_BONUS = 1
 #       gives a bonus to that side's d20 rolls.
 BRILLIANCY_CHANCE_OUT_OF_100 = 5
 BRILLIANCY_BONUS = 3
+# NOTE: Battles with at least this many ships between both sides have
+#       their dice rolled in blocks of up to COMBAT_BATCH_MAX_ROUNDS
+#       rounds at a time, if NumPy is available.
+COMBAT_BATCH_MIN_SHIPS = 200
+COMBAT_BATCH_MAX_ROUNDS = 256
 
 # NOTE: All distances calculated ultimately based on pixel distance,
 #       where 30px == 4 LY. Will take a slightly different
@@ -129,6 +148,8 @@ LOC_HOVER_MIN_REL_PX = (STAR_MIN_DISTANCE_LY * LY) // 2
 DEFAULT_MIN_SENSOR_RANGE_LY = 7
 DEFAULT_MAX_SENSOR_RANGE_LY = 28
 DEFAULT_HW_SENSOR_RANGE_LY = 42
+# the furthest any system can see, for range queries
+MAX_SENSOR_RANGE_LY = max(DEFAULT_MAX_SENSOR_RANGE_LY, DEFAULT_HW_SENSOR_RANGE_LY)
 
 # Fleets enjoy very good sensor coverage once they are in
 # deep space; better than most systems in the game. This
@@ -240,16 +261,29 @@ COLOR_ALPHA_KEY = (249, 249, 249)
 PURPLE_OR_BLUE_STAR_CHANCE_OUT_OF_100 = 1 
 WHITE_STAR_CHANCE_OUT_OF_100 = 10
 
+# Saved games (see save_game.py). SAVE_FORMAT_VERSION goes up whenever what's saved changes.
+SAVE_GAME_PATH = "sector34.sav"
+SAVE_FORMAT_VERSION = 2
+SAVE_COMPRESSION_LEVEL = 1
+
 # Tactical battle stuff
 ENGINE_COLOR_1 = (255, 0, 255) 
 ENGINE_COLOR_2 = (155, 0, 155) 
 TACTICAL_BATTLE_RATE = 60
 TACTICAL_BATTLE_COOLDOWN = 6
 STARFIELD_DENSITY = .0005
+# Starfields are generated lazily and kept in an LRU cache up to roughly this many bytes (each is a
+# full-screen Surface, about 3MB at 1100x720).
+STARFIELD_CACHE_MAX_BYTES = 48 * 1024 * 1024
+# Rendered text is kept in an LRU cache of up to this many Surfaces (see text_cache.py).
+TEXT_CACHE_MAX_ENTRIES = 4000
 TACTICAL_SCREEN_PADDING_PX = 60
 BASE_TACTICAL_SPEED_PX = 1
 MOVE_FREQUENCY = 50
 DESTROYER_VALUE = 1
+# Tactical battles with more ships than this in all are shown with each sprite standing for a squadron
+# of ships, so that there are never many more sprites than this on screen
+TACTICAL_SQUADRON_SHIP_COUNT = 500
 DESTROYER_WIDTH = 12
 DESTROYER_LENGTH = DESTROYER_WIDTH * 2
 DESTROYER_UPSCALE_CHANCE_OUT_OF_100 = 8 
@@ -265,6 +299,8 @@ MISSILE_CORE_RADIUS_PX = 3
 MISSILE_CORE_PADDING_PX = 1
 MISSILE_TICKER_COUNT = 9000  
 MISSILE_VOLLEY_TICKER_COOUNT = 600
+# room for this many missiles in flight is allocated up front in each battle, and doubled as needed
+MISSILE_CAPACITY = 256
 NUM_EXPLOSION_FRAMES = 12
 NUM_EXPLOSION_MARKS = 7 
 LASER_WIDTH = 3
@@ -322,8 +358,16 @@ COALITION_TRIGGER_PERCENT = 50
 
 # Debug mode stuff
 WATCH_TIMER_RATE = 60
+# Turbo watch mode runs turns back to back for up to TURBO_WATCH_FRAME_BUDGET_MS of each frame, and only
+# redraws the map every TURBO_WATCH_REDRAW_FRAMES frames
+TURBO_WATCH_FRAME_BUDGET_MS = 30
+TURBO_WATCH_REDRAW_FRAMES = 6
 PLAYER_DEBUG_MODE_SHIPS = 500
 AI_EMPIRE_DEBUG_MODE_SHIPS = 10
 PIRATE_DEBUG_MODE_SHIPS = 1
 NON_SPACEFARING_DEBUG_MODE_SHIPS = 1
 
+
+# Personality tournaments (see tournament.py)
+TOURNAMENT_UNIFORM_STARTING_SHIPS = 20
+TOURNAMENT_MAX_TURNS = 1500
@@ -1,14 +1,14 @@
-from constants import *
 from faction_type import FactionType, faction_type_to_color
-from random import shuffle, randrange, randint, choice
 from fleet import Fleet
 from utility import d100, coin_flip
+from collections import deque
+from faction_view import FactionView
 
 class CenterOfGravity:
     def __init__(self, loc, turns, game):
         self.loc = loc
         self.turns = turns
-        self.nodes = [i for i in filter(lambda x: x.ly_to(loc.pos) <= DEFAULT_FUEL_RANGE_LY, game.star_map.locations)]
+        self.nodes = game.star_map.systems_in_range_of(loc)
 
 class Faction: 
     def __init__(self, faction_type, game, personality):
@@ -18,10 +18,20 @@ class Faction:
         if faction_type == FactionType.PLAYER:
             self.homeworld = game.star_map.player_hw
         elif faction_type != FactionType.EXOGALACTIC_INVASION:
-            self.homeworld = [i for i in filter(lambda x: x.faction_type == faction_type, game.star_map.faction_homeworlds)][0]
+            # None once it has been lost (a saved game can be loaded after that)
+            homeworlds = [i for i in filter(lambda x: x.faction_type == faction_type, game.star_map.faction_homeworlds)]
+            self.homeworld = homeworlds[0] if len(homeworlds) > 0 else None
         self.name = game.star_map.faction_names[faction_type]
         self.personality = personality
         self.centers_of_gravity = []
+        self.path_trees = {}
+        self.path_cache_owned_systems = frozenset()
+
+    # Factions are pickled without their game, to be planned against a TurnSnapshot (see ai_planner.py)
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["game"] = None
+        return state
 
     def pp(self):
         print("AI Faction Pretty-Print")
@@ -31,73 +41,65 @@ class Faction:
         print("\tpersonality: {}".format(self.personality.name))
 
     # Gets the shortest path from start_loc to end_loc which doesn't run through a 
-    # system controlled by another faction.
+    # system controlled by another faction. The path excludes start_loc and ends
+    # with end_loc, or is None if there isn't one.
     def shortest_uncontested_path(self, start_loc, end_loc):  
-
-        def get_traceback(seen): 
-            current = seen[-1]  
-            traceback = [current["loc"]]
-            seen.reverse()
-            while current["loc"] is not start_loc:
-                for node in seen:
-                    if node["loc"] is current["via"]:
-                        if node["loc"] is not start_loc:
-                            traceback.append(node["loc"])
-                        current = node
-            traceback.reverse()
-            return traceback 
-
-        seen = [{"loc": start_loc, "via": None}]
-        while True:  
-            hits = False
-            for node in seen:
-                for loc in self.game.star_map.locations:
-                    in_range = loc.ly_to(node["loc"].pos) <= DEFAULT_FUEL_RANGE_LY
-                    is_child_node = node["loc"] is not loc
-                    owned = loc.faction_type == self.faction_type
-                    not_seen = loc not in [i for i in map(lambda x: x["loc"], seen)]
-                    if in_range and is_child_node and owned and not_seen:
-                        new_node = {"loc": loc, "via": node["loc"]}
-                        seen.append(new_node)
-                        hits = True
-                        if loc is end_loc:
-                            return get_traceback(seen)
-            if not hits:
-                break
-        return None
+        if start_loc not in self.path_trees:
+            self.path_trees[start_loc] = self.uncontested_path_tree(start_loc)
+        via = self.path_trees[start_loc]
+        if end_loc is start_loc or end_loc not in via:
+            return None
+        path = [end_loc]
+        while via[path[-1]] is not start_loc:
+            path.append(via[path[-1]])
+        path.reverse()
+        return path
+
+    # Breadth-first search outwards from start_loc over the faction's own systems.
+    # Returns a dict of every system reached to the system it was reached from.
+    def uncontested_path_tree(self, start_loc):
+        star_map = self.game.star_map
+        via = {start_loc: None}
+        frontier = deque([start_loc])
+        while len(frontier) > 0:
+            node = frontier.popleft()
+            for loc in star_map.neighbors_of(node):
+                if loc.faction_type == self.faction_type and loc not in via:
+                    via[loc] = node
+                    frontier.append(loc)
+        return via
+
+    # Paths only depend on which systems the faction owns, so the cached path
+    # trees are kept until a system is gained or lost.
+    def path_cache_check(self, owned_systems):
+        owned = frozenset(owned_systems)
+        if owned != self.path_cache_owned_systems:
+            self.path_trees = {}
+            self.path_cache_owned_systems = owned
  
-    def run_behavior(self):
+    def run_behavior(self, plan=None):
         # This function handles all of the logic and action of AI Empire factions,
-        # on a turn-by-turn basis.
+        # on a turn-by-turn basis. When planning against a TurnSnapshot (see ai_planner.py),
+        # plan records the orders given and supplies the random stream.
         game = self.game
         if self.faction_type == FactionType.PLAYER and not game.watch_mode:
             return
         star_map = game.star_map
+        if plan is None:
+            rng = game.rng.ai
+        else:
+            rng = plan.rng
 
         launched_attacks = 0
         activated_reserves = 0
         activated_direct_reserves = 0
 
         def will_attack():
-            return d100()[0] <= self.personality.base_attack_chance
+            return d100(rng=rng)[0] <= self.personality.base_attack_chance
 
         def min_to_attack(needed_reserves, source, target):
             return source.ships - needed_reserves >= target.ships * self.personality.min_attack_ratio
             
-        def is_hostile_neighbor_of(friendly_loc, other_loc):
-            pirates = other_loc.faction_type == FactionType.PIRATES
-            non_ftl = other_loc.faction_type == FactionType.NON_SPACEFARING
-            own = other_loc.faction_type == self.faction_type
-            in_range = friendly_loc.ly_to(other_loc.pos) <= DEFAULT_FUEL_RANGE_LY
-            hostile = pirates or (not non_ftl and not own)
-            return hostile and in_range
-
-        def all_hostile_neighbors_of(loc):
-            return [i for i in filter(lambda x: is_hostile_neighbor_of(loc, x), star_map.locations)]
-
-        def all_friendly_neighbors_of(loc):
-            return [i for i in filter(lambda x: x.faction_type == self.faction_type and x.pos != loc.pos and x.ly_to(loc.pos) <= DEFAULT_FUEL_RANGE_LY, star_map.locations)]
-
         def nearest_friendly_system_to(loc): 
             friendly_neighbors = all_friendly_neighbors_of(loc)
             closest = None
@@ -110,10 +112,40 @@ class Faction:
             return closest
 
         def all_neighbors_of(loc):
-            return [i for i in filter(lambda x: x.ly_to(loc.pos) <= DEFAULT_FUEL_RANGE_LY and loc.pos != x.pos, star_map.locations)]
+            return star_map.neighbors_of(loc)
 
         owned_systems = [i for i in filter(lambda x: x.faction_type == self.faction_type, star_map.locations)]
         owned_fleets = [i for i in filter(lambda x: x.faction_type == self.faction_type, star_map.deployed_fleets)]
+        hostile_fleets = [i for i in filter(lambda x: x.faction_type != self.faction_type, star_map.deployed_fleets)]
+        self.path_cache_check(owned_systems)
+
+        # Questions about the map are answered (and memoized for the rest of the turn) by the view
+        view = FactionView(self, owned_systems, owned_fleets, hostile_fleets)
+        is_aware_of = view.is_aware_of
+        is_threatened = view.is_threatened
+        calculate_needed_reserves = view.calculate_needed_reserves
+        get_num_defenders = view.get_num_defenders
+        all_hostile_neighbors_of = view.all_hostile_neighbors_of
+        all_friendly_neighbors_of = view.all_friendly_neighbors_of
+        all_owned_fleets_in_range_of = view.all_owned_fleets_in_range_of
+        all_hostile_fleets_in_range_of = view.all_hostile_fleets_in_range_of
+
+        # Every deployment made while planning goes through here, so the view forgets
+        # whatever depended on the source's ship count.
+        def deploy_fleet(source, dest, num_ships, ai_threat_check_flag=False, pre_waypoints=None):
+            ships_before = source.ships
+            star_map.deploy_fleet(source, dest, num_ships, ai_threat_check_flag, pre_waypoints)
+            if source.ships != ships_before:
+                view.ships_changed(source)
+                if plan is not None:
+                    plan.deployed(source, dest, num_ships, ai_threat_check_flag, pre_waypoints)
+
+        def place_reenforcement(loc):
+            loc.ships += 1
+            game.player_reenforcement_pool -= 1
+            view.ships_changed(loc)
+            if plan is not None:
+                plan.reenforced(loc)
 
         # Check all routed fleets and cancel threatened waypoints:
         for fleet in owned_fleets:
@@ -122,21 +154,10 @@ class Faction:
                     if waypoint.faction_type != self.faction_type and waypoint is not fleet.destination:
                         fleet.remove_waypoint(waypoint)
 
-        def is_aware_of(pos):
-            # can be seen by any fleet or location owned by the faction
-            for owned_loc in owned_systems:
-                if owned_loc.ly_to(pos) <= owned_loc.sensor_range:
-                    return True
-            for owned_fleet in owned_fleets:
-                if owned_fleet.ly_to(pos) <= owned_fleet.sensor_range:
-                    return True
-            return False
-
-        hostile_fleets = [i for i in filter(lambda x: x.faction_type != self.faction_type, star_map.deployed_fleets)]
         potential_targets = []
         for loc in star_map.locations:
             if loc.faction_type != self.faction_type:
-                if is_aware_of(loc.pos) and loc not in potential_targets: 
+                if is_aware_of(loc.pos):
                     potential_targets.append(loc)
 
         total_self_ship_count = sum(map(lambda x: x.ships, owned_systems))
@@ -144,19 +165,6 @@ class Faction:
         total_hostile_ship_count = sum(map(lambda x: x.ships, filter(lambda y: y.faction_type != FactionType.PIRATES and y.faction_type != FactionType.NON_SPACEFARING, potential_targets)))
         total_hostile_ship_count += sum(map(lambda x: x.ships, hostile_fleets))
 
-        def all_owned_fleets_in_range_of(loc):
-            return [i for i in filter(lambda x: x.ly_to(loc.pos) <= DEFAULT_FUEL_RANGE_LY, owned_fleets)]
-
-        def all_hostile_fleets_in_range_of(loc):
-            return [i for i in filter(lambda x: x.ly_to(loc.pos) <= DEFAULT_FUEL_RANGE_LY, hostile_fleets)]
-
-        def get_num_defenders(loc):
-            num_defenders = loc.ships
-            for fleet in all_hostile_fleets_in_range_of(loc):
-                if fleet.destination == loc and is_aware_of(fleet.pos):
-                    num_defenders += fleet.ships
-            return num_defenders
-
         def get_already_inbound_attackers(loc):
             num_attackers = 0
             for fleet in all_owned_fleets_in_range_of(loc):
@@ -167,44 +175,6 @@ class Faction:
         def get_sources_of_attack(target):
             return [i for i in filter(lambda x: not is_threatened(x) and not x.rallying, all_friendly_neighbors_of(target))]
 
-        def is_threatened(loc): 
-            # there are incoming fleets of a threatening size
-            for fleet in all_hostile_fleets_in_range_of(loc):
-                if fleet.destination == loc and fleet.ships > loc.ships / 2 and is_aware_of(fleet.pos):
-                    # TODO: Maybe make this part -------------^^^^^^^^^^^^^ a personality variable as well.
-                    return True
-            return False
-
-        def calculate_needed_reserves(loc):
-            # count hostile forces in the area
-            hostile_neighbors = all_hostile_neighbors_of(loc)
-            area_hostile_ship_count = 0
-            strongest_threat_ship_count = 0
-            for neighbor in hostile_neighbors:
-                if is_aware_of(neighbor.pos) and neighbor.faction_type != FactionType.NON_SPACEFARING:
-                    threat_count = neighbor.ships - 1
-                    nearby_hostile_fleets = all_hostile_fleets_in_range_of(neighbor)
-                    for fleet in nearby_hostile_fleets:
-                        if is_aware_of(fleet.pos) and fleet.destination == neighbor:
-                            threat_count += fleet.ships
-                    area_hostile_ship_count += threat_count
-                    if threat_count > strongest_threat_ship_count:
-                        strongest_threat_ship_count = threat_count
-            # count friendly forces in the area
-            friendly_neighbors = [i for i in filter(lambda x: not is_threatened(x), all_friendly_neighbors_of(loc))]
-            local_defender_count = 0 
-            for neighbor in friendly_neighbors:  
-                local_defender_count += neighbor.ships
-                nearby_friendly_fleets = all_owned_fleets_in_range_of(neighbor)
-                for fleet in nearby_friendly_fleets:
-                    if fleet.destination == neighbor:
-                        local_defender_count += fleet.ships
-            # needed reserves is a portion of the hostile count minus a portion of the friendly count
-            hostile_count = strongest_threat_ship_count + area_hostile_ship_count
-            adjusted_hostile_count = int(hostile_count * self.personality.base_hostile_count_factor)
-            adjusted_friendly_count = int(local_defender_count * self.personality.base_friendly_count_factor)
-            return max(adjusted_hostile_count - adjusted_friendly_count, 1)
-
         def rally_check():  
             rally_points = [i for i in filter(lambda x: x.rallying, owned_systems)]
             for system in rally_points:
@@ -221,7 +191,7 @@ class Faction:
                     if system.ships - system.rally_amount < needed_reserves:
                         reasonable_attack = False
                     if reasonable_attack:
-                        star_map.deploy_fleet(system, system.rally_target, system.rally_amount)
+                        deploy_fleet(system, system.rally_target, system.rally_amount)
                     system.rallying = False
                     system.rally_target = None
                     system.rally_amount = 0
@@ -288,7 +258,7 @@ class Faction:
 
             for source in sources:
                 if sending[source] > 0 and not source.rallying:
-                    star_map.deploy_fleet(source, loc, sending[source])
+                    deploy_fleet(source, loc, sending[source])
 
         def is_rear_system(loc):
             # is surrounded only by friendly systems or non-FTL systems
@@ -333,7 +303,7 @@ class Faction:
             
             num_to_deploy = max_to_send 
             if min_to_send < max_to_send: 
-                num_to_deploy = randint(min_to_send, max_to_send)
+                num_to_deploy = rng.randint(min_to_send, max_to_send)
 
             en_route = 0
             for source in sources:
@@ -349,34 +319,34 @@ class Faction:
             if coordinated_attack:
                 valid_rally_points = [i for i in filter(lambda x: not x.rallying, all_friendly_neighbors_of(loc))]
                 if len(valid_rally_points) > 0:
-                    rally_point = choice(valid_rally_points)
+                    rally_point = rng.choice(valid_rally_points)
                     rally_point.rallying = True
                     rally_point.rally_target = loc
                     rally_point.rally_amount = en_route
                     for source in sources: 
-                        star_map.deploy_fleet(source, rally_point, sending[source])
+                        deploy_fleet(source, rally_point, sending[source])
             elif single_point_attack:
                 source = sources[0]
-                star_map.deploy_fleet(source, loc, sending[source])
+                deploy_fleet(source, loc, sending[source])
 
         def evacuate(loc):
             # flee to a friendly world, or to a hostile world, or not at all, depending on factors
             if loc.ships > 1:
                 friendly_neighbors = all_friendly_neighbors_of(loc)
-                shuffle(friendly_neighbors)
+                rng.shuffle(friendly_neighbors)
                 evacuated = False
 
                 def supporting_evac_routine(evacuated):
                     for neighbor in friendly_neighbors:
                         if is_threatened(neighbor):
-                            star_map.deploy_fleet(loc, neighbor, loc.ships - 1)
+                            deploy_fleet(loc, neighbor, loc.ships - 1)
                             return True
                     return False
 
                 def friendly_evac_routine(evacuated): 
                     if not evacuated and len(friendly_neighbors) > 0:
-                        target = choice(friendly_neighbors)
-                        star_map.deploy_fleet(loc, target, loc.ships - 1)
+                        target = rng.choice(friendly_neighbors)
+                        deploy_fleet(loc, target, loc.ships - 1)
                         return True
                     return False
 
@@ -400,7 +370,7 @@ class Faction:
                             elif is_other_viable_target(neighbor):
                                 weakest = neighbor
                         if viable_target_found():
-                            star_map.deploy_fleet(loc, weakest, loc.ships - 1)
+                            deploy_fleet(loc, weakest, loc.ships - 1)
 
                 evacuated = supporting_evac_routine(evacuated)
                 if not evacuated:
@@ -409,16 +379,16 @@ class Faction:
                     hostile_evac_routine(evacuated)
 
         threatened_systems = [i for i in filter(lambda x: is_threatened(x), owned_systems)]
-        shuffle(threatened_systems)
+        rng.shuffle(threatened_systems)
 
         understrength_systems = [i for i in filter(lambda x: x.ships < calculate_needed_reserves(x), owned_systems)]
-        shuffle(understrength_systems)
+        rng.shuffle(understrength_systems)
 
         def handle_centers_of_gravity():
             if len(self.centers_of_gravity) < self.personality.centers_of_gravity:
                 if len(understrength_systems) + len(threatened_systems) == 0:
                     return
-                center_of_gravity = CenterOfGravity(choice(understrength_systems + threatened_systems), self.personality.turns_to_pull, self.game)
+                center_of_gravity = CenterOfGravity(rng.choice(understrength_systems + threatened_systems), self.personality.turns_to_pull, self.game)
                 self.centers_of_gravity.append(center_of_gravity)
 
             for cog in self.centers_of_gravity:
@@ -438,16 +408,16 @@ class Faction:
                 under_max_reserves = activated_reserves < self.personality.max_activated_reserves
                 under_max_direct_reserves = activated_direct_reserves < self.personality.max_activated_direct_reserves
                 if under_max_reserves and under_max_direct_reserves:
-                    path = self.shortest_uncontested_path(loc, choice(dest_list))
+                    path = self.shortest_uncontested_path(loc, rng.choice(dest_list))
                     if path is not None:
                         target = path[0]
                         # Some personality types directly route a higher level of their reenforcements to a front
-                        if d100()[0] <= self.personality.base_direct_to_front_chance_out_of_100:
-                            star_map.deploy_fleet(loc, target, loc.ships - 1, True, path)
+                        if d100(rng=rng)[0] <= self.personality.base_direct_to_front_chance_out_of_100:
+                            deploy_fleet(loc, target, loc.ships - 1, True, path)
                         # While others simply make a short hop towards one, providing a more flexible but slower
                         # activation of their reserves.
                         else:
-                            star_map.deploy_fleet(loc, target, loc.ships - 1)
+                            deploy_fleet(loc, target, loc.ships - 1)
                         activated_reserves += 1
                         activated_direct_reserves += 1
                         return True
@@ -457,8 +427,8 @@ class Faction:
             # Above this threshold, they'll route reserves directly to the front
             # towards threatened or understrength systems, or centers of gravity when applicable
             if loc.ships > self.personality.base_reserve_threshold: 
-                if len(self.centers_of_gravity) > 0 and d100()[0] <= self.personality.center_of_gravity_chance_out_of_100:
-                    cog = choice(self.centers_of_gravity)
+                if len(self.centers_of_gravity) > 0 and d100(rng=rng)[0] <= self.personality.center_of_gravity_chance_out_of_100:
+                    cog = rng.choice(self.centers_of_gravity)
                     routed = route(cog.nodes)
                 elif len(threatened_systems + understrength_systems) > 0:
                     routed = route(understrength_systems + threatened_systems)
@@ -473,32 +443,28 @@ class Faction:
                         break
                 if not incoming and activated_reserves < self.personality.max_activated_reserves:
                     friendly_neighbors = all_friendly_neighbors_of(loc)
-                    target = choice(friendly_neighbors)
-                    star_map.deploy_fleet(loc, target, loc.ships - 1)
+                    target = rng.choice(friendly_neighbors)
+                    deploy_fleet(loc, target, loc.ships - 1)
                     activated_reserves += 1
 
         # Handle player reenforcements in watch_mode
         if self.faction_type == FactionType.PLAYER and game.watch_mode:
             # Player in Watch mode will bank some reenforcements to prioritize
             # threatened worlds later. Not as well as a good human player though.
-            banking = coin_flip() and len(threatened_systems) == 0 and len(understrength_systems) == 0
+            banking = coin_flip(rng) and len(threatened_systems) == 0 and len(understrength_systems) == 0
             if not banking:
                 while game.player_reenforcement_pool > 0:
                     for loc in threatened_systems:
                         if game.player_reenforcement_pool > 0:
-                            loc.ships += 1
-                            game.player_reenforcement_pool -= 1
+                            place_reenforcement(loc)
                     for loc in understrength_systems:
                         if game.player_reenforcement_pool > 0:
-                            loc.ships += 1
-                            game.player_reenforcement_pool -= 1
+                            place_reenforcement(loc)
                     if game.player_reenforcement_pool > 0:
-                        loc = choice(owned_systems)
-                        loc.ships += 1
-                        game.player_reenforcement_pool -= 1
+                        place_reenforcement(rng.choice(owned_systems))
 
         rear_systems = [i for i in filter(lambda x: is_rear_system(x), owned_systems)]
-        shuffle(rear_systems)
+        rng.shuffle(rear_systems)
 
         defensible_systems = []
         evac_list = []
@@ -508,11 +474,11 @@ class Faction:
             else:
                 evac_list.append(threatened_system)
 
-        shuffle(defensible_systems)
-        shuffle(evac_list)
+        rng.shuffle(defensible_systems)
+        rng.shuffle(evac_list)
 
         viable_target_list = [i for i in filter(lambda x: is_viable_target(x), potential_targets)]
-        shuffle(viable_target_list)
+        rng.shuffle(viable_target_list)
 
         handle_centers_of_gravity() 
 
@@ -0,0 +1,167 @@
+from constants import *
+from faction_type import FactionType
+from spatial_index import SpatialIndex
+
+# What one faction knows about the map during one call to Faction.run_behavior(). The AI asks the same
+# questions about the same systems over and over within a turn (calculate_needed_reserves() checks
+# is_threatened() for every friendly neighbor, is_viable_target() calculates reserves for every source,
+# etc.), so the answers are memoized per location. Fleets don't move while a faction plans, and the
+# only thing which changes is the ship count of systems it deploys from, so ships_changed() drops just
+# the entries which depend on that system. Since nothing moves either, the fleets are bucketed in to
+# SpatialIndexes once, so range questions only look at the fleets near a system rather than all of them,
+# and everything the faction's sensors can see is worked out in one pass, from the sensors outwards.
+class FactionView:
+    def __init__(self, faction, owned_systems, owned_fleets, hostile_fleets):
+        self.faction_type = faction.faction_type
+        self.personality = faction.personality
+        self.star_map = faction.game.star_map
+        self.owned_systems = owned_systems
+        self.owned_fleets = owned_fleets
+        self.hostile_fleets = hostile_fleets
+        self.owned_fleet_index = self.fleet_index(owned_fleets)
+        self.hostile_fleet_index = self.fleet_index(hostile_fleets)
+        # where each fleet is in the map's deployed_fleets, to put range query results back in that order
+        self.fleet_order = {id(fleet): index for index, fleet in enumerate(self.star_map.deployed_fleets)}
+        self.awareness = None
+        self.owned_fleets_in_range = {}
+        self.hostile_fleets_in_range = {}
+        self.num_defenders = {}
+        self.threatened = {}
+        self.needed_reserves = {}
+
+    def fleet_index(self, fleets):
+        index = SpatialIndex()
+        for fleet in fleets:
+            index.insert(fleet)
+        return index
+
+    # The fleets in fleet_index within fuel range of loc, in the order they're in on the map
+    def fleets_in_range_of(self, fleet_index, loc):
+        nearby = fleet_index.in_range_of(loc.pos, DEFAULT_FUEL_RANGE_LY * LY + 1)
+        in_range = [i for i in filter(lambda x: x.ly_to(loc.pos) <= DEFAULT_FUEL_RANGE_LY, nearby)]
+        if len(in_range) > 1:
+            in_range.sort(key=lambda x: self.fleet_order[id(x)])
+        return in_range
+
+    def is_hostile_neighbor_of(self, other_loc):
+        pirates = other_loc.faction_type == FactionType.PIRATES
+        non_ftl = other_loc.faction_type == FactionType.NON_SPACEFARING
+        own = other_loc.faction_type == self.faction_type
+        return pirates or (not non_ftl and not own)
+
+    def all_hostile_neighbors_of(self, loc):
+        return [i for i in filter(lambda x: self.is_hostile_neighbor_of(x), self.star_map.neighbors_of(loc))]
+
+    def all_friendly_neighbors_of(self, loc):
+        return [i for i in filter(lambda x: x.faction_type == self.faction_type, self.star_map.neighbors_of(loc))]
+
+    def is_aware_of(self, pos):
+        # can be seen by any fleet or location owned by the faction
+        if self.awareness is None:
+            self.awareness = self.sense_map()
+        key = (pos[0], pos[1])
+        if key not in self.awareness:
+            self.awareness[key] = self.check_awareness(pos)
+        return self.awareness[key]
+
+    # Whether each system and fleet on the map can be seen, keyed by position. Each of the faction's
+    # systems and fleets only looks at what's near it, rather than every one being checked against all of them.
+    def sense_map(self):
+        awareness = {}
+        for entity in self.star_map.locations + self.owned_fleets + self.hostile_fleets:
+            awareness[(entity.pos[0], entity.pos[1])] = False
+        for source in self.owned_systems + self.owned_fleets:
+            radius = source.sensor_range * LY + 1
+            nearby = self.star_map.spatial_index.in_range_of(source.pos, radius)
+            nearby += self.owned_fleet_index.in_range_of(source.pos, radius)
+            nearby += self.hostile_fleet_index.in_range_of(source.pos, radius)
+            for entity in nearby:
+                if source.ly_to(entity.pos) <= source.sensor_range:
+                    awareness[(entity.pos[0], entity.pos[1])] = True
+        return awareness
+
+    def check_awareness(self, pos):
+        for owned_loc in self.owned_systems:
+            if owned_loc.ly_to(pos) <= owned_loc.sensor_range:
+                return True
+        for owned_fleet in self.owned_fleets:
+            if owned_fleet.ly_to(pos) <= owned_fleet.sensor_range:
+                return True
+        return False
+
+    def all_owned_fleets_in_range_of(self, loc):
+        if loc not in self.owned_fleets_in_range:
+            self.owned_fleets_in_range[loc] = self.fleets_in_range_of(self.owned_fleet_index, loc)
+        return self.owned_fleets_in_range[loc]
+
+    def all_hostile_fleets_in_range_of(self, loc):
+        if loc not in self.hostile_fleets_in_range:
+            self.hostile_fleets_in_range[loc] = self.fleets_in_range_of(self.hostile_fleet_index, loc)
+        return self.hostile_fleets_in_range[loc]
+
+    def get_num_defenders(self, loc):
+        if loc not in self.num_defenders:
+            num_defenders = loc.ships
+            for fleet in self.all_hostile_fleets_in_range_of(loc):
+                if fleet.destination == loc and self.is_aware_of(fleet.pos):
+                    num_defenders += fleet.ships
+            self.num_defenders[loc] = num_defenders
+        return self.num_defenders[loc]
+
+    def is_threatened(self, loc):
+        if loc not in self.threatened:
+            self.threatened[loc] = self.check_threatened(loc)
+        return self.threatened[loc]
+
+    def check_threatened(self, loc):
+        # there are incoming fleets of a threatening size
+        for fleet in self.all_hostile_fleets_in_range_of(loc):
+            if fleet.destination == loc and fleet.ships > loc.ships / 2 and self.is_aware_of(fleet.pos):
+                # TODO: Maybe make this part -------------^^^^^^^^^^^^^ a personality variable as well.
+                return True
+        return False
+
+    def calculate_needed_reserves(self, loc):
+        if loc not in self.needed_reserves:
+            self.needed_reserves[loc] = self.count_needed_reserves(loc)
+        return self.needed_reserves[loc]
+
+    def count_needed_reserves(self, loc):
+        # count hostile forces in the area
+        hostile_neighbors = self.all_hostile_neighbors_of(loc)
+        area_hostile_ship_count = 0
+        strongest_threat_ship_count = 0
+        for neighbor in hostile_neighbors:
+            if self.is_aware_of(neighbor.pos) and neighbor.faction_type != FactionType.NON_SPACEFARING:
+                threat_count = neighbor.ships - 1
+                nearby_hostile_fleets = self.all_hostile_fleets_in_range_of(neighbor)
+                for fleet in nearby_hostile_fleets:
+                    if self.is_aware_of(fleet.pos) and fleet.destination == neighbor:
+                        threat_count += fleet.ships
+                area_hostile_ship_count += threat_count
+                if threat_count > strongest_threat_ship_count:
+                    strongest_threat_ship_count = threat_count
+        # count friendly forces in the area
+        friendly_neighbors = [i for i in filter(lambda x: not self.is_threatened(x), self.all_friendly_neighbors_of(loc))]
+        local_defender_count = 0
+        for neighbor in friendly_neighbors:
+            local_defender_count += neighbor.ships
+            nearby_friendly_fleets = self.all_owned_fleets_in_range_of(neighbor)
+            for fleet in nearby_friendly_fleets:
+                if fleet.destination == neighbor:
+                    local_defender_count += fleet.ships
+        # needed reserves is a portion of the hostile count minus a portion of the friendly count
+        hostile_count = strongest_threat_ship_count + area_hostile_ship_count
+        adjusted_hostile_count = int(hostile_count * self.personality.base_hostile_count_factor)
+        adjusted_friendly_count = int(local_defender_count * self.personality.base_friendly_count_factor)
+        return max(adjusted_hostile_count - adjusted_friendly_count, 1)
+
+    # Call whenever loc.ships changes. Its own threat and defender counts are recalculated, as are
+    # the needed reserves of its neighbors, which count its ships. Fleet ranges and awareness are
+    # unaffected.
+    def ships_changed(self, loc):
+        self.threatened.pop(loc, None)
+        self.num_defenders.pop(loc, None)
+        self.needed_reserves.pop(loc, None)
+        for neighbor in self.star_map.neighbors_of(loc):
+            self.needed_reserves.pop(neighbor, None)
@@ -0,0 +1,143 @@
+import pygame
+from constants import *
+from math import floor
+
+# The fog of war as drawn on the strategic map: COLOR_FOG, with a black circle cut out of it for every
+# sensor. It's kept from one frame to the next and only touched where something has changed: a sensor
+# which has appeared is stamped on, and the area under one which has gone (or moved, or changed range)
+# is filled with fog again and has whatever sensors overlap it stamped back on. When the camera moves,
+# what's already drawn is scrolled along with it and only the strips it uncovers are drawn. So the cost
+# of an update follows how much has changed since the last one, rather than how many sensors there are,
+# and it's never much more than drawing the whole thing from scratch, which is what's done when it
+# would be.
+#
+# Sensors are drawn at whole map pixels, which is what keeps a circle in the same place on the mask
+# however far it has been scrolled.
+class FogMask:
+    def __init__(self, cell_side=PARTITION_GRID_SIDE):
+        self.surface = pygame.Surface((MAP_WIDTH_PX, MAP_HEIGHT_PX))
+        self.camera = None
+        # sensors as {key: (x, y, radius in px)}, in map pixels
+        self.sensors = {}
+        # the keys of the sensors centered in each cell, to find the ones overlapping an area by
+        self.cell_side = cell_side
+        self.cells = {}
+        # how many times the whole mask has been drawn from scratch, and how many areas of it redrawn
+        self.rebuilds = 0
+        self.repaints = 0
+
+    def cell_of(self, x, y):
+        return (floor(x / self.cell_side), floor(y / self.cell_side))
+
+    # Brings the mask up to date with sensors, as {key: (pos, radius in px)} for everything which can be
+    # seen through the fog, and with the view's camera. Returns whether anything on it has changed.
+    def update(self, sensors, camera):
+        sensors = {key: (floor(pos[0]), floor(pos[1]), radius) for key, (pos, radius) in sensors.items()}
+        removed = [i for i in filter(lambda x: sensors.get(x) != self.sensors[x], self.sensors)]
+        added = [i for i in filter(lambda x: self.sensors.get(x) != sensors[x], sensors)]
+        if camera == self.camera and len(removed) == 0 and len(added) == 0:
+            return False
+        for key in removed:
+            self.cells[self.cell_of(*self.sensors[key][:2])].discard(key)
+        for key in added:
+            cell = self.cell_of(*sensors[key][:2])
+            if cell not in self.cells:
+                self.cells[cell] = set()
+            self.cells[cell].add(key)
+        previous = self.sensors
+        self.sensors = sensors
+
+        if self.camera is None or len(removed) + len(added) > len(sensors):
+            self.rebuild(camera)
+            return True
+        if camera != self.camera:
+            dx = self.camera[0] - camera[0]
+            dy = self.camera[1] - camera[1]
+            if dx != int(dx) or dy != int(dy) or abs(dx) >= MAP_WIDTH_PX or abs(dy) >= MAP_HEIGHT_PX:
+                self.rebuild(camera)
+                return True
+            self.scroll(camera, int(dx), int(dy))
+
+        # Where the sensors overlap each other a lot, redrawing under a few of them can take more
+        # stamps than drawing them all once, so the mask is rebuilt instead as soon as it would
+        view = self.surface.get_rect()
+        stamps_left = len(sensors)
+        dirty = []
+        for key in removed:
+            rect = self.rect_of(previous[key]).clip(view)
+            if rect.width == 0 or rect.height == 0:
+                continue
+            overlapping = self.sensors_in(rect)
+            stamps_left -= len(overlapping)
+            if stamps_left < 0:
+                self.rebuild(camera)
+                return True
+            dirty.append((rect, overlapping))
+        for rect, overlapping in dirty:
+            self.repaint(rect, overlapping)
+        for key in added:
+            self.stamp(sensors[key])
+        return True
+
+    def scroll(self, camera, dx, dy):
+        self.camera = camera
+        self.surface.scroll(dx, dy)
+        if dx > 0:
+            self.repaint(pygame.Rect(0, 0, dx, MAP_HEIGHT_PX))
+        elif dx < 0:
+            self.repaint(pygame.Rect(MAP_WIDTH_PX + dx, 0, -dx, MAP_HEIGHT_PX))
+        if dy > 0:
+            self.repaint(pygame.Rect(0, 0, MAP_WIDTH_PX, dy))
+        elif dy < 0:
+            self.repaint(pygame.Rect(0, MAP_HEIGHT_PX + dy, MAP_WIDTH_PX, -dy))
+
+    # The area of the view a sensor covers
+    def rect_of(self, sensor):
+        x, y, radius = sensor
+        reach = int(radius) + 2
+        return pygame.Rect(x - self.camera[0] - reach, y - self.camera[1] - reach, reach * 2 + 1, reach * 2 + 1)
+
+    def stamp(self, sensor):
+        x, y, radius = sensor
+        pygame.draw.circle(self.surface, "black", (x - self.camera[0], y - self.camera[1]), radius)
+
+    # Every sensor overlapping rect (in the view)
+    def sensors_in(self, rect):
+        # the same test as rect.colliderect(self.rect_of(sensor)), in map pixels
+        left, top = rect.left + self.camera[0] - 2, rect.top + self.camera[1] - 2
+        right, bottom = rect.right + self.camera[0] + 2, rect.bottom + self.camera[1] + 2
+        reach = MAX_SENSOR_RANGE_LY * LY
+        min_x, min_y = self.cell_of(left - reach, top - reach)
+        max_x, max_y = self.cell_of(right + reach, bottom + reach)
+        overlapping = []
+        for cell_x in range(min_x, max_x + 1):
+            for cell_y in range(min_y, max_y + 1):
+                for key in self.cells.get((cell_x, cell_y), ()):
+                    x, y, radius = sensor = self.sensors[key]
+                    radius = int(radius)
+                    if x + radius >= left and x - radius < right and y + radius >= top and y - radius < bottom:
+                        overlapping.append(sensor)
+        return overlapping
+
+    # Fills rect (in the view) with fog, and stamps every sensor overlapping it (or just those given)
+    # back on
+    def repaint(self, rect, overlapping=None):
+        if overlapping is None:
+            overlapping = self.sensors_in(rect)
+        self.repaints += 1
+        self.surface.set_clip(rect)
+        self.surface.fill(COLOR_FOG, rect)
+        for sensor in overlapping:
+            self.stamp(sensor)
+        self.surface.set_clip(None)
+
+    def rebuild(self, camera):
+        self.camera = camera
+        self.rebuilds += 1
+        self.surface.fill(COLOR_FOG)
+        for sensor in self.sensors.values():
+            self.stamp(sensor)
+
+    # Forces the whole mask to be drawn again on the next update()
+    def clear(self):
+        self.camera = None
@@ -0,0 +1,67 @@
+from constants import *
+from faction_type import FactionType
+from math import sqrt
+
+# NumPy is optional. With it, visibility is worked out in one batched distance pass; without it the same
+# comparisons are made in plain Python.
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Keeps the in_sensor_view flags of every Fleet and Location up to date with what the player's sensors
+# can see. The player's fleets see DEFAULT_FLEET_SENSOR_RANGE_LY around them, and their systems see their
+# own sensor_range. Nothing changes unless something moves, changes hands, or is deployed, so the flags
+# are only recalculated when the positions or owners of things on the map have changed since last time.
+class FogOfWar:
+    def __init__(self):
+        self.last_state = None
+
+    # A snapshot of everything visibility depends on. Location positions and sensor ranges never change.
+    def map_state(self, star_map, debug_mode):
+        fleets = tuple((id(fleet), fleet.pos[0], fleet.pos[1], fleet.faction_type) for fleet in star_map.deployed_fleets)
+        owners = tuple(loc.faction_type for loc in star_map.locations)
+        return (debug_mode, fleets, owners)
+
+    def update(self, star_map, debug_mode):
+        state = self.map_state(star_map, debug_mode)
+        if state == self.last_state:
+            return
+        self.last_state = state
+        entities = star_map.deployed_fleets + star_map.locations
+        if debug_mode:
+            for entity in entities:
+                entity.in_sensor_view = True
+            return
+        # sensor sources as (x, y, range in px)
+        sources = [(fleet.pos[0], fleet.pos[1], DEFAULT_FLEET_SENSOR_RANGE_LY * LY)
+                   for fleet in star_map.deployed_fleets if fleet.faction_type == FactionType.PLAYER]
+        sources += [(loc.pos[0], loc.pos[1], loc.sensor_range * LY)
+                    for loc in star_map.locations if loc.faction_type == FactionType.PLAYER]
+        targets = [i for i in filter(lambda x: x.faction_type != FactionType.PLAYER, entities)]
+        for entity in entities:
+            if entity.faction_type == FactionType.PLAYER:
+                entity.in_sensor_view = True
+        if numpy is not None and len(sources) > 0 and len(targets) > 0:
+            visible = self.batched_visibility(sources, targets)
+        else:
+            visible = [self.can_see(sources, target.pos) for target in targets]
+        for target, seen in zip(targets, visible):
+            target.in_sensor_view = bool(seen)
+
+    # Distances from every target to every source in one go, as a (targets x sources) array
+    def batched_visibility(self, sources, targets):
+        source_array = numpy.array(sources, dtype=numpy.float64)
+        target_array = numpy.array([(target.pos[0], target.pos[1]) for target in targets], dtype=numpy.float64)
+        dx = target_array[:, 0, None] - source_array[None, :, 0]
+        dy = target_array[:, 1, None] - source_array[None, :, 1]
+        distances = numpy.sqrt(dx * dx + dy * dy)
+        return (distances <= source_array[None, :, 2]).any(axis=1)
+
+    def can_see(self, sources, pos):
+        for x, y, sensor_range_px in sources:
+            dx = pos[0] - x
+            dy = pos[1] - y
+            if sqrt(dx * dx + dy * dy) <= sensor_range_px:
+                return True
+        return False
@@ -1,8 +1,9 @@
 from constants import *
 from enum import Enum
 from clickable import Clickable
-from random import randint, randrange, choice
-from utility import d100, d20, coin_flip
+from random import Random
+from utility import d100
+from starfield_cache import starfield_cache
 from pygame.math import Vector2
 from faction_type import FactionType, ai_empire_faction_types
 from math import ceil, floor
@@ -12,110 +13,132 @@ from pygame.math import Vector2
 class LocationType(Enum):
     STAR_SYSTEM = 1
 
-def mountain_color():
-    val = randint(COLOR_MOUNTAINS_MIN, COLOR_MOUNTAINS_MAX)
+# The starfield helpers all draw from the rng they are handed, so that a starfield can be
+# regenerated identically from its seed whenever it is needed.
+def mountain_color(rng):
+    val = rng.randint(COLOR_MOUNTAINS_MIN, COLOR_MOUNTAINS_MAX)
     return (val, val, val)
 
-def desert_color(): 
-    r = randint(COLOR_DESERT_MIN, COLOR_DESERT_MAX)
-    g = randint(COLOR_DESERT_MIN, COLOR_DESERT_MAX)
-    b = max(randint(COLOR_DESERT_MIN, COLOR_DESERT_MAX) // 2, 0)
+def desert_color(rng): 
+    r = rng.randint(COLOR_DESERT_MIN, COLOR_DESERT_MAX)
+    g = rng.randint(COLOR_DESERT_MIN, COLOR_DESERT_MAX)
+    b = max(rng.randint(COLOR_DESERT_MIN, COLOR_DESERT_MAX) // 2, 0)
     return (r, g, b) 
 
-def lush_color():
-    g = randint(COLOR_MOUNTAINS_MIN, COLOR_MOUNTAINS_MAX)
+def lush_color(rng):
+    g = rng.randint(COLOR_MOUNTAINS_MIN, COLOR_MOUNTAINS_MAX)
     return (0, g, 0)
 
-def land_color(): 
-    roll = d100()[0]  # not true mutually exclusive percents, but close enough for what I'm trying to do
+def land_color(rng): 
+    roll = rng.randint(1, 100)  # not true mutually exclusive percents, but close enough for what I'm trying to do
     if roll < SEA_CHANCE_OUT_OF_100:
         return COLOR_OCEANS
     if roll < DESERT_CHANCE_OUT_OF_100:
-        return desert_color()
+        return desert_color(rng)
     elif roll < MOUNTAIN_CHANCE_OUT_OF_100: 
-        return mountain_color()
-    return lush_color()
+        return mountain_color(rng)
+    return lush_color(rng)
 
-def star_red(): 
-    r = randint(200, 255)
+def star_red(rng): 
+    r = rng.randint(200, 255)
     return (r, 0, 0)
 
-def star_orange_or_yellow(): 
-    r = randint(200, 255)
-    g = randint(200, 255)
+def star_orange_or_yellow(rng): 
+    r = rng.randint(200, 255)
+    g = rng.randint(200, 255)
     return (r, g, 0)
 
-def star_white(): 
+def star_white(rng): 
     return (255, 255, 255)
 
-def star_purple_or_blue(): 
-    if coin_flip():
-        r = randint(100, 150)
-        g = randint(100, 150)
+def star_purple_or_blue(rng): 
+    if rng.randint(1, 20) <= 5:
+        r = rng.randint(100, 150)
+        g = rng.randint(100, 150)
         return (r, g, 255)
     else:
-        r = randint(200, 255)
-        b = randint(200, 255)
+        r = rng.randint(200, 255)
+        b = rng.randint(200, 255)
         return (r, 0, b)
 
-def random_star_color(): 
+def random_star_color(rng): 
     colors = [star_red, star_orange_or_yellow]
-    if d100()[0] == 1:
-        return star_purple_or_blue()
-    elif d100()[0] <= 10:
-        return star_white()
-    return choice(colors)()
-
-def generate_starfield(): 
+    if rng.randint(1, 100) == 1:
+        return star_purple_or_blue(rng)
+    elif rng.randint(1, 100) <= 10:
+        return star_white(rng)
+    return rng.choice(colors)(rng)
+
+# Draws the backdrop for a tactical battle. The same seed always gives the same starfield; with no seed
+# a random one is drawn.
+def generate_starfield(seed=None): 
+    rng = Random(seed)
     starfield_surface = pygame.Surface((SCREEN_WIDTH_PX, SCREEN_HEIGHT_PX))
     # Background stars
     num_stars = int((SCREEN_WIDTH_PX * SCREEN_HEIGHT_PX) * STARFIELD_DENSITY)
     radius = None
     for _ in range(num_stars):
-        pos = (randrange(0, SCREEN_WIDTH_PX), randrange(0, SCREEN_HEIGHT_PX))
+        pos = (rng.randrange(0, SCREEN_WIDTH_PX), rng.randrange(0, SCREEN_HEIGHT_PX))
         radius = 1
-        if d20()[0] <= 1:
+        if rng.randint(1, 20) <= 1:
             radius = 2
         pygame.draw.circle(starfield_surface, "white", pos, radius)
     # Up to 3 local stars
-    num_local_stars = randint(1, 2)
+    num_local_stars = rng.randint(1, 2)
     for star in range(num_local_stars):
-        star_pos = (randrange(0, SCREEN_WIDTH_PX), randrange(0, SCREEN_HEIGHT_PX))
-        star_radius = randint(LOCAL_STAR_MIN_SIZE, LOCAL_STAR_MAX_SIZE)
-        pygame.draw.circle(starfield_surface, random_star_color(), star_pos, star_radius)
+        star_pos = (rng.randrange(0, SCREEN_WIDTH_PX), rng.randrange(0, SCREEN_HEIGHT_PX))
+        star_radius = rng.randint(LOCAL_STAR_MIN_SIZE, LOCAL_STAR_MAX_SIZE)
+        pygame.draw.circle(starfield_surface, random_star_color(rng), star_pos, star_radius)
     # The planet itself
-    planet_pos = (randrange(0, SCREEN_WIDTH_PX), randrange(0, SCREEN_HEIGHT_PX))
-    planet_radius = randint(LOCAL_PLANET_MIN_SIZE, LOCAL_PLANET_MAX_SIZE)
+    planet_pos = (rng.randrange(0, SCREEN_WIDTH_PX), rng.randrange(0, SCREEN_HEIGHT_PX))
+    planet_radius = rng.randint(LOCAL_PLANET_MIN_SIZE, LOCAL_PLANET_MAX_SIZE)
     pygame.draw.circle(starfield_surface, COLOR_OCEANS, planet_pos, planet_radius)
     planet_px_rect = (planet_pos[0] - planet_radius, planet_pos[1] - planet_radius, planet_radius * 2, planet_radius * 2)
     # Continents 
-    num_continents = randint(NUM_CONTINENTS_MIN, NUM_CONTINENTS_MAX)
+    num_continents = rng.randint(NUM_CONTINENTS_MIN, NUM_CONTINENTS_MAX)
     for _ in range(num_continents):
         points = []
-        num_points = randint(NUM_CONTINENT_POINTS_MIN, NUM_CONTINENT_POINTS_MAX)
+        num_points = rng.randint(NUM_CONTINENT_POINTS_MIN, NUM_CONTINENT_POINTS_MAX)
         while len(points) < num_points:
-            x = randrange(planet_px_rect[0], planet_px_rect[0] + planet_px_rect[2] - radius)
-            y = randrange(planet_px_rect[1], planet_px_rect[1] + planet_px_rect[3] - radius)
+            x = rng.randrange(planet_px_rect[0], planet_px_rect[0] + planet_px_rect[2] - radius)
+            y = rng.randrange(planet_px_rect[1], planet_px_rect[1] + planet_px_rect[3] - radius)
             in_circle = Vector2((x, y)).distance_to(planet_pos) <= planet_radius
             if in_circle:
                 points.append((x, y))
-        continent_color = randrange(COLOR_CONTINENTS_MIN, COLOR_CONTINENTS_MAX)
-        pygame.draw.polygon(starfield_surface, land_color(), points)
+        continent_color = rng.randrange(COLOR_CONTINENTS_MIN, COLOR_CONTINENTS_MAX)
+        pygame.draw.polygon(starfield_surface, land_color(rng), points)
     # Cloud cover
     num_cloud_px = int(planet_px_rect[2] * planet_px_rect[3] * LOCAL_CLOUD_DENSITY)
     for _ in range(num_cloud_px):
         radius = CLOUD_RADIUS_PX
-        x = randrange(planet_px_rect[0], planet_px_rect[0] + planet_px_rect[2] - radius)
-        y = randrange(planet_px_rect[1], planet_px_rect[1] + planet_px_rect[3] - radius)
+        x = rng.randrange(planet_px_rect[0], planet_px_rect[0] + planet_px_rect[2] - radius)
+        y = rng.randrange(planet_px_rect[1], planet_px_rect[1] + planet_px_rect[3] - radius)
         in_circle = Vector2((x, y)).distance_to(planet_pos) <= planet_radius
-        cloud_color = randrange(COLOR_CLOUDS_MIN, COLOR_CLOUDS_MAX)
+        cloud_color = rng.randrange(COLOR_CLOUDS_MIN, COLOR_CLOUDS_MAX)
         if in_circle:
             pygame.draw.circle(starfield_surface, (cloud_color, cloud_color, cloud_color), (x, y), radius)
 
     return (starfield_surface, planet_pos, planet_radius)
 
+# Covers the planet of a starfield in the smoke of an invasion. Like generate_starfield(), it is replayed
+# from a seed, so a decimated system looks the same every time its starfield is regenerated.
+def decimate_starfield(starfield_surface, planet_pos, planet_radius, seed):
+    rng = Random(seed)
+    colors = [COLOR_FOG, COLOR_FOGGED_STAR, COLOR_DECIMATION_RED, COLOR_DECIMATION_PURPLE, COLOR_DECIMATION_ORANGE]
+    planet_px_rect = (planet_pos[0] - planet_radius, planet_pos[1] - planet_radius, planet_radius * 2, planet_radius * 2)
+    num_cloud_px = int(planet_px_rect[2] * planet_px_rect[3] * DECIMATED_CLOUD_DENSITY)
+    for _ in range(num_cloud_px):
+        radius = CLOUD_RADIUS_PX
+        x = rng.randrange(planet_px_rect[0], planet_px_rect[0] + planet_px_rect[2] - radius)
+        y = rng.randrange(planet_px_rect[1], planet_px_rect[1] + planet_px_rect[3] - radius)
+        in_circle = Vector2((x, y)).distance_to(planet_pos) <= planet_radius
+        cloud_color = rng.choice(colors)
+        if in_circle:
+            pygame.draw.circle(starfield_surface, cloud_color, (x, y), radius)
+
 class Location(Clickable):
-    def __init__(self, name, pos, location_type, grid_pos, faction_type=None, ships=0):
+    # rng is the random stream the map is being generated from
+    def __init__(self, name, pos, location_type, grid_pos, rng, faction_type=None, ships=0):
         hit_box =  (pos[0] - LOCATION_HITBOX_SIDE_PX / 2, pos[1] - LOCATION_HITBOX_SIDE_PX / 2, LOCATION_HITBOX_SIDE_PX, LOCATION_HITBOX_SIDE_PX)
         super().__init__(hit_box)
         self.name = name
@@ -123,16 +146,21 @@ class Location(Clickable):
         self.locationType = location_type
         self.faction_type = faction_type
         self.ships = ships
-        self.reenforce_chance_out_of_100 = randint(DEFAULT_AI_REENFORCE_CHANCE_OUT_OF_100_MIN,
-                                                   DEFAULT_AI_REENFORCE_CHANCE_OUT_OF_100_MAX)
-        self.sensor_range = randint(DEFAULT_MIN_SENSOR_RANGE_LY, DEFAULT_MAX_SENSOR_RANGE_LY)
+        self.reenforce_chance_out_of_100 = rng.randint(DEFAULT_AI_REENFORCE_CHANCE_OUT_OF_100_MIN,
+                                                       DEFAULT_AI_REENFORCE_CHANCE_OUT_OF_100_MAX)
+        self.sensor_range = rng.randint(DEFAULT_MIN_SENSOR_RANGE_LY, DEFAULT_MAX_SENSOR_RANGE_LY)
         self.in_sensor_view = False
-        self.starfield, self.planet_pos, self.planet_radius = generate_starfield()
+        # Starfields are only drawn when a battle here is actually shown, and are kept in the
+        #   starfield_cache rather than on the Location. See get_starfield().
+        self.starfield_seed = rng.getrandbits(32)
+        self.decimation_seed = None
         self.rallying = False
         self.rally_target = None
         self.rally_amount = 0
         self.battles = 0
         self.grid_pos = grid_pos
+        # position in StarMap.locations, set once the map is generated
+        self.index = None
         self.veterancy_out_of_100 = 0
         self.decimated = False
 
@@ -156,20 +184,23 @@ class Location(Clickable):
         else: 
             return 0
 
-    def decimate(self):
+    def decimate(self, rng):
         self.decimated = True
         self.reenforce_chance_out_of_100 = POST_INVASION_REENFORCEMENT_CHANCE
-        colors = [COLOR_FOG, COLOR_FOGGED_STAR, COLOR_DECIMATION_RED, COLOR_DECIMATION_PURPLE, COLOR_DECIMATION_ORANGE]
-        planet_px_rect = (self.planet_pos[0] - self.planet_radius, self.planet_pos[1] - self.planet_radius, self.planet_radius * 2, self.planet_radius * 2)
-        num_cloud_px = int(planet_px_rect[2] * planet_px_rect[3] * DECIMATED_CLOUD_DENSITY)
-        for _ in range(num_cloud_px):
-            radius = CLOUD_RADIUS_PX
-            x = randrange(planet_px_rect[0], planet_px_rect[0] + planet_px_rect[2] - radius)
-            y = randrange(planet_px_rect[1], planet_px_rect[1] + planet_px_rect[3] - radius)
-            in_circle = Vector2((x, y)).distance_to(self.planet_pos) <= self.planet_radius
-            cloud_color = choice(colors)
-            if in_circle:
-                pygame.draw.circle(self.starfield, cloud_color, (x, y), radius)
+        self.decimation_seed = rng.getrandbits(32)
+        # A starfield which is already cached gets the overlay now; otherwise it's applied when generated
+        cached = starfield_cache.peek(self)
+        if cached is not None:
+            decimate_starfield(*cached, self.decimation_seed)
+
+    # Returns the Surface for this system's starfield, generating it from its seed if it isn't cached
+    def get_starfield(self):
+        def generate():
+            starfield, planet_pos, planet_radius = generate_starfield(self.starfield_seed)
+            if self.decimated:
+                decimate_starfield(starfield, planet_pos, planet_radius, self.decimation_seed)
+            return (starfield, planet_pos, planet_radius)
+        return starfield_cache.get(self, generate)[0]
 
     def under_threat(self, fleets):
         for fleet in fleets:
@@ -180,19 +211,19 @@ class Location(Clickable):
                 return True
         return False
 
-    def will_spawn_reenforcements(self, hard_mode, last_faction_buff): 
+    def will_spawn_reenforcements(self, hard_mode, last_faction_buff, rng): 
         if self.faction_type == FactionType.EXOGALACTIC_INVASION:
             # invaders don't spawn reenforcements
             return False
         if self.faction_type == FactionType.NON_SPACEFARING and self.ships >= NON_SPACEFARING_PRODUCTION_LIMIT_THRESHOLD:
             # Non-FTL factions are not as capable of building up reenforcements
-            return d100()[0] <= self.reenforce_chance_out_of_100 // NON_SPACEFARING_PRODUCTION_PENALTY
+            return d100(rng=rng)[0] <= self.reenforce_chance_out_of_100 // NON_SPACEFARING_PRODUCTION_PENALTY
         elif self.faction_type in ai_empire_faction_types and hard_mode:
-            return d100()[0] <= self.reenforce_chance_out_of_100 + HARD_MODE_PRODUCTION_BONUS
+            return d100(rng=rng)[0] <= self.reenforce_chance_out_of_100 + HARD_MODE_PRODUCTION_BONUS
         elif self.faction_type in ai_empire_faction_types and self.faction_type != FactionType.PLAYER and last_faction_buff:
-            return d100()[0] <= LAST_FACTION_BUFF_PRODUCTION_BONUS
+            return d100(rng=rng)[0] <= LAST_FACTION_BUFF_PRODUCTION_BONUS
         else:
-            return d100()[0] <= self.reenforce_chance_out_of_100
+            return d100(rng=rng)[0] <= self.reenforce_chance_out_of_100
 
     # Takes point on the map and returns the # of LYs between them
     def ly_to(self, point):
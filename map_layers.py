@@ -0,0 +1,54 @@
+import pygame
+from constants import *
+
+# The strategic map is drawn as a stack of layers, each of which is kept from one draw_display() to the
+# next and only redrawn when what it shows has changed. Along with each layer goes its state: a snapshot
+# of everything it was drawn from (positions in the view, owners, labels...). A layer asked for with the
+# same state as last time is reused as it is. Every layer but the bottom one is transparent wherever
+# nothing has been drawn on it. The stacked layers are kept as well, and only stacked again when one of
+# them has been redrawn, so a redraw where nothing on the map has changed is a single opaque blit.
+class MapLayers:
+    def __init__(self):
+        # the map as drawn to the screen: the stacked layers, with whatever isn't kept in a layer on top
+        self.surface = pygame.Surface((MAP_WIDTH_PX, MAP_HEIGHT_PX))
+        self.stacked = pygame.Surface((MAP_WIDTH_PX, MAP_HEIGHT_PX))
+        self.stacked_from = None
+        self.layers = {}
+        self.states = {}
+        # how many times each layer has been redrawn
+        self.redraws = {}
+
+    # Returns the named layer, having called draw(layer) on it first if state has changed
+    def layer(self, name, state, draw, transparent=True):
+        if name in self.states and self.states[name] == state:
+            return self.layers[name]
+        if name not in self.layers:
+            flags = pygame.SRCALPHA if transparent else 0
+            self.layers[name] = pygame.Surface((MAP_WIDTH_PX, MAP_HEIGHT_PX), flags)
+        layer = self.layers[name]
+        layer.fill((0, 0, 0, 0))
+        draw(layer)
+        self.states[name] = state
+        self.redraws[name] = self.redraws.get(name, 0) + 1
+        return layer
+
+    # Puts in a layer which is kept up to date somewhere else (see fog_mask.py), rather than drawn here.
+    # changed says whether it's any different from the last time it was put in.
+    def put(self, name, surface, changed):
+        if changed or self.layers.get(name) is not surface:
+            self.redraws[name] = self.redraws.get(name, 0) + 1
+        self.layers[name] = surface
+
+    # Returns the named layers stacked on top of each other, bottom first
+    def stack(self, names):
+        stacked_from = tuple((name, self.redraws[name]) for name in names)
+        if stacked_from != self.stacked_from:
+            for name in names:
+                self.stacked.blit(self.layers[name], (0, 0))
+            self.stacked_from = stacked_from
+        return self.stacked
+
+    # Forces every layer to be redrawn the next time it's asked for
+    def clear(self):
+        self.states = {}
+        self.stacked_from = None
@@ -0,0 +1,89 @@
+# Records every order given in a game, turn by turn, so that the game can be played out again headless
+# and as fast as its turns can be run (see replay_order_log() in turn_engine.py). The map and every AI
+# decision follow from the game's seed, so the only things the log has to hold are what the seed can't
+# give: the player's orders (deployments, waypoint edits, ships sent from the reenforcement pool) and
+# the toggles which change how turns play out (hard mode, watch mode, AI workers). Debug mode and the
+# other toggles only change what's drawn, and aren't recorded.
+#
+# The orders the AI gave each turn are recorded as well, as the fleets it deployed, along with how long
+# the turn took. A replay compares them against its own, to find the first turn where it no longer
+# plays out the game it came from, and the recorded times point out the turns worth looking at.
+#
+# The log is a JSON lines file. It opens with a "start" line holding the seed, the size of the map and
+# the dice battles are rolled with (see TurnEngine.combat_numpy), and for a game which didn't start from
+# its seed (one that was loaded, or already under way when recording began) a save of it as well (see
+# save_game.py). Each turn that is ended adds a "turn" line with the orders given before it was ended
+# and the fleets the AI deployed while it ran. Loading a saved game part way through adds another
+# "start" line.
+
+import json
+from base64 import b64encode, b64decode
+from constants import *
+from save_game import encode_game, decode_game
+
+class OrderLog:
+    # With no path, nothing is written and the last line is only kept in last_line (which is how a
+    # replay checks itself against the log it's playing out)
+    def __init__(self, path=None):
+        self.file = open(path, "w") if path is not None else None
+        self.orders = []
+        self.last_line = None
+
+    # from_seed says whether the game is as it was generated from its seed, or needs saving in full
+    def start(self, engine, from_seed):
+        save = None if from_seed else b64encode(encode_game(engine)).decode("ascii")
+        self.write({"start": engine.turn, "version": VERSION, "seed": engine.rng.seed,
+                    "map_size": [engine.star_map.width_px, engine.star_map.height_px],
+                    "debug_mode": engine.debug_mode, "combat_numpy": engine.combat_numpy, "save": save})
+        self.orders = []
+
+    def order(self, *order):
+        self.orders.append(list(order))
+
+    def turn_ended(self, turn, ai_fleets, seconds):
+        ai = [[i.faction_type.value, i.destination.index, i.ships] for i in ai_fleets]
+        self.write({"turn": turn, "orders": self.orders, "ai": ai, "seconds": round(seconds, 6)})
+        self.orders = []
+
+    def write(self, line):
+        self.last_line = line
+        if self.file is not None:
+            self.file.write(json.dumps(line) + "\n")
+            self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+def read_order_log(path):
+    with open(path) as log_file:
+        return [json.loads(line) for line in log_file if line.strip() != ""]
+
+# Puts a game in the state a "start" line describes
+def start_from(engine, line):
+    if line["save"] is not None:
+        decode_game(engine, b64decode(line["save"]))
+    else:
+        engine.restore_combat_dice(line["combat_numpy"])
+
+# Gives a recorded order to engine again
+def apply_order(engine, order):
+    kind = order[0]
+    locations = engine.star_map.locations
+    if kind == "deploy":
+        engine.deploy_fleet(locations[order[1]], locations[order[2]], order[3])
+    elif kind == "add_waypoint":
+        engine.add_waypoint(engine.star_map.deployed_fleets[order[1]], locations[order[2]])
+    elif kind == "remove_waypoint":
+        engine.remove_waypoint(engine.star_map.deployed_fleets[order[1]], locations[order[2]])
+    elif kind == "reenforce":
+        engine.reenforce(locations[order[1]], order[2])
+    elif kind == "hard_mode":
+        engine.set_hard_mode(order[1])
+    elif kind == "watch_mode":
+        engine.set_watch_mode(order[1])
+    elif kind == "ai_workers":
+        engine.set_ai_workers(order[1])
+    else:
+        raise ValueError("unknown order {}".format(kind))
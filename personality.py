@@ -19,9 +19,9 @@ class Personality:
         self.min_attack_ratio = min_attack_ratio  
         self.max_attack_ratio = max_attack_ratio 
         # base_reserve_threshold is the number of idle ships on a rear system which must exist before it decides to
-        #   move them somewhere towards the front. If this number is very low, and max_activated_reserves is also not
-        #   very low, it will negatively affect performance (because currently each directly routed fleet runs a 
-        #   breadth-first-search to build its waypoint list).
+        #   move them somewhere towards the front. Each directly routed fleet needs a waypoint list from a
+        #   breadth-first-search, but those are cached per faction until it gains or loses a system, so a very low
+        #   value here is no longer the performance problem it used to be.
         self.base_reserve_threshold = base_reserve_threshold
         # base_reserve_pool_threshold is the number at which it decides to pool reserves with nearby ones. 
         #   while base_reserve_threshold is the number at which the AI sends its "charged" shots to the front,
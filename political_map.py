@@ -0,0 +1,140 @@
+import pygame
+from constants import *
+from math import floor
+from faction_type import faction_type_to_color
+from utility import prefix_system_names, secondary_system_names
+from text_cache import text_cache
+
+# A system's label on the political map: its name, with any prefix or secondary name cut down to an initial
+def political_label(name):
+    split = name.split(" ")
+    new_label = []
+    for part in split:
+        if part in prefix_system_names or part in secondary_system_names:
+            new_label.append("{}.".format(part[0]))
+        else:
+            new_label.append(part)
+    label_text = ""
+    index = 0
+    for part in new_label:
+        label_text += part
+        if index < len(new_label):
+            label_text += " "
+        index += 1
+    return label_text
+
+# The political map: one square for each cell of the star map's spawning grid with a star in it, in the
+# color of whoever holds that star (or COLOR_FOG, if the player can't see it), labeled with the star's
+# name. Like FogMask, it's kept from one frame to the next. A cell is only drawn again when its owner or
+# whether it can be seen has changed, and when the camera moves what's already drawn is scrolled along
+# with it and only the strips it uncovers are drawn.
+#
+# Labels are wider than the cells they're in, and each cell is drawn over the labels of the ones before
+# it (going down each column, and then across), so anything drawn again is drawn clipped to the area
+# being redrawn, along with every cell whose label reaches into it, in that same order.
+class PoliticalMap:
+    def __init__(self, cell_side=PARTITION_GRID_SIDE):
+        self.surface = pygame.Surface((MAP_WIDTH_PX, MAP_HEIGHT_PX), pygame.SRCALPHA)
+        self.cell_side = cell_side
+        self.camera = None
+        # every cell on the map, as {(x, y): (location, seen, faction_type)}
+        self.drawn = {}
+        # the label of every system which has been drawn, by location
+        self.labels = {}
+        # how many cells have been drawn
+        self.cells_drawn = 0
+
+    # The (x, y) grid cells whose squares or labels can show up in a view from camera, with a star in them
+    def cells_in_view(self, grid, camera, debug_mode):
+        first_x = floor(camera[0] / self.cell_side) - 1
+        first_y = floor(camera[1] / self.cell_side)
+        last_x = floor((camera[0] + MAP_WIDTH_PX) / self.cell_side) + 1
+        last_y = floor((camera[1] + MAP_HEIGHT_PX) / self.cell_side)
+        cells = {}
+        for x in range(first_x, last_x + 1):
+            for y in range(first_y, last_y + 1):
+                local_system = grid.get((x, y))
+                if local_system is not None:
+                    cells[(x, y)] = (local_system, local_system.in_sensor_view or debug_mode, local_system.faction_type)
+        return cells
+
+    # Brings the map up to date with the star map's grid and with the view's camera. Returns whether
+    # anything on it has changed.
+    def update(self, grid, camera, debug_mode):
+        cells = self.cells_in_view(grid, camera, debug_mode)
+        view = self.surface.get_rect()
+        dirty = []
+        if camera != self.camera:
+            if self.camera is None:
+                dirty.append(view)
+            else:
+                dx = self.camera[0] - camera[0]
+                dy = self.camera[1] - camera[1]
+                if dx != int(dx) or dy != int(dy) or abs(dx) >= MAP_WIDTH_PX or abs(dy) >= MAP_HEIGHT_PX:
+                    dirty.append(view)
+                else:
+                    dx, dy = int(dx), int(dy)
+                    self.surface.scroll(dx, dy)
+                    if dx > 0:
+                        dirty.append(pygame.Rect(0, 0, dx, MAP_HEIGHT_PX))
+                    elif dx < 0:
+                        dirty.append(pygame.Rect(MAP_WIDTH_PX + dx, 0, -dx, MAP_HEIGHT_PX))
+                    if dy > 0:
+                        dirty.append(pygame.Rect(0, 0, MAP_WIDTH_PX, dy))
+                    elif dy < 0:
+                        dirty.append(pygame.Rect(0, MAP_HEIGHT_PX + dy, MAP_WIDTH_PX, -dy))
+            self.camera = camera
+        if view not in dirty:
+            # cells which have been taken or lost, or have come in to or gone out of sight
+            for cell in cells:
+                if cells[cell] != self.drawn.get(cell) and cell in self.drawn:
+                    dirty.append(self.rect_of(cell).clip(view))
+        self.drawn = cells
+        for rect in dirty:
+            self.repaint(rect)
+        return len(dirty) > 0
+
+    # The square of a cell, in the view
+    def rect_of(self, cell):
+        return pygame.Rect(cell[0] * self.cell_side - self.camera[0], cell[1] * self.cell_side - self.camera[1],
+                           self.cell_side, self.cell_side)
+
+    # Clears rect (in the view), and draws every cell which reaches in to it again
+    def repaint(self, rect):
+        if rect.width == 0 or rect.height == 0:
+            return
+        self.surface.set_clip(rect)
+        self.surface.fill((0, 0, 0, 0), rect)
+        # a label reaches at most one cell past either side of its own
+        first_x = floor((rect.left + self.camera[0]) / self.cell_side) - 1
+        first_y = floor((rect.top + self.camera[1]) / self.cell_side)
+        last_x = floor((rect.right - 1 + self.camera[0]) / self.cell_side) + 1
+        last_y = floor((rect.bottom - 1 + self.camera[1]) / self.cell_side)
+        for x in range(first_x, last_x + 1):
+            for y in range(first_y, last_y + 1):
+                if (x, y) in self.drawn:
+                    self.draw_cell((x, y))
+        self.surface.set_clip(None)
+
+    def draw_cell(self, cell):
+        local_system, seen, faction_type = self.drawn[cell]
+        rect = self.rect_of(cell)
+        # The square with a black border. pygame.draw.rect() draws a border differently when all but a row
+        # or two of the rect is off the surface, and Surface.fill() doesn't shrink a rect hanging off the
+        # top or left of it, either of which would show wherever the camera left a cell cut off.
+        view = self.surface.get_rect()
+        self.surface.fill("black", rect.clip(view))
+        self.surface.fill(faction_type_to_color(faction_type) if seen else COLOR_FOG, rect.inflate(-2, -2).clip(view))
+        label_text = self.labels.get(local_system)
+        if label_text is None:
+            label_text = political_label(local_system.name)
+            self.labels[local_system] = label_text
+        label = text_cache.render(label_text, POLITICAL_MAP_FONT_SIZE, "green", "black")
+        label_x = rect.left + floor(self.cell_side / 2 - label.get_width() / 2)
+        label_y = rect.top + floor(self.cell_side / 2 - label.get_height() / 2)
+        self.surface.blit(label, (label_x, label_y))
+        self.cells_drawn += 1
+
+    # Forces the whole map to be drawn again on the next update()
+    def clear(self):
+        self.camera = None
@@ -0,0 +1,29 @@
+from random import Random, SystemRandom
+
+# Every game draws its random numbers from its own GameRandom rather than from the global `random`
+# module, split in to separate streams so that one part of the game using more or fewer random numbers
+# (say, a battle being shown in tactical mode, or the AI changing) doesn't shift the rolls everywhere
+# else. Each stream is seeded from the game's seed and the stream's name, so a given seed always plays
+# out the same game.
+#   map: generating the StarMap
+#   ai: Faction decision making
+#   combat: battles, last stands and charges
+#   raids: pirates, from their own systems and from off the map
+#   events: reenforcements, the coalition, and the exogalactic invasion
+#   cosmetic: anything which is only for show (tactical battle sprites, decimated planets)
+RNG_STREAMS = ["map", "ai", "combat", "raids", "events", "cosmetic"]
+
+class GameRandom:
+    def __init__(self, seed=None):
+        if seed is None:
+            seed = SystemRandom().getrandbits(32)
+        self.seed = seed
+        self.streams = {}
+        for name in RNG_STREAMS:
+            self.streams[name] = Random("{}:{}".format(seed, name))
+        self.map = self.streams["map"]
+        self.ai = self.streams["ai"]
+        self.combat = self.streams["combat"]
+        self.raids = self.streams["raids"]
+        self.events = self.streams["events"]
+        self.cosmetic = self.streams["cosmetic"]
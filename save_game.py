@@ -0,0 +1,416 @@
+import struct
+import sys
+import zlib
+from array import array
+from constants import *
+from star_map import StarMap
+from location import Location, LocationType
+from fleet import Fleet
+from faction import Faction, CenterOfGravity
+from faction_type import FactionType
+from console import ConsoleLog
+from battle_graph import BattleGraph
+from combat_resolver import CombatRecord
+from rng import GameRandom, RNG_STREAMS
+from personality import SnappingTurtle, Water, Haymaker
+from starfield_cache import starfield_cache
+
+# Saved games are written in a compact binary format: a header (SAVE_MAGIC, then SAVE_FORMAT_VERSION),
+# and then a zlib-compressed body made of columns. A column is a count followed by that many numbers of
+# one type (as in the array module, stored little-endian), or a run of UTF-8 strings. Everything of a
+# kind is kept in one column rather than record by record, so that the map's systems are written and
+# read as a handful of columns of numbers whatever its size. Systems, fleets and graphs refer to each
+# other by their index in their own lists.
+#
+# The schema is the order the columns are written in below. Whenever it changes, SAVE_FORMAT_VERSION
+# has to go up. Saves from another version are refused rather than misread.
+#
+# Only the state of the game itself is saved. Starfields aren't (they're drawn from their seeds when
+# needed), and neither are caches which can be worked out again (path trees, the spatial index) or
+# what's on screen (see Game.game_loaded()).
+SAVE_MAGIC = b"SECTOR34"
+
+class SaveGameError(Exception):
+    pass
+
+# TurnEngine fields which are saved as they are, by type
+ENGINE_BOOL_FIELDS = ["debug_mode", "watch_mode", "hard_mode", "coalition_triggered", "last_faction_buff",
+                      "last_faction_buff_triggered", "exogalactic_invasion_begun", "invasion_fleets_spawned",
+                      "game_over_mode", "all_pirates_destroyed", "all_ai_empires_destroyed", "victory_mode"]
+ENGINE_INT_FIELDS = ["remaining_factions", "exogalactic_invasion_countdown", "invasion_waves_completed",
+                     "turn_of_last_wave", "coalition_trigger", "turn", "player_reenforcement_pool", "battles_won",
+                     "battles_lost", "ships_lost", "ships_destroyed", "ffa_stage_turn", "biggest_battle",
+                     "turns_processed"]
+ENGINE_FLOAT_FIELDS = ["conquest_percent", "turn_processing_seconds"]
+# these are False until the stage they mark begins, and then the turn it began on
+ENGINE_STAGE_FIELDS = ["coalition_stage_turn", "invader_stage_turn"]
+ENGINE_STATS_FIELDS = ["ships_over_time", "veteran_ships_over_time", "enemy_ships_over_time", "systems_over_time",
+                       "deployed_fleets_over_time", "decimated_systems_over_time"]
+# CombatRecord fields with one value per round
+RECORD_ROUND_FIELDS = ["attacker_losses", "defender_losses", "attackers_remaining", "defenders_remaining",
+                       "fleet_widths", "attacker_bonus_dice", "defender_bonus_dice"]
+PERSONALITIES = {i().name: i for i in [SnappingTurtle, Water, Haymaker]}
+
+class SaveWriter:
+    def __init__(self):
+        self.parts = []
+
+    # A column of numbers, typecode as in the array module
+    def numbers(self, typecode, values):
+        column = array(typecode, values)
+        if sys.byteorder == "big":
+            column.byteswap()
+        self.parts.append(struct.pack("<I", len(column)))
+        self.parts.append(column.tobytes())
+
+    def strings(self, values):
+        encoded = [i.encode("utf-8") for i in values]
+        self.numbers("I", [len(i) for i in encoded])
+        self.parts.append(b"".join(encoded))
+
+    def data(self):
+        return b"".join(self.parts)
+
+class SaveReader:
+    def __init__(self, data):
+        self.data = data
+        self.offset = 0
+
+    def numbers(self, typecode):
+        count = struct.unpack_from("<I", self.data, self.offset)[0]
+        self.offset += 4
+        column = array(typecode)
+        end = self.offset + count * column.itemsize
+        if end > len(self.data):
+            raise SaveGameError("saved game is cut short")
+        column.frombytes(self.data[self.offset:end])
+        if sys.byteorder == "big":
+            column.byteswap()
+        self.offset = end
+        return column
+
+    def strings(self):
+        strings = []
+        for length in self.numbers("I"):
+            strings.append(self.data[self.offset:self.offset + length].decode("utf-8"))
+            self.offset += length
+        return strings
+
+# Stands in for the map's random stream when Locations are made for a saved game. Everything a new
+# Location rolls is overwritten from the save, so nothing is really rolled.
+class NoRolls:
+    def randint(self, a, b):
+        return a
+
+    def getrandbits(self, k):
+        return 0
+
+def faction_type_value(faction_type):
+    return -1 if faction_type is None else faction_type.value
+
+def faction_type_of(value):
+    return None if value < 0 else FactionType(value)
+
+def index_or_none(index, items):
+    return None if index < 0 else items[index]
+
+# Returns the whole state of engine (a TurnEngine or a Game) as the bytes of a saved game
+def encode_game(engine):
+    writer = SaveWriter()
+    star_map = engine.star_map
+    locations = star_map.locations
+    index_of = {loc: index for index, loc in enumerate(locations)}
+
+    # the engine
+    writer.numbers("b", [getattr(engine, i) for i in ENGINE_BOOL_FIELDS])
+    writer.numbers("q", [getattr(engine, i) for i in ENGINE_INT_FIELDS])
+    writer.numbers("d", [getattr(engine, i) for i in ENGINE_FLOAT_FIELDS])
+    writer.numbers("q", [-1 if getattr(engine, i) is False else getattr(engine, i) for i in ENGINE_STAGE_FIELDS])
+    writer.strings(["" if engine.invasion_direction is None else engine.invasion_direction])
+    # the dice battles are rolled with (see TurnEngine.combat_numpy)
+    writer.strings(["" if engine.combat_numpy is None else engine.combat_numpy])
+    for field in ENGINE_STATS_FIELDS:
+        writer.numbers("q", getattr(engine, field))
+
+    # the random streams, exactly where they are
+    writer.strings([str(engine.rng.seed)])
+    for name in RNG_STREAMS:
+        version, internal_state, gauss_next = engine.rng.streams[name].getstate()
+        writer.numbers("q", [version] + list(internal_state))
+        writer.numbers("d", [] if gauss_next is None else [gauss_next])
+
+    # the map
+    writer.numbers("q", [star_map.width_px, star_map.height_px, star_map.star_names_exhausted, index_of[star_map.player_hw]])
+    writer.numbers("b", [i.value for i in star_map.faction_names])
+    writer.strings(star_map.faction_names.values())
+    writer.numbers("q", [index_of[i] for i in star_map.faction_homeworlds])
+    writer.strings(star_map.catalogue_numbers.keys())
+    writer.numbers("q", star_map.catalogue_numbers.values())
+    writer.strings([i.name for i in locations])
+    writer.numbers("q", [i.pos[0] for i in locations])
+    writer.numbers("q", [i.pos[1] for i in locations])
+    writer.numbers("q", [i.grid_pos[0] for i in locations])
+    writer.numbers("q", [i.grid_pos[1] for i in locations])
+    writer.numbers("b", [faction_type_value(i.faction_type) for i in locations])
+    writer.numbers("q", [i.ships for i in locations])
+    writer.numbers("q", [i.reenforce_chance_out_of_100 for i in locations])
+    writer.numbers("q", [i.sensor_range for i in locations])
+    writer.numbers("b", [i.in_sensor_view for i in locations])
+    writer.numbers("q", [i.starfield_seed for i in locations])
+    writer.numbers("q", [-1 if i.decimation_seed is None else i.decimation_seed for i in locations])
+    writer.numbers("b", [i.decimated for i in locations])
+    writer.numbers("b", [i.rallying for i in locations])
+    writer.numbers("q", [-1 if i.rally_target is None else index_of[i.rally_target] for i in locations])
+    writer.numbers("q", [i.rally_amount for i in locations])
+    writer.numbers("q", [i.battles for i in locations])
+    writer.numbers("q", [i.veterancy_out_of_100 for i in locations])
+    # the fuel-range graph takes a while to work out on a big map, so it's saved rather than rebuilt
+    writer.numbers("i", star_map.neighbor_offsets)
+    writer.numbers("i", star_map.neighbor_indices)
+    writer.numbers("d", star_map.neighbor_distances)
+
+    # fleets
+    fleets = star_map.deployed_fleets
+    writer.strings([i.name for i in fleets])
+    writer.numbers("d", [i.pos[0] for i in fleets])
+    writer.numbers("d", [i.pos[1] for i in fleets])
+    writer.numbers("b", [faction_type_value(i.faction_type) for i in fleets])
+    writer.numbers("q", [i.ships for i in fleets])
+    writer.numbers("q", [index_of[i.destination] for i in fleets])
+    writer.numbers("b", [i.in_sensor_view for i in fleets])
+    writer.numbers("d", [i.sensor_range for i in fleets])
+    writer.numbers("b", [i.to_be_removed for i in fleets])
+    writer.numbers("q", [i.veterancy_out_of_100 for i in fleets])
+    writer.numbers("d", [i.speed for i in fleets])
+    writer.numbers("b", [i.ai_threat_check_flag for i in fleets])
+    writer.numbers("q", [len(i.waypoints) for i in fleets])
+    writer.numbers("q", [index_of[waypoint] for fleet in fleets for waypoint in fleet.waypoints])
+
+    # AI factions, with their centers of gravity (path trees are a cache, and are worked out again)
+    factions = engine.ai_factions
+    writer.numbers("b", [faction_type_value(i.faction_type) for i in factions])
+    writer.strings([i.name for i in factions])
+    writer.strings([i.personality.name for i in factions])
+    writer.numbers("q", [len(i.centers_of_gravity) for i in factions])
+    writer.numbers("q", [index_of[cog.loc] for faction in factions for cog in faction.centers_of_gravity])
+    writer.numbers("q", [cog.turns for faction in factions for cog in faction.centers_of_gravity])
+
+    # the console log, and the battle graphs attached to it
+    messages = engine.console.messages
+    graphs = [i["attachment"] for i in filter(lambda x: x["attachment"] is not None, messages)]
+    graph_index = {id(graph): index for index, graph in enumerate(graphs)}
+    writer.strings([i["msg"] for i in messages])
+    writer.numbers("q", [-1 if i["attachment"] is None else graph_index[id(i["attachment"])] for i in messages])
+    writer.numbers("q", [i.starting_ships["attacker"] for i in graphs])
+    writer.numbers("q", [i.starting_ships["defender"] for i in graphs])
+    writer.numbers("q", [i.xp_bonuses["attacker"] for i in graphs])
+    writer.numbers("q", [i.xp_bonuses["defender"] for i in graphs])
+    writer.numbers("b", [i.charge for i in graphs])
+    writer.numbers("b", [i.last_stand for i in graphs])
+    writer.numbers("q", [i.battle_turn for i in graphs])
+    writer.strings([i.battle_name for i in graphs])
+    writer.strings([i.colors["attacker"] for i in graphs])
+    writer.strings([i.colors["defender"] for i in graphs])
+    records = [i.record for i in graphs]
+    writer.numbers("q", [i.starting_attackers for i in records])
+    writer.numbers("q", [i.starting_defenders for i in records])
+    writer.numbers("q", [i.attacker_bonus for i in records])
+    writer.numbers("q", [i.defender_bonus for i in records])
+    writer.numbers("b", [i.keep_rolls for i in records])
+    writer.numbers("b", [i.retreat for i in records])
+    writer.numbers("q", [i.num_rounds() for i in records])
+    for field in RECORD_ROUND_FIELDS:
+        writer.numbers("q", [value for record in records for value in getattr(record, field)])
+    writer.numbers("b", [value for record in records for value in record.attacker_brilliancies])
+    writer.numbers("b", [value for record in records for value in record.defender_brilliancies])
+    for field in ["attacker_rolls", "defender_rolls"]:
+        rolls = [roll for record in records for roll in getattr(record, field)]
+        writer.numbers("q", [len(i) for i in rolls])
+        writer.numbers("q", [value for roll in rolls for value in roll])
+
+    header = SAVE_MAGIC + struct.pack("<H", SAVE_FORMAT_VERSION)
+    return header + zlib.compress(writer.data(), SAVE_COMPRESSION_LEVEL)
+
+# Splits values in to consecutive lists of the given lengths
+def split(values, lengths):
+    lists = []
+    start = 0
+    for length in lengths:
+        lists.append(list(values[start:start + length]))
+        start += length
+    return lists
+
+# Replaces the state of engine (a TurnEngine or a Game) with that of a saved game. Nothing is changed
+# if the save can't be read.
+def decode_game(engine, data):
+    header_size = len(SAVE_MAGIC) + 2
+    if len(data) < header_size or data[:len(SAVE_MAGIC)] != SAVE_MAGIC:
+        raise SaveGameError("not a saved game")
+    version = struct.unpack_from("<H", data, len(SAVE_MAGIC))[0]
+    if version != SAVE_FORMAT_VERSION:
+        raise SaveGameError("saved game is version {}, but this version of the game reads version {}".format(version, SAVE_FORMAT_VERSION))
+    try:
+        body = zlib.decompress(data[header_size:])
+    except zlib.error:
+        raise SaveGameError("saved game is corrupt")
+    reader = SaveReader(body)
+
+    # the engine
+    fields = {}
+    fields.update(zip(ENGINE_BOOL_FIELDS, [bool(i) for i in reader.numbers("b")]))
+    fields.update(zip(ENGINE_INT_FIELDS, reader.numbers("q")))
+    fields.update(zip(ENGINE_FLOAT_FIELDS, reader.numbers("d")))
+    fields.update(zip(ENGINE_STAGE_FIELDS, [False if i < 0 else i for i in reader.numbers("q")]))
+    invasion_direction = reader.strings()[0]
+    fields["invasion_direction"] = None if invasion_direction == "" else invasion_direction
+    combat_numpy = reader.strings()[0]
+    for field in ENGINE_STATS_FIELDS:
+        fields[field] = list(reader.numbers("q"))
+
+    # the random streams
+    rng = GameRandom(int(reader.strings()[0]))
+    for name in RNG_STREAMS:
+        state = reader.numbers("q")
+        gauss_next = reader.numbers("d")
+        rng.streams[name].setstate((state[0], tuple(state[1:]), gauss_next[0] if len(gauss_next) > 0 else None))
+
+    # the map, with the systems placed in it just as they were when it was generated
+    width_px, height_px, star_names_exhausted, player_hw = reader.numbers("q")
+    star_map = StarMap(fields["debug_mode"], rng.map, width_px, height_px, generate=False)
+    star_map.star_names_exhausted = bool(star_names_exhausted)
+    star_map.faction_names = dict(zip([FactionType(i) for i in reader.numbers("b")], reader.strings()))
+    faction_homeworlds = reader.numbers("q")
+    star_map.catalogue_numbers = dict(zip(reader.strings(), reader.numbers("q")))
+    names = reader.strings()
+    xs, ys, grid_xs, grid_ys = reader.numbers("q"), reader.numbers("q"), reader.numbers("q"), reader.numbers("q")
+    rolls = NoRolls()
+    locations = [Location(names[i], (xs[i], ys[i]), LocationType.STAR_SYSTEM, (grid_xs[i], grid_ys[i]), rolls) for i in range(len(names))]
+    for loc, faction_type in zip(locations, reader.numbers("b")):
+        loc.faction_type = faction_type_of(faction_type)
+    for field in ["ships", "reenforce_chance_out_of_100", "sensor_range"]:
+        for loc, value in zip(locations, reader.numbers("q")):
+            setattr(loc, field, value)
+    for loc, value in zip(locations, reader.numbers("b")):
+        loc.in_sensor_view = bool(value)
+    for loc, value in zip(locations, reader.numbers("q")):
+        loc.starfield_seed = value
+    for loc, value in zip(locations, reader.numbers("q")):
+        loc.decimation_seed = None if value < 0 else value
+    for field in ["decimated", "rallying"]:
+        for loc, value in zip(locations, reader.numbers("b")):
+            setattr(loc, field, bool(value))
+    for loc, value in zip(locations, reader.numbers("q")):
+        loc.rally_target = index_or_none(value, locations)
+    for field in ["rally_amount", "battles", "veterancy_out_of_100"]:
+        for loc, value in zip(locations, reader.numbers("q")):
+            setattr(loc, field, value)
+    for index, loc in enumerate(locations):
+        loc.index = index
+    star_map.locations = locations
+    star_map.num_stars = len(locations)
+    star_map.player_hw = locations[player_hw]
+    star_map.faction_homeworlds = [locations[i] for i in faction_homeworlds]
+    star_map.star_names = set(names)
+    # Stars went in to the grid and the spatial index as they were generated, a column at a time.
+    # Which of two equally near stars the index finds first depends on that order, so it's kept.
+    for loc in sorted(locations, key=lambda x: x.grid_pos):
+        star_map.grid[loc.grid_pos] = loc
+        star_map.spatial_index.insert(loc)
+    star_map.neighbor_offsets = reader.numbers("i")
+    star_map.neighbor_indices = reader.numbers("i")
+    star_map.neighbor_distances = reader.numbers("d")
+
+    # fleets
+    names = reader.strings()
+    xs, ys = reader.numbers("d"), reader.numbers("d")
+    faction_types, ships, destinations = reader.numbers("b"), reader.numbers("q"), reader.numbers("q")
+    in_sensor_view, sensor_ranges, to_be_removed = reader.numbers("b"), reader.numbers("d"), reader.numbers("b")
+    veterancy, speeds, ai_threat_check_flags = reader.numbers("q"), reader.numbers("d"), reader.numbers("b")
+    waypoint_counts = reader.numbers("q")
+    waypoints = split(reader.numbers("q"), waypoint_counts)
+    for i in range(len(names)):
+        fleet = Fleet(names[i], (xs[i], ys[i]), faction_type_of(faction_types[i]), ships[i], locations[destinations[i]], veterancy[i])
+        fleet.in_sensor_view = bool(in_sensor_view[i])
+        fleet.sensor_range = sensor_ranges[i]
+        fleet.to_be_removed = bool(to_be_removed[i])
+        fleet.speed = speeds[i]
+        fleet.ai_threat_check_flag = bool(ai_threat_check_flags[i])
+        fleet.waypoints = [locations[j] for j in waypoints[i]]
+        star_map.deployed_fleets.append(fleet)
+
+    # AI factions are made for the engine once the map is in place (below)
+    faction_types, faction_names, personalities = reader.numbers("b"), reader.strings(), reader.strings()
+    for personality in personalities:
+        if personality not in PERSONALITIES:
+            raise SaveGameError("saved game has an unknown AI personality, {}".format(personality))
+    cog_counts = reader.numbers("q")
+    cogs = split(list(zip(reader.numbers("q"), reader.numbers("q"))), cog_counts)
+
+    # the console log, and the battle graphs attached to it
+    messages = reader.strings()
+    attachments = reader.numbers("q")
+    starting_attackers, starting_defenders = reader.numbers("q"), reader.numbers("q")
+    xp_attackers, xp_defenders = reader.numbers("q"), reader.numbers("q")
+    charges, last_stands, battle_turns = reader.numbers("b"), reader.numbers("b"), reader.numbers("q")
+    battle_names, attacker_colors, defender_colors = reader.strings(), reader.strings(), reader.strings()
+    graphs = []
+    for i in range(len(battle_names)):
+        graph = BattleGraph(starting_attackers[i], starting_defenders[i])
+        graph.xp_bonuses = {"attacker": xp_attackers[i], "defender": xp_defenders[i]}
+        graph.charge = bool(charges[i])
+        graph.last_stand = bool(last_stands[i])
+        graph.battle_turn = battle_turns[i]
+        graph.battle_name = battle_names[i]
+        graph.colors = {"attacker": attacker_colors[i], "defender": defender_colors[i]}
+        graphs.append(graph)
+    record_fields = [reader.numbers("q") for _ in range(4)]
+    keep_rolls, retreats, num_rounds = reader.numbers("b"), reader.numbers("b"), reader.numbers("q")
+    records = []
+    for graph, attackers, defenders, attacker_bonus, defender_bonus, keep in zip(graphs, *record_fields, keep_rolls):
+        graph.record = CombatRecord(attackers, defenders, attacker_bonus, defender_bonus, bool(keep))
+        records.append(graph.record)
+    for record, retreat in zip(records, retreats):
+        record.retreat = bool(retreat)
+    for field in RECORD_ROUND_FIELDS:
+        for record, values in zip(records, split(reader.numbers("q"), num_rounds)):
+            setattr(record, field, values)
+    for field in ["attacker_brilliancies", "defender_brilliancies"]:
+        for record, values in zip(records, split(reader.numbers("b"), num_rounds)):
+            setattr(record, field, [bool(i) for i in values])
+    for field in ["attacker_rolls", "defender_rolls"]:
+        lengths = reader.numbers("q")
+        rolls = split(reader.numbers("q"), lengths)
+        # only records which kept their rolls have any, one per round
+        rolls_per_record = split(rolls, [num_rounds[i] if keep_rolls[i] else 0 for i in range(len(records))])
+        for record, values in zip(records, rolls_per_record):
+            setattr(record, field, values)
+    console = ConsoleLog()
+    for msg, attachment in zip(messages, attachments):
+        console.push(msg, index_or_none(attachment, graphs))
+
+    # Everything has been read, so the engine can take it all on
+    for field, value in fields.items():
+        setattr(engine, field, value)
+    engine.rng = rng
+    engine.star_map = star_map
+    engine.console = console
+    engine.restore_combat_dice(None if combat_numpy == "" else combat_numpy)
+    engine.ai_factions = []
+    for faction_type, name, personality, faction_cogs in zip(faction_types, faction_names, personalities, cogs):
+        faction = Faction(FactionType(faction_type), engine, PERSONALITIES[personality]())
+        faction.name = name
+        faction.centers_of_gravity = [CenterOfGravity(locations[loc], turns, engine) for loc, turns in faction_cogs]
+        engine.ai_factions.append(faction)
+    # starfields cached for the game being replaced belong to Locations which no longer exist
+    starfield_cache.clear()
+    engine.game_loaded()
+
+def save_game(engine, path=SAVE_GAME_PATH):
+    data = encode_game(engine)
+    with open(path, "wb") as save_file:
+        save_file.write(data)
+
+def load_game(engine, path=SAVE_GAME_PATH):
+    with open(path, "rb") as save_file:
+        data = save_file.read()
+    decode_game(engine, data)
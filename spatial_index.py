@@ -0,0 +1,127 @@
+from constants import *
+from math import floor
+
+# A uniform grid which buckets anything with a .pos (star systems, for now) in
+# to square cells. Stars never move once the map is generated, so range and
+# nearest-neighbor queries only have to look at the cells around a point rather
+# than at every star on the map. Distances are compared squared, in pixels.
+class SpatialIndex:
+    def __init__(self, cell_side=PARTITION_GRID_SIDE):
+        self.cell_side = cell_side
+        self.cells = {}
+        self.size = 0
+        # bounds of the occupied cells, as (min_x, min_y, max_x, max_y)
+        self.bounds = None
+
+    def cell_of(self, pos):
+        return (floor(pos[0] / self.cell_side), floor(pos[1] / self.cell_side))
+
+    def insert(self, item):
+        cell = self.cell_of(item.pos)
+        if cell not in self.cells:
+            self.cells[cell] = []
+        self.cells[cell].append(item)
+        self.size += 1
+        if self.bounds is None:
+            self.bounds = (cell[0], cell[1], cell[0], cell[1])
+        else:
+            self.bounds = (min(self.bounds[0], cell[0]), min(self.bounds[1], cell[1]),
+                           max(self.bounds[2], cell[0]), max(self.bounds[3], cell[1]))
+
+    # Yields the buckets of every occupied cell overlapping the square around pos
+    def buckets_near(self, pos, radius_px):
+        min_x, min_y = self.cell_of((pos[0] - radius_px, pos[1] - radius_px))
+        max_x, max_y = self.cell_of((pos[0] + radius_px, pos[1] + radius_px))
+        for x in range(min_x, max_x + 1):
+            for y in range(min_y, max_y + 1):
+                bucket = self.cells.get((x, y))
+                if bucket is not None:
+                    yield bucket
+
+    # Returns everything within radius_px of pos (inclusive)
+    def in_range_of(self, pos, radius_px):
+        x, y = pos[0], pos[1]
+        radius_squared = radius_px * radius_px
+        in_range = []
+        for bucket in self.buckets_near(pos, radius_px):
+            for item in bucket:
+                dx = item.pos[0] - x
+                dy = item.pos[1] - y
+                if dx * dx + dy * dy <= radius_squared:
+                    in_range.append(item)
+        return in_range
+
+    # Whether anything at all is within radius_px of pos (inclusive)
+    def any_in_range_of(self, pos, radius_px):
+        x, y = pos[0], pos[1]
+        radius_squared = radius_px * radius_px
+        for bucket in self.buckets_near(pos, radius_px):
+            for item in bucket:
+                dx = item.pos[0] - x
+                dy = item.pos[1] - y
+                if dx * dx + dy * dy <= radius_squared:
+                    return True
+        return False
+
+    # Returns everything inside rect, as (x, y, width, height)
+    def in_rect(self, rect):
+        left, top, right, bottom = rect[0], rect[1], rect[0] + rect[2], rect[1] + rect[3]
+        min_x, min_y = self.cell_of((left, top))
+        max_x, max_y = self.cell_of((right, bottom))
+        in_rect = []
+        for x in range(min_x, max_x + 1):
+            for y in range(min_y, max_y + 1):
+                bucket = self.cells.get((x, y))
+                if bucket is None:
+                    continue
+                for item in bucket:
+                    if left <= item.pos[0] < right and top <= item.pos[1] < bottom:
+                        in_rect.append(item)
+        return in_rect
+
+    # Returns the closest item to pos for which predicate(item) is true, or None.
+    # Searches outwards one ring of cells at a time, and stops as soon as no
+    # unsearched cell could hold anything closer than the best found so far.
+    # Equally close items are broken by the lowest tie_key(item), if given.
+    def nearest(self, pos, predicate=None, tie_key=None):
+        if self.bounds is None:
+            return None
+        x, y = pos[0], pos[1]
+        center_x, center_y = self.cell_of(pos)
+        max_ring = max(center_x - self.bounds[0], self.bounds[2] - center_x,
+                       center_y - self.bounds[1], self.bounds[3] - center_y, 0)
+        closest = None
+        closest_distance_squared = None
+        for ring in range(max_ring + 1):
+            if closest is not None:
+                gap = (ring - 1) * self.cell_side
+                if gap > 0 and gap * gap > closest_distance_squared:
+                    break
+            for cell in self.ring_cells(center_x, center_y, ring):
+                bucket = self.cells.get(cell)
+                if bucket is None:
+                    continue
+                for item in bucket:
+                    if predicate is not None and not predicate(item):
+                        continue
+                    dx = item.pos[0] - x
+                    dy = item.pos[1] - y
+                    distance_squared = dx * dx + dy * dy
+                    if closest is None or distance_squared < closest_distance_squared:
+                        closest = item
+                        closest_distance_squared = distance_squared
+                    elif distance_squared == closest_distance_squared and tie_key is not None and tie_key(item) < tie_key(closest):
+                        closest = item
+        return closest
+
+    # The cells exactly `ring` cells away (in chessboard distance) from a center cell
+    def ring_cells(self, center_x, center_y, ring):
+        if ring == 0:
+            yield (center_x, center_y)
+            return
+        for x in range(center_x - ring, center_x + ring + 1):
+            yield (x, center_y - ring)
+            yield (x, center_y + ring)
+        for y in range(center_y - ring + 1, center_y + ring):
+            yield (center_x - ring, y)
+            yield (center_x + ring, y)
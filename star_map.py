@@ -1,18 +1,35 @@
-from random import choice, randrange, shuffle, randint
 from constants import *
 from location import Location, LocationType
 from faction_type import FactionType, ai_empire_faction_types
 from fleet import Fleet
-from pygame.math import Vector2, clamp
+from spatial_index import SpatialIndex
+from pygame.math import clamp
 from utility import phonetic_index, coin_flip, primary_system_names, secondary_system_names, prefix_system_names, d100, ai_empire_faction_post_labels, ai_empire_faction_pre_labels
-from math import floor
+from math import floor, sqrt, ceil
+from array import array
 
-# TODO: variable sized star maps, for when there is a zooming/scrolling map
-#       and full-screen. 
+# Stars are spawned one to each PARTITION_GRID_SIDE cell, so the number of stars on a map follows from
+# its size. Returns the (width, height) in pixels of a map with about num_stars stars, in the same
+# proportions as the default map.
+def map_size_for_stars(num_stars):
+    default_cells_wide = MAP_WIDTH_PX // PARTITION_GRID_SIDE
+    default_cells_high = MAP_HEIGHT_PX // PARTITION_GRID_SIDE
+    scale = sqrt(num_stars / (default_cells_wide * default_cells_high))
+    cells_wide = max(round(default_cells_wide * scale), 1)
+    cells_high = max(ceil(num_stars / cells_wide), 1)
+    return (cells_wide * PARTITION_GRID_SIDE, cells_high * PARTITION_GRID_SIDE)
+
+# The map can be any size. When it's bigger than the MAP_WIDTH_PX by MAP_HEIGHT_PX view, the
+# view scrolls over it (see Game).
 class StarMap:
-    def __init__(self, debug_mode):
-        self.width = MAP_WIDTH_PX / LY
-        self.height = MAP_HEIGHT_PX / LY
+    # rng is the random stream the map is generated from (GameRandom.map). With generate=False the map
+    # is left empty, to be filled in from a saved game (see save_game.py).
+    def __init__(self, debug_mode, rng, width_px=MAP_WIDTH_PX, height_px=MAP_HEIGHT_PX, generate=True):
+        self.rng = rng
+        self.width_px = width_px
+        self.height_px = height_px
+        self.width = width_px / LY
+        self.height = height_px / LY
         self.locations = []
         self.deployed_fleets = []
         self.player_hw = None
@@ -21,35 +38,47 @@ class StarMap:
         self.faction_names = {}   
         self.faction_names[FactionType.EXOGALACTIC_INVASION] = "Invaders"
         self.num_stars = 0
+        # every star by the spawning grid cell it's in, as (x, y), and every name in use
+        self.grid = {}
+        self.star_names = set()
+        self.star_names_exhausted = False
+        self.catalogue_numbers = {}
+        self.spatial_index = SpatialIndex(PARTITION_GRID_SIDE)
+        # Static fuel-range adjacency, in CSR form: the neighbors of the location at
+        # index i are neighbor_indices[neighbor_offsets[i]:neighbor_offsets[i + 1]],
+        # with their distances (in LY) at the same positions in neighbor_distances.
+        self.neighbor_offsets = array("i")
+        self.neighbor_indices = array("i")
+        self.neighbor_distances = array("d")
 
         def generate_map(): 
             # partition the map into a spawning grid
-            cells_wide = MAP_WIDTH_PX // PARTITION_GRID_SIDE
-            cells_high = MAP_HEIGHT_PX // PARTITION_GRID_SIDE
+            cells_wide = self.width_px // PARTITION_GRID_SIDE
+            cells_high = self.height_px // PARTITION_GRID_SIDE
             for x in range(cells_wide):
                 for y in range(cells_high):
                     while True:
                         # pick a random point within the spawning grid cell
-                        spawn_x = clamp(randrange(x * PARTITION_GRID_SIDE, x * PARTITION_GRID_SIDE + PARTITION_GRID_SIDE),
-                                        MAP_BORDER_SPAWN_PADDING_PX, MAP_WIDTH_PX - MAP_BORDER_SPAWN_PADDING_PX)
-                        spawn_y = clamp(randrange(y * PARTITION_GRID_SIDE, y * PARTITION_GRID_SIDE + PARTITION_GRID_SIDE),
-                                        MAP_BORDER_SPAWN_PADDING_PX, MAP_HEIGHT_PX - MAP_BORDER_SPAWN_PADDING_PX)
+                        spawn_x = clamp(self.rng.randrange(x * PARTITION_GRID_SIDE, x * PARTITION_GRID_SIDE + PARTITION_GRID_SIDE),
+                                        MAP_BORDER_SPAWN_PADDING_PX, self.width_px - MAP_BORDER_SPAWN_PADDING_PX)
+                        spawn_y = clamp(self.rng.randrange(y * PARTITION_GRID_SIDE, y * PARTITION_GRID_SIDE + PARTITION_GRID_SIDE),
+                                        MAP_BORDER_SPAWN_PADDING_PX, self.height_px - MAP_BORDER_SPAWN_PADDING_PX)
                         pos = (spawn_x, spawn_y)
                         # ensure picked spot isn't too close to any already-spawned locations
-                        clear = True
-                        for loc in self.locations:
-                            if loc.ly_to(pos) <= STAR_MIN_DISTANCE_LY:
-                                clear = False
-                                break
+                        clear = not self.spatial_index.any_in_range_of(pos, STAR_MIN_DISTANCE_LY * LY)
                         if clear:
                             name = self.name_a_star_system()
-                            self.locations.append(Location(name, pos, LocationType.STAR_SYSTEM, (x, y)))
+                            loc = Location(name, pos, LocationType.STAR_SYSTEM, (x, y), self.rng)
+                            self.locations.append(loc)
+                            self.grid[(x, y)] = loc
+                            self.star_names.add(name)
+                            self.spatial_index.insert(loc)
                             self.num_stars += 1
                             break
 
         def place_player():
             # player starting world and fleets
-            i = randrange(0, len(self.locations))
+            i = self.rng.randrange(0, len(self.locations))
             self.locations[i].faction_type = FactionType.PLAYER
             self.locations[i].ships = PLAYER_STARTING_SHIPS
             if debug_mode:
@@ -62,7 +91,7 @@ class StarMap:
 
         def place_ai_empires():
             # AI Empire starting worlds and fleets
-            shuffle(self.locations)
+            self.rng.shuffle(self.locations)
             generated = 0
             index = 0
             while generated < NUM_AI_EMPIRES:
@@ -79,22 +108,22 @@ class StarMap:
             for loc in self.faction_homeworlds:
                 if loc.faction_type != FactionType.PLAYER:
                     faction_name = "{}".format(loc.name)
-                    if coin_flip() and len(faction_name) < AI_EMPIRE_FACTION_NAME_SIZE_CONSTRAINT:
-                        faction_name = "{} {}".format(choice(ai_empire_faction_pre_labels), faction_name)
+                    if coin_flip(self.rng) and len(faction_name) < AI_EMPIRE_FACTION_NAME_SIZE_CONSTRAINT:
+                        faction_name = "{} {}".format(self.rng.choice(ai_empire_faction_pre_labels), faction_name)
                     else:
-                        faction_name = "{} {}".format(faction_name, choice(ai_empire_faction_post_labels))
+                        faction_name = "{} {}".format(faction_name, self.rng.choice(ai_empire_faction_post_labels))
                     self.faction_names[loc.faction_type] = faction_name
 
         def place_pirates():
             # Pirate starting worlds and fleets
-            shuffle(self.locations)
+            self.rng.shuffle(self.locations)
             num_pirates = int(self.num_stars * PIRATE_DENSITY)
             generated = 0
             index = 0
             while generated < num_pirates:
                 if self.locations[index].faction_type is None:
                     self.locations[index].faction_type = FactionType.PIRATES
-                    self.locations[index].ships = randint(PIRATES_STARTING_SHIPS_MIN, PIRATES_STARTING_SHIPS_MAX)
+                    self.locations[index].ships = self.rng.randint(PIRATES_STARTING_SHIPS_MIN, PIRATES_STARTING_SHIPS_MAX)
                     if debug_mode:
                         self.locations[index].ships = PIRATE_DEBUG_MODE_SHIPS
                     generated += 1
@@ -106,16 +135,51 @@ class StarMap:
             for loc in self.locations:
                 if loc.faction_type is None:
                     loc.faction_type = FactionType.NON_SPACEFARING
-                    loc.ships = randint(NON_SPACEFARING_STARTING_SHIPS_MIN, NON_SPACEFARING_STARTING_SHIPS_MAX)
+                    loc.ships = self.rng.randint(NON_SPACEFARING_STARTING_SHIPS_MIN, NON_SPACEFARING_STARTING_SHIPS_MAX)
                     if debug_mode:
                         loc.ships = NON_SPACEFARING_DEBUG_MODE_SHIPS
             self.faction_names[FactionType.NON_SPACEFARING] = "Local Forces"
 
-        generate_map()
-        place_player()
-        place_ai_empires()
-        place_pirates()
-        place_non_spacefaring()
+        if generate:
+            generate_map()
+            place_player()
+            place_ai_empires()
+            place_pirates()
+            place_non_spacefaring()
+            self.build_fuel_range_graph()
+
+    # Star positions never change after the map is generated, so every system's
+    # neighborhood within DEFAULT_FUEL_RANGE_LY is worked out once, here.
+    def build_fuel_range_graph(self):
+        for index, loc in enumerate(self.locations):
+            loc.index = index
+        self.neighbor_offsets = array("i", [0])
+        self.neighbor_indices = array("i")
+        self.neighbor_distances = array("d")
+        for loc in self.locations:
+            neighbors = self.spatial_index.in_range_of(loc.pos, DEFAULT_FUEL_RANGE_LY * LY)
+            neighbors.sort(key=lambda x: x.index)
+            for neighbor in neighbors:
+                if neighbor is not loc:
+                    self.neighbor_indices.append(neighbor.index)
+                    dx = neighbor.pos[0] - loc.pos[0]
+                    dy = neighbor.pos[1] - loc.pos[1]
+                    self.neighbor_distances.append(sqrt(dx * dx + dy * dy) / LY)
+            self.neighbor_offsets.append(len(self.neighbor_indices))
+
+    # Returns every other system within fuel range of loc, in the same order as self.locations
+    def neighbors_of(self, loc):
+        locations = self.locations
+        start = self.neighbor_offsets[loc.index]
+        end = self.neighbor_offsets[loc.index + 1]
+        return [locations[i] for i in self.neighbor_indices[start:end]]
+
+    # Like neighbors_of(), but as (neighbor, distance in LY) pairs
+    def neighbor_distances_of(self, loc):
+        locations = self.locations
+        start = self.neighbor_offsets[loc.index]
+        end = self.neighbor_offsets[loc.index + 1]
+        return [(locations[self.neighbor_indices[i]], self.neighbor_distances[i]) for i in range(start, end)]
 
     def get_faction_homeworld(self, faction):
         for loc in self.faction_homeworlds:
@@ -123,17 +187,28 @@ class StarMap:
                 return loc
         return None
 
+    # On big maps the stock names run out. Once SYSTEM_NAME_ATTEMPTS tries in a row have all been
+    # taken, the name picked is given a catalogue number instead, and from then on every name is.
     def name_a_star_system(self):
+        attempts = 0
         while True:
-            name = choice(primary_system_names)
-            if d100()[0] <= SYSTEM_PREFIX_CHANCE_OUT_OF_100:
-                prefix = choice(prefix_system_names)
+            name = self.rng.choice(primary_system_names)
+            if d100(rng=self.rng)[0] <= SYSTEM_PREFIX_CHANCE_OUT_OF_100:
+                prefix = self.rng.choice(prefix_system_names)
                 name = "{} {}".format(prefix, name)
-            if d100()[0] <= SYSTEM_SECONDARY_CHANCE_OUT_OF_100:
-                suffix = choice(secondary_system_names)
+            if d100(rng=self.rng)[0] <= SYSTEM_SECONDARY_CHANCE_OUT_OF_100:
+                suffix = self.rng.choice(secondary_system_names)
                 name = "{} {}".format(name, suffix)
-            if name not in [i for i in map(lambda x: x.name, self.locations)]:
+            if name not in self.star_names and not self.star_names_exhausted:
                 return name
+            attempts += 1
+            if attempts >= SYSTEM_NAME_ATTEMPTS or self.star_names_exhausted:
+                self.star_names_exhausted = True
+                number = self.catalogue_numbers.get(name, 2)
+                while "{} {}".format(name, number) in self.star_names:
+                    number += 1
+                self.catalogue_numbers[name] = number + 1
+                return "{} {}".format(name, number)
 
     def get_num_fleets_of_faction(self, faction):
         return len([i for i in filter(lambda x: x.faction_type == faction, self.deployed_fleets)])
@@ -145,22 +220,16 @@ class StarMap:
         if fleet in self.deployed_fleets:
             self.deployed_fleets.remove(fleet)
 
+    # Like neighbors_of(), but including loc itself, at its place in map order
     def systems_in_range_of(self, loc):
-        return [i for i in filter(lambda x: x.ly_to(loc.pos) <= DEFAULT_FUEL_RANGE_LY, self.locations)]
+        neighbors = self.neighbors_of(loc)
+        before = [i for i in filter(lambda x: x.index < loc.index, neighbors)]
+        return before + [loc] + neighbors[len(before):]
 
     # Returns closest friendly world for a fleet,
     # or None if there are none to be found
     def nearest_friendly_world_to(self, fleet):
-        closest = None
-        for loc in self.locations:
-            if loc.faction_type == fleet.faction_type:
-                if closest is None:
-                    closest = loc
-                else:
-                    distance = Vector2(loc.pos).distance_to(Vector2(fleet.pos)) / LY
-                    if distance < Vector2(closest.pos).distance_to(Vector2(fleet.pos)) / LY:
-                        closest = loc
-        return closest
+        return self.spatial_index.nearest(fleet.pos, lambda x: x.faction_type == fleet.faction_type, lambda x: x.index)
 
     def deploy_fleet(self, source, dest, num_ships, ai_threat_check_flag=False, pre_waypoints=None):
         if num_ships < 1: 
@@ -190,7 +259,8 @@ class StarMap:
             source.ships -= num_ships
 
     def nearest_vulnerable_world_to(self, fleet):
-        neighbors = [i for i in filter(lambda x: x.ly_to(fleet.pos) <= DEFAULT_FUEL_RANGE_LY, self.locations)]
+        neighbors = self.spatial_index.in_range_of(fleet.pos, DEFAULT_FUEL_RANGE_LY * LY)
+        neighbors.sort(key=lambda x: x.index)
         weakest = None
         for loc in neighbors:
             if weakest is None:
@@ -201,9 +271,8 @@ class StarMap:
 
     def player_is_aware_of(self, pos):
         # can be seen by any fleet or location owned by the player
-        owned_systems = [i for i in filter(lambda x: x.faction_type == FactionType.PLAYER, self.locations)]
-        for owned_loc in owned_systems:
-            if owned_loc.ly_to(pos) <= owned_loc.sensor_range:
+        for owned_loc in self.spatial_index.in_range_of(pos, MAX_SENSOR_RANGE_LY * LY + 1):
+            if owned_loc.faction_type == FactionType.PLAYER and owned_loc.ly_to(pos) <= owned_loc.sensor_range:
                 return True
         owned_fleets = [i for i in filter(lambda x: x.faction_type == FactionType.PLAYER, self.deployed_fleets)]
         for owned_fleet in owned_fleets:
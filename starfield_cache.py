@@ -0,0 +1,50 @@
+from constants import *
+from collections import OrderedDict
+
+# A least-recently-used cache of generated starfields, keyed by Location. A starfield is a full-screen
+# Surface, so only a handful are kept around at once: when the total size goes over max_bytes, the
+# starfields which have gone the longest without being shown are dropped, and get regenerated from
+# their seeds if they're needed again. The most recently used one is always kept.
+class StarfieldCache:
+    def __init__(self, max_bytes=STARFIELD_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    # Returns the cached (surface, planet_pos, planet_radius) for key, or calls generate() to make it
+    def get(self, key, generate):
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry
+        self.misses += 1
+        entry = generate()
+        self.entries[key] = entry
+        self.total_bytes += surface_bytes(entry[0])
+        self.evict()
+        return entry
+
+    # Returns the cached entry for key without generating or touching its place in line, or None
+    def peek(self, key):
+        return self.entries.get(key)
+
+    def set_max_bytes(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.evict()
+
+    def evict(self):
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            _, entry = self.entries.popitem(last=False)
+            self.total_bytes -= surface_bytes(entry[0])
+
+    def clear(self):
+        self.entries.clear()
+        self.total_bytes = 0
+
+def surface_bytes(surface):
+    return surface.get_pitch() * surface.get_height()
+
+starfield_cache = StarfieldCache()
@@ -1,12 +1,25 @@
-from random import randrange, randint, choice
 from constants import *
-import pygame
 from faction_type import FactionType, faction_type_to_color
-from utility import d10000, d20, d100, coin_flip, xthify
-from battle_sprite import Destroyer, MissileSprite, MissileObject
+from utility import d100, xthify
+from battle_sprite import Destroyer, MissileSprite, Missiles
+from text_cache import text_cache
 
+# How many ships each sprite stands for in a battle with this many ships in all: one, up to
+# TACTICAL_SQUADRON_SHIP_COUNT, and above that as many as keeps the sprites to about that many
+def squadron_size(ships):
+    if ships <= TACTICAL_SQUADRON_SHIP_COUNT:
+        return 1
+    return -(-ships // TACTICAL_SQUADRON_SHIP_COUNT)
+
+# ships split in to squadrons of at most size ships, as even as they can be. Each sprite is one of them.
+def squadrons(ships, size):
+    count = -(-ships // size)
+    return [ships // count + (1 if i < ships % count else 0) for i in range(count)]
+
+# rng is the stream everything only shown on screen is rolled from (GameRandom.cosmetic)
 class TacticalBattle: 
-    def __init__(self, sprite_list, fleet, location, attacker_faction, defender_faction, attacker_ships, defender_ships):
+    def __init__(self, fleet, location, attacker_faction, defender_faction, attacker_ships, defender_ships, rng):
+        self.rng = rng
         self.attacker_faction = attacker_faction
         self.defender_faction = defender_faction
         self.attacker_ships = attacker_ships
@@ -15,15 +28,16 @@ class TacticalBattle:
         self.remaining_defender_ships = defender_ships
         self.retreat = False
         self.round = 0
-        self.rounds = []
+        self.record = None # CombatRecord, filled in once the battle is resolved
         self.starfield = None
         self.damage_due_attackers = 0
         self.damage_due_defenders = 0
         self.attacker_sprites = []
         self.defender_sprites = []
-        self.missile_objects = [] 
-        self.attacker_volley_ticker = randrange(0, MISSILE_VOLLEY_TICKER_COOUNT)
-        self.defender_volley_ticker = randrange(0, MISSILE_VOLLEY_TICKER_COOUNT)
+        self.sprites = [] # every sprite deployed, including the ones since blown up
+        self.missiles = None
+        self.attacker_volley_ticker = self.rng.randrange(0, MISSILE_VOLLEY_TICKER_COOUNT)
+        self.defender_volley_ticker = self.rng.randrange(0, MISSILE_VOLLEY_TICKER_COOUNT)
         self.first_volley = True
         self.winner = None
         self.fleet = fleet
@@ -32,95 +46,104 @@ class TacticalBattle:
         self.charge = False
         self.battle_number = None
         self.prompt_text = None
-        self.rolls = []
         self.roll_text = None
-        self.brilliancies = []
-        self.outnumber_die = []
         self.attacker_vet_bonus = None
         self.defender_vet_bonus = None
+        self.missile_sprite = None
+        self.sprites_deployed = False
+
+    # Sprites are only placed once the battle is actually shown, so battles that are
+    # resolved headless, skipped, or fought between AI factions cost no Surface work.
+    def deploy_sprites(self, sprite_list):
+        self.starfield = self.location.get_starfield()
         self.missile_sprite = MissileSprite()
+        self.sprites_deployed = True
 
-        # place destroyers (for now, all ships are destroyers)
-        num_destroyers_attacker = self.attacker_ships
-        num_destroyers_defender = self.defender_ships
-        for _ in range(num_destroyers_attacker):
-            x = randrange(TACTICAL_SCREEN_PADDING_PX, SCREEN_WIDTH_PX // 3 - TACTICAL_SCREEN_PADDING_PX)
-            y = randrange(TACTICAL_SCREEN_PADDING_PX, SCREEN_HEIGHT_PX - TACTICAL_SCREEN_PADDING_PX)
+        # place destroyers (for now, all ships are destroyers). In a big enough battle each one is a
+        # squadron, and its value is how many ships are in it: update_tactical_round() only blows one up
+        # once its side's losses so far cover that many ships, so the sprites still go down with the
+        # losses from each round.
+        size = squadron_size(self.attacker_ships + self.defender_ships)
+        for value in squadrons(self.attacker_ships, size):
+            x = self.rng.randrange(TACTICAL_SCREEN_PADDING_PX, SCREEN_WIDTH_PX // 3 - TACTICAL_SCREEN_PADDING_PX)
+            y = self.rng.randrange(TACTICAL_SCREEN_PADDING_PX, SCREEN_HEIGHT_PX - TACTICAL_SCREEN_PADDING_PX)
             upscaled = False
-            if d100()[0] <= DESTROYER_UPSCALE_CHANCE_OUT_OF_100: 
+            if d100(rng=self.rng)[0] <= DESTROYER_UPSCALE_CHANCE_OUT_OF_100: 
                 upscaled = True 
 
-            self.attacker_sprites.append(Destroyer(self, choice(sprite_list[attacker_faction]), upscaled, (x, y), attacker_faction)) 
+            self.attacker_sprites.append(Destroyer(self, self.rng.choice(sprite_list[self.attacker_faction]), upscaled, (x, y), self.attacker_faction, value=value)) 
 
-        for _ in range(num_destroyers_defender):
-            x = randrange(int(SCREEN_WIDTH_PX * .66), SCREEN_WIDTH_PX - TACTICAL_SCREEN_PADDING_PX)
-            y = randrange(TACTICAL_SCREEN_PADDING_PX, SCREEN_HEIGHT_PX - TACTICAL_SCREEN_PADDING_PX)
+        for value in squadrons(self.defender_ships, size):
+            x = self.rng.randrange(int(SCREEN_WIDTH_PX * .66), SCREEN_WIDTH_PX - TACTICAL_SCREEN_PADDING_PX)
+            y = self.rng.randrange(TACTICAL_SCREEN_PADDING_PX, SCREEN_HEIGHT_PX - TACTICAL_SCREEN_PADDING_PX)
             upscaled = False
-            if d100()[0] <= DESTROYER_UPSCALE_CHANCE_OUT_OF_100: 
+            if d100(rng=self.rng)[0] <= DESTROYER_UPSCALE_CHANCE_OUT_OF_100: 
                 upscaled = True 
-            self.defender_sprites.append(Destroyer(self, choice(sprite_list[defender_faction]), upscaled, (x, y), defender_faction)) 
+            self.defender_sprites.append(Destroyer(self, self.rng.choice(sprite_list[self.defender_faction]), upscaled, (x, y), self.defender_faction, value=value)) 
+
+        # missiles keep track of their targets by index in self.sprites
+        self.sprites = self.attacker_sprites + self.defender_sprites
+        for index, sprite in enumerate(self.sprites):
+            sprite.index = index
+        self.missiles = Missiles(self.missile_sprite, self.sprites)
 
     def missile_check(self, screen):
         for sprite in self.attacker_sprites + self.defender_sprites:
             target = None
             if sprite.faction_type == self.attacker_faction:
                 if len(self.defender_sprites) > 0:
-                    target = choice(self.defender_sprites)
+                    target = self.rng.choice(self.defender_sprites)
             elif sprite.faction_type == self.defender_faction:
                 if len(self.attacker_sprites) > 0:
-                    target = choice(self.attacker_sprites)
+                    target = self.rng.choice(self.attacker_sprites)
             if sprite.missile_ticker >= MISSILE_TICKER_COUNT and not sprite.explosion:   
                 sprite.missile_ticker = 0
-                self.missile_objects.append(MissileObject(sprite.pos, self.missile_sprite, target))
+                self.missiles.launch(sprite.pos, target)
             if sprite.faction_type == self.attacker_faction and sprite.at_line:
                 if self.attacker_volley_ticker >= MISSILE_VOLLEY_TICKER_COOUNT:
-                    self.missile_objects.append(MissileObject(sprite.pos, self.missile_sprite, target))
+                    self.missiles.launch(sprite.pos, target)
             elif sprite.faction_type == self.defender_faction and sprite.at_line:
                if self.defender_volley_ticker == MISSILE_VOLLEY_TICKER_COOUNT:
-                   self.missile_objects.append(MissileObject(sprite.pos, self.missile_sprite, target))
+                   self.missiles.launch(sprite.pos, target)
             if self.first_volley:
-               self.missile_objects.append(MissileObject(sprite.pos, self.missile_sprite, target))
+               self.missiles.launch(sprite.pos, target)
             sprite.missile_ticker += 1
-        for missile in self.missile_objects:
-            missile.update()
-        for missile in self.missile_objects:
-            missile.draw(screen)
-        self.missile_objects = [i for i in filter(lambda x: not x.arrived, self.missile_objects)]
+        self.missiles.update()
+        self.missiles.draw(screen)
+        self.missiles.remove_arrived()
         self.first_volley = False
         self.attacker_volley_ticker += 1
         if self.attacker_volley_ticker > MISSILE_VOLLEY_TICKER_COOUNT:
-            self.attacker_volley_ticker = randrange(0, MISSILE_VOLLEY_TICKER_COOUNT // 2)
+            self.attacker_volley_ticker = self.rng.randrange(0, MISSILE_VOLLEY_TICKER_COOUNT // 2)
         self.defender_volley_ticker += 1
         if self.defender_volley_ticker > MISSILE_VOLLEY_TICKER_COOUNT:
-            self.defender_volley_ticker = randrange(0, MISSILE_VOLLEY_TICKER_COOUNT // 2)
+            self.defender_volley_ticker = self.rng.randrange(0, MISSILE_VOLLEY_TICKER_COOUNT // 2)
 
     def update_roll_text(self, attacker_faction_name, defender_faction_name):
-        font = pygame.font.Font(FONT_PATH, TACTICAL_ROLLS_FONT_SIZE)
-        attacker_rolls = self.rolls[self.round]["attacker_rolls"]
-        defender_rolls = self.rolls[self.round]["defender_rolls"]
+        attacker_rolls = self.record.attacker_rolls[self.round]
+        defender_rolls = self.record.defender_rolls[self.round]
         attacker_roll_text = "{}: {}".format(attacker_faction_name, attacker_rolls)
         if self.charge:
             attacker_roll_text += " (+{} from 'Charge!')".format(CHARGE_D20_BONUS)
-        if self.brilliancies[self.round]["attacker"]:
+        if self.record.attacker_brilliancies[self.round]:
             attacker_roll_text += " (+{} from Brilliancy)".format(BRILLIANCY_BONUS)
-        if self.outnumber_die[self.round]["attacker"] > 0:
-            attacker_roll_text += " ({} bonus dice)".format(self.outnumber_die[self.round]["attacker"])
+        if self.record.attacker_bonus_dice[self.round] > 0:
+            attacker_roll_text += " ({} bonus dice)".format(self.record.attacker_bonus_dice[self.round])
         if self.attacker_vet_bonus > 0:
             attacker_roll_text += " (+{} from vets)".format(self.attacker_vet_bonus)
         defender_roll_text = "{}: {}".format(defender_faction_name, defender_rolls)
         if self.last_stand:
             defender_roll_text += " (+{} from 'Last Stand!')".format(LAST_STAND_D20_BONUS)
-        if self.brilliancies[self.round]["defender"]:
+        if self.record.defender_brilliancies[self.round]:
             defender_roll_text += " (+{} from Brilliancy)".format(BRILLIANCY_BONUS)
-        if self.outnumber_die[self.round]["defender"] > 0:
-            defender_roll_text += " ({} bonus dice)".format(self.outnumber_die[self.round]["defender"])
+        if self.record.defender_bonus_dice[self.round] > 0:
+            defender_roll_text += " ({} bonus dice)".format(self.record.defender_bonus_dice[self.round])
         if self.defender_vet_bonus > 0:
             defender_roll_text += " (+{} from vets)".format(self.defender_vet_bonus)
-        self.roll_text = font.render("(round #{})   {}      {}".format(self.round + 1, attacker_roll_text, defender_roll_text), True, COLOR_SENSOR, "black")
+        self.roll_text = text_cache.render("(round #{})   {}      {}".format(self.round + 1, attacker_roll_text, defender_roll_text), TACTICAL_ROLLS_FONT_SIZE, COLOR_SENSOR, "black")
 
     def update_prompt_text(self, attacker_faction_name, defender_faction_name):
-        font = pygame.font.Font(FONT_PATH, TACTICAL_MODE_FONT_SIZE)
-        self.prompt_text = font.render("{} ({} ships) vs {} ({} ships) <{} battle of {}> <SPACE to skip battle>".format(attacker_faction_name, max(self.remaining_attacker_ships, 0), defender_faction_name, max(self.remaining_defender_ships, 0), xthify(self.battle_number + 1), self.location.name), True, COLOR_SENSOR, "black")
+        self.prompt_text = text_cache.render("{} ({} ships) vs {} ({} ships) <{} battle of {}> <SPACE to skip battle>".format(attacker_faction_name, max(self.remaining_attacker_ships, 0), defender_faction_name, max(self.remaining_defender_ships, 0), xthify(self.battle_number + 1), self.location.name), TACTICAL_MODE_FONT_SIZE, COLOR_SENSOR, "black")
 
     def is_close_battle(self):
         if self.attacker_ships == self.defender_ships:
@@ -0,0 +1,50 @@
+import pygame
+from constants import *
+from collections import OrderedDict
+
+# Every Font is loaded from FONT_PATH once for each size, the first time it's asked for, and shared
+# by everything which draws text from then on.
+fonts = {}
+
+def font_of_size(size):
+    font = fonts.get(size)
+    if font is None:
+        font = pygame.font.Font(FONT_PATH, size)
+        fonts[size] = font
+    return font
+
+# A least-recently-used cache of rendered text, keyed by (text, size, color, background). Most of what's
+# on screen (labels, HUD lines, console messages) reads the same from one frame to the next, so it's
+# only rendered the first time and blitted from here after that. Everything is rendered antialiased.
+# The Surfaces handed out are shared, so they mustn't be drawn on.
+class TextCache:
+    def __init__(self, max_entries=TEXT_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, text, size, color, background=None):
+        key = (text, size, color, background)
+        surface = self.entries.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return surface
+        self.misses += 1
+        surface = font_of_size(size).render(text, True, color, background)
+        self.entries[key] = surface
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return surface
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        if lookups == 0:
+            return 0
+        return self.hits / lookups
+
+    def clear(self):
+        self.entries.clear()
+
+text_cache = TextCache()
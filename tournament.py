@@ -0,0 +1,208 @@
+# Plays every pairing of AI personalities against each other, headless, over many seeded maps, to
+# find out which of them actually wins more often (see the notes in personality.py). Each pairing is
+# played on every seed twice, once from each side of the map, and the matches are spread across a
+# pool of worker processes. Every finished match is appended to a checkpoint file, so an interrupted
+# tournament picks up where it left off when run again with the same checkpoint. Matches in it which were
+# played to another number of turns, by another version of the game or with other dice (see
+# TurnEngine.combat_numpy) are played again, and left out of the results.
+#
+# There are two setups:
+#   uniform: the 1v1 described in personality.py. The two sides each hold half of the map (split down
+#            the middle), with TOURNAMENT_UNIFORM_STARTING_SHIPS on every system.
+#   open: a normal map with only two of the AI empires in it. The other homeworlds are left to the
+#         local forces, and the pirates are where they would be in a game.
+# A match is won by eliminating the other side, and is a draw if neither has by TOURNAMENT_MAX_TURNS.
+#
+# Run with: python tournament.py --seeds 20 --checkpoint tournament.jsonl --output tournament.json
+
+import argparse
+import json
+import os
+from itertools import combinations
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+from constants import *
+from turn_engine import TurnEngine
+from combat_resolver import NUMPY_VERSION
+from faction import Faction
+from faction_type import FactionType
+from personality import SnappingTurtle, Water, Haymaker
+
+PERSONALITIES = {
+    "Snapping Turtle": SnappingTurtle,
+    "Water": Water,
+    "Haymaker": Haymaker,
+}
+
+SETUPS = ["uniform", "open"]
+
+SIDES = [FactionType.AI_EMPIRE_1, FactionType.AI_EMPIRE_2]
+
+def setup_uniform(engine):
+    locations = sorted(engine.star_map.locations, key=lambda x: x.pos[0])
+    half = len(locations) // 2
+    for index, loc in enumerate(locations):
+        loc.faction_type = SIDES[0] if index < half else SIDES[1]
+        loc.ships = TOURNAMENT_UNIFORM_STARTING_SHIPS
+
+def setup_open(engine):
+    for loc in engine.star_map.locations:
+        if loc.faction_type != FactionType.PIRATES and loc.faction_type != FactionType.NON_SPACEFARING and loc.faction_type not in SIDES:
+            loc.faction_type = FactionType.NON_SPACEFARING
+            loc.ships = engine.rng.map.randint(NON_SPACEFARING_STARTING_SHIPS_MIN, NON_SPACEFARING_STARTING_SHIPS_MAX)
+
+# Plays one match, and returns its result as a dict. personalities[0] plays SIDES[0], which in the
+# uniform setup is the west half of the map.
+def play_match(setup, personalities, seed, max_turns):
+    engine = TurnEngine(seed=seed)
+    # The factions are made before the map is changed, while their homeworlds are still theirs
+    engine.ai_factions = [Faction(side, engine, PERSONALITIES[name]()) for side, name in zip(SIDES, personalities)]
+    if setup == "uniform":
+        setup_uniform(engine)
+    else:
+        setup_open(engine)
+
+    def alive(side):
+        in_systems = any(loc.faction_type == side for loc in engine.star_map.locations)
+        return in_systems or any(fleet.faction_type == side for fleet in engine.star_map.deployed_fleets)
+
+    # The parts of TurnEngine.advance_turn() which don't involve the player, the coalition or the invasion
+    winner = None
+    while engine.turn <= max_turns:
+        engine.update_fleets()
+        engine.resolve_fleet_arrivals()
+        engine.remove_fleets()
+        engine.spawn_reenforcements()
+        engine.run_ai_behavior()
+        still_alive = [i for i in filter(lambda x: alive(SIDES[x]), range(len(SIDES)))]
+        if len(still_alive) <= 1:
+            if len(still_alive) == 1:
+                winner = personalities[still_alive[0]]
+            break
+        engine.turn += 1
+    return {
+        "setup": setup,
+        "personalities": list(personalities),
+        "seed": seed,
+        "winner": winner,
+        "turns": min(engine.turn, max_turns),
+        "max_turns": max_turns,
+        "version": VERSION,
+        "combat_numpy": engine.combat_numpy,
+    }
+
+def match_key(setup, personalities, seed, max_turns, version, combat_numpy):
+    return (setup, personalities[0], personalities[1], seed, max_turns, version, combat_numpy)
+
+# Checkpoints written before max_turns, the version and the dice were recorded don't match any match
+def result_key(result):
+    return match_key(result["setup"], result["personalities"], result["seed"], result.get("max_turns"), result.get("version"),
+                     result.get("combat_numpy"))
+
+# Every finished match in the checkpoint file. A match which was only half written when the
+# tournament was interrupted is played again.
+def read_checkpoint(path):
+    results = []
+    if path is None or not os.path.exists(path):
+        return results
+    with open(path) as f:
+        for line in f:
+            try:
+                results.append(json.loads(line))
+            except ValueError:
+                pass
+    return results
+
+def all_matches(setups, names, seeds):
+    matches = []
+    for setup in setups:
+        for first, second in combinations(names, 2):
+            for seed in seeds:
+                matches.append((setup, (first, second), seed))
+                matches.append((setup, (second, first), seed))
+    return matches
+
+# Win rates and average match lengths, as {setup: {personality: {opponent: value}}}, from the
+# point of view of the row personality, whichever side it played from.
+def summarize(results, setups, names):
+    summary = {}
+    for setup in setups:
+        win_rate = {}
+        average_turns = {}
+        draws = {}
+        for name in names:
+            win_rate[name] = {}
+            average_turns[name] = {}
+            draws[name] = {}
+            for opponent in names:
+                if opponent == name:
+                    continue
+                played = [i for i in filter(lambda x: x["setup"] == setup and name in x["personalities"] and opponent in x["personalities"], results)]
+                if len(played) == 0:
+                    continue
+                win_rate[name][opponent] = len([i for i in filter(lambda x: x["winner"] == name, played)]) / len(played)
+                average_turns[name][opponent] = sum(map(lambda x: x["turns"], played)) / len(played)
+                draws[name][opponent] = len([i for i in filter(lambda x: x["winner"] is None, played)])
+        summary[setup] = {"win_rate": win_rate, "average_turns": average_turns, "draws": draws}
+    return summary
+
+def print_matrix(title, names, table, fmt):
+    print(title)
+    width = max(len(name) for name in names) + 2
+    print("".ljust(width) + "".join(name.rjust(width) for name in names))
+    for name in names:
+        row = name.ljust(width)
+        for opponent in names:
+            if opponent in table[name]:
+                row += fmt.format(table[name][opponent]).rjust(width)
+            else:
+                row += "-".rjust(width)
+        print(row)
+    print()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Plays every pairing of AI personalities against each other over many seeded maps.")
+    parser.add_argument("--seeds", type=int, default=10, help="number of maps each pairing is played on")
+    parser.add_argument("--first-seed", type=int, default=0)
+    parser.add_argument("--setups", nargs="+", choices=SETUPS, default=SETUPS)
+    parser.add_argument("--personalities", nargs="+", choices=list(PERSONALITIES.keys()), default=list(PERSONALITIES.keys()))
+    parser.add_argument("--max-turns", type=int, default=TOURNAMENT_MAX_TURNS, help="a match still going after this many turns is a draw")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes (default: one per CPU)")
+    parser.add_argument("--checkpoint", default=None, help="file finished matches are appended to, and resumed from")
+    parser.add_argument("--output", default=None, help="where to write the results as JSON")
+    args = parser.parse_args()
+
+    seeds = list(range(args.first_seed, args.first_seed + args.seeds))
+    results = read_checkpoint(args.checkpoint)
+    wanted = set(match_key(*i, args.max_turns, VERSION, NUMPY_VERSION) for i in all_matches(args.setups, args.personalities, seeds))
+    done = set(result_key(i) for i in results)
+    to_play = [i for i in filter(lambda x: match_key(*x, args.max_turns, VERSION, NUMPY_VERSION) not in done,
+                                 all_matches(args.setups, args.personalities, seeds))]
+    print("{} matches to play, {} already played".format(len(to_play), len(wanted & done)))
+
+    checkpoint = open(args.checkpoint, "a") if args.checkpoint is not None else None
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(play_match, setup, personalities, seed, args.max_turns) for setup, personalities, seed in to_play]
+        for count, future in enumerate(as_completed(futures)):
+            result = future.result()
+            results.append(result)
+            if checkpoint is not None:
+                checkpoint.write(json.dumps(result) + "\n")
+                checkpoint.flush()
+            print("[{}/{}] {} {} vs {} on seed {}: {} after {} turns".format(count + 1, len(to_play), result["setup"],
+                  result["personalities"][0], result["personalities"][1], result["seed"], result["winner"] or "draw", result["turns"]))
+    if checkpoint is not None:
+        checkpoint.close()
+
+    results = [i for i in filter(lambda x: result_key(x) in wanted, results)]
+    summary = summarize(results, args.setups, args.personalities)
+    for setup in args.setups:
+        print_matrix("{} win rate (row vs column)".format(setup), args.personalities, summary[setup]["win_rate"], "{:.0%}")
+        print_matrix("{} average turns".format(setup), args.personalities, summary[setup]["average_turns"], "{:.0f}")
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump({"version": VERSION, "seeds": seeds, "max_turns": args.max_turns, "combat_numpy": NUMPY_VERSION,
+                   "matches": len(results), "summary": summary}, f, indent=2)
@@ -0,0 +1,789 @@
+import argparse
+from time import perf_counter
+from constants import *
+from star_map import StarMap, map_size_for_stars
+from tactical_battles import TacticalBattle
+from faction import Faction
+from faction_type import FactionType, ai_empire_faction_types
+from fleet import Fleet
+from console import ConsoleLog
+from utility import d100, xthify
+from math import floor
+from personality import *
+from battle_graph import BattleGraph
+from combat_resolver import resolve_combat, combat_dice_for, NUMPY_VERSION
+from starfield_cache import starfield_cache
+from rng import GameRandom
+from ai_planner import AIPlanner
+from spatial_index import SpatialIndex
+from save_game import save_game, load_game
+from order_log import OrderLog, read_order_log, start_from, apply_order
+from turn_profiler import TurnProfiler, PIRATE_ROUTINE, FACTION_ROUTINES, faction_routine
+
+# The turn pipeline, as (phase, method) in the order they run. While a turn is being run, the engine's
+# turn_phase is the index of the phase it's in, which is how a turn being run on another thread is
+# followed (see Game).
+TURN_PHASES = [
+    ("pirate raids", "off_map_pirate_raid_check"),
+    ("moving fleets", "update_fleets"),
+    ("battles", "resolve_fleet_arrivals"),
+    ("clearing fleets", "remove_fleets"),
+    ("last faction buff", "last_faction_buff_check"),
+    ("reenforcements", "spawn_reenforcements"),
+    ("AI", "run_ai_behavior"),
+    ("stats", "stats_check"),
+    ("game over", "game_over_check"),
+    ("victory", "victory_check"),
+    ("invasion", "exogalactic_invader_countdown_check"),
+]
+
+# The TurnEngine owns the simulation state of a game (the StarMap, the
+# Factions, the console log and the over-time stats) and advances it one
+# turn at a time. It never touches the display, fonts or Surfaces, so it
+# can be run headless for soak and balance testing. Game extends it with
+# everything needed to actually play.
+# Every random roll is drawn from self.rng, so a given seed always plays out the same game.
+# map_size is the (width, height) of the StarMap in pixels (see map_size_for_stars()).
+class TurnEngine:
+    def __init__(self, debug_mode=False, seed=None, map_size=(MAP_WIDTH_PX, MAP_HEIGHT_PX)):
+        self.debug_mode = debug_mode
+        self.rng = GameRandom(seed)
+        self.watch_mode = False
+        # starfields cached for a previous map belong to Locations which no longer exist
+        starfield_cache.clear()
+        self.star_map = StarMap(self.debug_mode, self.rng.map, map_size[0], map_size[1])
+        self.hard_mode = False
+        self.remaining_factions = 6    
+        self.coalition_triggered = False
+        self.last_faction_buff = False 
+        self.last_faction_buff_triggered = False  
+        self.exogalactic_invasion_begun = False  
+        self.exogalactic_invasion_countdown = EXOGALACTIC_INVASION_COUNTDOWN
+        self.invasion_direction = None
+        self.invasion_fleets_spawned = False
+        self.invasion_waves_completed = 0
+        self.turn_of_last_wave = 0
+        self.coalition_trigger = COALITION_TRIGGER_PERCENT + self.rng.events.randint(0, 5)
+
+        self.ai_factions = []
+        ai_types = [Water(), SnappingTurtle()]
+        index = 1
+        for fac in ai_empire_faction_types:
+            if fac == FactionType.EXOGALACTIC_INVASION:
+                ai_faction = Faction(fac, self, Haymaker())
+                self.ai_factions.append(ai_faction)
+            else:
+                ai = ai_types[index]
+                index = (index + 1) % len(ai_types)  
+                ai_faction = Faction(fac, self, ai)
+                self.ai_factions.append(ai_faction)
+
+        self.console = ConsoleLog()
+        for msg in INTRO_STRINGS:
+            self.console.push(msg)
+
+        self.turn = 1
+        self.player_reenforcement_pool = 0
+        self.game_over_mode = False
+        self.all_pirates_destroyed = False
+        self.all_ai_empires_destroyed = False
+        self.victory_mode = False
+        self.conquest_percent = 1
+
+        self.battles_won = 0
+        self.battles_lost = 0
+        self.ships_lost = 0
+        self.ships_destroyed = 0
+        self.ships_over_time = []
+        self.veteran_ships_over_time = []
+        self.enemy_ships_over_time = []
+        self.systems_over_time = []
+        self.deployed_fleets_over_time = []
+        self.decimated_systems_over_time = []
+        self.ffa_stage_turn = 0
+        self.coalition_stage_turn = False
+        self.invader_stage_turn = False
+        self.biggest_battle = 0
+        # NOTE: more stats to come
+
+        # The NumPy version big battles are rolled with, or None to roll them a round at a time (see
+        # combat_resolver.py). A seed only plays out the same way with the same dice, so a saved game or an
+        # order log keeps rolling the dice it was started with (see restore_combat_dice()).
+        self.combat_numpy = NUMPY_VERSION
+        # Set when a game was loaded which can't be rolled with the dice it was started with
+        self.combat_dice_warning = None
+
+        # Turn timing, for turns_per_second()
+        self.turns_processed = 0
+        self.turn_processing_seconds = 0
+
+        # Set by set_ai_workers() to plan the AI factions' turns in parallel
+        self.ai_planner = None
+
+        # Set by record_orders() to record every order given (see order_log.py)
+        self.order_log = None
+        # the fleets the AI deployed during the last turn, for the order log
+        self.ai_fleets_deployed = []
+
+        # the phase of TURN_PHASES being run, or None between turns
+        self.turn_phase = None
+        # Set by start_profiling() to time every turn (see turn_profiler.py)
+        self.profiler = None
+
+        self.stats_check()
+
+    def game_on(self):
+        return not (self.game_over_mode or self.victory_mode)
+
+    # With workers > 0, the AI factions plan their turns in that many worker processes and their
+    # orders are committed afterwards (see ai_planner.py). With 0 they run one after another.
+    def set_ai_workers(self, workers):
+        self.log_order("ai_workers", workers)
+        if self.ai_planner is not None:
+            self.ai_planner.shutdown()
+            self.ai_planner = None
+        if workers > 0:
+            self.ai_planner = AIPlanner(workers)
+
+    # Turns the player's empire over to the AI (or takes it back)
+    def set_watch_mode(self, watch_mode):
+        self.log_order("watch_mode", watch_mode)
+        self.watch_mode = watch_mode
+        player_factions = [i for i in filter(lambda x: x.faction_type == FactionType.PLAYER, self.ai_factions)]
+        if watch_mode and len(player_factions) == 0:
+            self.ai_factions.append(Faction(FactionType.PLAYER, self, Water()))
+        elif not watch_mode:
+            for fac in player_factions:
+                self.ai_factions.remove(fac)
+
+    def set_hard_mode(self, hard_mode):
+        self.log_order("hard_mode", hard_mode)
+        self.hard_mode = hard_mode
+
+    # The player's orders. They're given through here rather than straight to the StarMap and the
+    # Fleets so that they can be recorded.
+    def deploy_fleet(self, source, dest, num_ships):
+        self.log_order("deploy", source.index, dest.index, num_ships)
+        self.star_map.deploy_fleet(source, dest, num_ships)
+
+    def add_waypoint(self, fleet, loc):
+        self.log_order("add_waypoint", self.star_map.deployed_fleets.index(fleet), loc.index)
+        fleet.add_waypoint(loc)
+
+    def remove_waypoint(self, fleet, loc):
+        self.log_order("remove_waypoint", self.star_map.deployed_fleets.index(fleet), loc.index)
+        fleet.remove_waypoint(loc)
+
+    # Sends amount ships from the reenforcement pool to loc
+    def reenforce(self, loc, amount):
+        self.log_order("reenforce", loc.index, amount)
+        self.player_reenforcement_pool -= amount
+        vets = loc.get_num_vets()
+        loc.ships += amount
+        loc.veterancy_out_of_100 = floor(vets / loc.ships * 100)
+
+    # Records every order from here on in order_log (see order_log.py)
+    def record_orders(self, order_log):
+        self.order_log = order_log
+        order_log.start(self, self.turn == 1)
+
+    def log_order(self, *order):
+        if self.order_log is not None:
+            self.order_log.order(*order)
+
+    # Called with the record of every battle the player fought in. There is
+    # nothing to show when running headless, so the default is to drop it.
+    def player_battle_fought(self, tactical_battle):
+        pass
+
+    # Rolls battles with the dice a game that was rolling with numpy_version did, if they can be rolled here,
+    # and otherwise warns that the game won't play out as it would have
+    def restore_combat_dice(self, numpy_version):
+        self.combat_numpy, self.combat_dice_warning = combat_dice_for(numpy_version)
+        if self.combat_dice_warning is not None:
+            self.console.push(self.combat_dice_warning)
+
+    # Called once a saved game has been loaded over this one (see save_game.py). Orders being
+    # recorded carry on from the loaded game.
+    def game_loaded(self):
+        if self.order_log is not None:
+            self.order_log.start(self, False)
+
+    # Times every turn from here on, writing them to a CSV file at path if given (see turn_profiler.py)
+    def start_profiling(self, path=None):
+        parts = []
+        for phase, method in TURN_PHASES:
+            parts.append(method)
+            if method == "run_ai_behavior":
+                parts += [PIRATE_ROUTINE] + FACTION_ROUTINES
+        self.profiler = TurnProfiler(parts, path)
+
+    # Runs the whole turn pipeline once
+    def advance_turn(self):
+        start = perf_counter()
+        profiler = self.profiler
+        for phase in range(len(TURN_PHASES)):
+            self.turn_phase = phase
+            method = TURN_PHASES[phase][1]
+            if profiler is None:
+                getattr(self, method)()
+            else:
+                phase_start = perf_counter()
+                getattr(self, method)()
+                profiler.add(method, perf_counter() - phase_start)
+        self.turn_phase = None
+        self.turn += 1
+        self.turns_processed += 1
+        seconds = perf_counter() - start
+        self.turn_processing_seconds += seconds
+        if self.order_log is not None:
+            self.order_log.turn_ended(self.turn - 1, self.ai_fleets_deployed, seconds)
+        if profiler is not None:
+            profiler.turn_ended(self, self.turn - 1, seconds)
+
+    # Advances up to num_turns turns, stopping early if the game ends.
+    # Returns the number of turns actually run.
+    def run(self, num_turns):
+        ran = 0
+        while ran < num_turns and self.game_on():
+            self.advance_turn()
+            ran += 1
+        return ran
+
+    def turns_per_second(self):
+        if self.turn_processing_seconds == 0:
+            return 0
+        return self.turns_processed / self.turn_processing_seconds
+
+    # Toggles the running True/False variable based on whether the player has any planets left
+    def game_over_check(self):
+        # placeholder
+        player_locs = [i for i in filter(lambda x: x.faction_type == FactionType.PLAYER, self.star_map.locations)]
+        if len(player_locs) == 0:
+            self.console.push("Player has no worlds left!")
+            self.game_over_mode = True
+        else:
+            self.game_over_mode = False
+
+    def exogalactic_invader_countdown_check(self):
+        if self.exogalactic_invasion_begun:
+            if self.exogalactic_invasion_countdown > 0:
+                self.exogalactic_invasion_countdown -= 1
+            elif self.invasion_waves_completed < EXOGALACTIC_INVASION_WAVE_LIMIT:
+                self.turn_of_last_wave = self.turn
+                self.invasion_fleets_spawned = True
+                self.exogalactic_invasion_countdown = self.rng.events.randint(EXOGALACTIC_WAVE_DELAY_MIN, EXOGALACTIC_WAVE_DELAY_MAX)
+                self.invasion_waves_completed += 1
+                ship_count = 0
+                systems = [i for i in filter(lambda x: x.faction_type == FactionType.PLAYER or x.faction_type == FactionType.NON_SPACEFARING, self.star_map.locations)]
+                player_fleets = [i for i in filter(lambda x: x.faction_type == FactionType.PLAYER, self.star_map.deployed_fleets)]
+                ship_count += sum(map(lambda x: x.ships, systems))
+                ship_count += sum(map(lambda x: x.ships, player_fleets))
+                existing_invader_systems = [i for i in filter(lambda x: x.faction_type == FactionType.EXOGALACTIC_INVASION, self.star_map.locations)]
+                existing_invader_fleets = [i for i in filter(lambda x: x.faction_type == FactionType.EXOGALACTIC_INVASION, self.star_map.deployed_fleets)]
+                existing_invader_ship_count = sum(map(lambda x: x.ships, existing_invader_systems)) + sum(map(lambda x: x.ships, existing_invader_fleets))
+                invasion_targets = []
+                if self.invasion_direction == "top":
+                    for system in self.star_map.locations:
+                        if system.pos[1] <= INVASION_MARGIN_PX:
+                            invasion_targets.append(system)
+                elif self.invasion_direction == "right":
+                    for system in self.star_map.locations:
+                        if system.pos[0] >= self.star_map.width_px - INVASION_MARGIN_PX:
+                            invasion_targets.append(system)
+                elif self.invasion_direction == "bottom":
+                    for system in self.star_map.locations:
+                        if system.pos[1] >= self.star_map.height_px - INVASION_MARGIN_PX:
+                            invasion_targets.append(system)
+                elif self.invasion_direction == "left":
+                    for system in self.star_map.locations:
+                        if system.pos[0] <= INVASION_MARGIN_PX:
+                            invasion_targets.append(system)
+                invader_ratio = EXOGALACTIC_INVASION_SIZE_RATIO
+                if self.hard_mode:
+                    invader_ratio += .5
+                num_invaders = max(int(ship_count * invader_ratio) - existing_invader_ship_count, 1)
+                invader_fleets_size = max(num_invaders // len(invasion_targets), 1)
+                for target in invasion_targets:
+                    name = self.star_map.name_a_fleet(FactionType.EXOGALACTIC_INVASION)
+                    pos = None
+                    if self.invasion_direction == "top":
+                        pos = (target.pos[0], 0)
+                    elif self.invasion_direction == "right":
+                        pos = (self.star_map.width_px, target.pos[1])
+                    elif self.invasion_direction == "bottom":
+                        pos = (target.pos[0], self.star_map.height_px)
+                    elif self.invasion_direction == "left":
+                        pos = (0, target.pos[1])
+                    fleet = Fleet(name, pos, FactionType.EXOGALACTIC_INVASION, invader_fleets_size, target, 0)
+                    self.star_map.deployed_fleets.append(fleet)
+
+    def last_faction_buff_check(self):
+        if self.last_faction_buff:
+            faction_systems = [i for i in filter(lambda x: x.faction_type != FactionType.PLAYER and x.faction_type != FactionType.PIRATES and x.faction_type != FactionType.NON_SPACEFARING, self.star_map.locations)]
+            num_faction_ships = sum(map(lambda x: x.ships, faction_systems))
+            faction_fleets = [i for i in filter(lambda x: x.faction_type != FactionType.PLAYER and x.faction_type != FactionType.PIRATES and x.faction_type != FactionType.NON_SPACEFARING, self.star_map.deployed_fleets)]
+            num_faction_ships += sum(map(lambda x: x.ships, faction_fleets))
+            player_systems = [i for i in filter(lambda x: x.faction_type == FactionType.PLAYER, self.star_map.locations)]
+            player_fleets = [i for i in filter(lambda x: x.faction_type == FactionType.PLAYER, self.star_map.deployed_fleets)]
+            num_player_ships = sum(map(lambda x: x.ships, player_systems))
+            num_player_ships += sum(map(lambda x: x.ships, player_fleets))
+            if len(faction_systems) >= len(player_systems) or num_faction_ships >= num_player_ships:
+                self.last_faction_buff = False
+                if len(faction_systems) > 0:
+                    name = self.ai_factions[0].name
+                    self.console.push("{}'s production boost is complete.".format(name))
+                    self.ai_factions[0].personality = SnappingTurtle()
+
+    # Checks the victory conditions:
+    def victory_check(self):
+        num_pirate_systems = len(
+            [i for i in filter(lambda x: x.faction_type == FactionType.PIRATES, self.star_map.locations)])
+        ai_empire_systems = [i for i in filter(lambda x: x.faction_type in ai_empire_faction_types, self.star_map.locations)]
+        num_ai_empire_systems = len(ai_empire_systems)
+        num_player_systems = len(
+            [i for i in filter(lambda x: x.faction_type == FactionType.PLAYER, self.star_map.locations)])
+        conquest_percent = num_player_systems / self.star_map.num_stars * 100
+        self.conquest_percent = conquest_percent
+        alive_faction_list = []
+        for system in ai_empire_systems:
+            if system.faction_type not in alive_faction_list:
+                alive_faction_list.append(system.faction_type)
+        self.remaining_factions = len(alive_faction_list)
+        if num_pirate_systems == 0 and not self.all_pirates_destroyed:
+            self.console.push("All Pirates in the sector have been brought under control...")
+            self.all_pirates_destroyed = True
+        if num_ai_empire_systems == 0 and not self.all_ai_empires_destroyed:
+            empire_fleets = [i for i in filter(lambda x: x.faction_type in ai_empire_faction_types and x.faction_type != FactionType.PLAYER, self.star_map.deployed_fleets)]
+            if len(empire_fleets) == 0:
+                self.console.push("All rival successors to the empire have been vanquished...")
+                self.all_ai_empires_destroyed = True
+        if conquest_percent >= self.coalition_trigger and not self.coalition_triggered:
+            self.coalition_triggered = True
+            self.coalition_stage_turn = self.turn
+            name = self.rng.events.choice(["The Resistance", "The Coalition"])
+            self.ai_factions[0].name = name
+            self.ai_factions[0].personality = Water()
+            for loc in self.star_map.locations:
+                if loc.faction_type != FactionType.PLAYER and loc.faction_type != FactionType.NON_SPACEFARING:
+                    loc.faction_type = FactionType.AI_EMPIRE_1
+            for fleet in self.star_map.deployed_fleets:
+                if fleet.faction_type != FactionType.PLAYER and fleet.faction_type != FactionType.NON_SPACEFARING:
+                    fleet.faction_type = FactionType.AI_EMPIRE_1
+            self.star_map.faction_names[FactionType.AI_EMPIRE_1] = name
+            self.last_faction_buff = True  
+            self.last_faction_buff_triggered = True
+            self.console.push("{} throws all of their spare manpower into producing more ships...".format(name))
+        if num_pirate_systems == 0 == num_ai_empire_systems and conquest_percent >= CONQUEST_PERCENT_FOR_VICTORY and not self.exogalactic_invasion_begun:
+            empire_fleets = [i for i in filter(lambda x: x.faction_type in ai_empire_faction_types and x.faction_type != FactionType.PLAYER, self.star_map.deployed_fleets)]
+            if len(empire_fleets) == 0:
+                for system in self.star_map.locations:
+                    system.reenforce_chance_out_of_100 = LAST_FACTION_BUFF_PRODUCTION_BONUS
+                self.console.push("You have conquered Sector 34!")
+                self.invasion_direction = self.rng.events.choice(["top", "right", "bottom", "left"])
+                self.console.push("Rumors of strange invaders from beyond the {} side of the map...".format(self.invasion_direction))
+                self.console.push("Prepare yourself... you have {} turns until the invasion!".format(EXOGALACTIC_INVASION_COUNTDOWN))
+                self.console.push("All systems in the sector start churning out ships to meet this new threat!".format(EXOGALACTIC_INVASION_COUNTDOWN))
+                self.exogalactic_invasion_begun = True
+                self.invader_stage_turn = self.turn
+        if self.invasion_fleets_spawned:
+            invader_systems = [i for i in filter(lambda x: x.faction_type == FactionType.EXOGALACTIC_INVASION, self.star_map.locations)]
+            invader_fleets = [i for i in filter(lambda x: x.faction_type == FactionType.EXOGALACTIC_INVASION, self.star_map.deployed_fleets)]
+            if len(invader_systems) == 0 and len(invader_fleets) == 0:
+                self.console.push("You have defeated the exogalactic invasion!")
+                self.victory_mode = True
+
+    # Runs AI behavior 
+    def run_ai_behavior(self):
+        def pirate_system_routine(loc):
+            # Pirates might attack nearby systems if they are weaker, regardless of faction
+            # Each Pirate system operates independently. They can't reenforce each other,
+            # and will attack each other. Conquered systems become new Pirate systems.
+            # Pirate logic prefers the conservation of fleets over worlds, even more than
+            # AI Empire faction logic.
+            if not loc.under_threat(fleet_index.in_range_of(loc.pos, DEFAULT_FUEL_RANGE_LY * LY + 1)):
+                locations_in_range = self.star_map.neighbors_of(loc)
+                self.rng.raids.shuffle(locations_in_range)
+                for target in locations_in_range:
+                    overmatched = target.ships * PIRATE_OVERMATCH_THRESHOLD < loc.ships
+                    if overmatched and d100(rng=self.rng.raids)[0] <= PIRATE_RAID_CHANCE_OUT_OF_100:
+                        num_fleets = len(self.star_map.deployed_fleets)
+                        self.star_map.deploy_fleet(loc, target, loc.ships - 1)
+                        if len(self.star_map.deployed_fleets) > num_fleets:
+                            fleet_index.insert(self.star_map.deployed_fleets[-1])
+                        break
+
+        fleets_before = len(self.star_map.deployed_fleets)
+        profiler = self.profiler
+        start = perf_counter()
+        # only the fleets near a pirate system can threaten it, so they're bucketed once for all of them
+        fleet_index = SpatialIndex()
+        for fleet in self.star_map.deployed_fleets:
+            fleet_index.insert(fleet)
+        pirate_systems = 0
+        for loc in self.star_map.locations:
+            if loc.faction_type == FactionType.PIRATES:
+                pirate_system_routine(loc)
+                pirate_systems += 1
+        if profiler is not None:
+            profiler.add(PIRATE_ROUTINE, perf_counter() - start, pirate_systems)
+
+        # AI Empire Factions make decisions on a higher level
+        if self.ai_planner is not None:
+            self.ai_planner.run_turn(self)
+        else:
+            for fac in self.ai_factions:
+                start = perf_counter()
+                fac.run_behavior()
+                if profiler is not None:
+                    profiler.add(faction_routine(fac.faction_type), perf_counter() - start)
+        self.ai_fleets_deployed = self.star_map.deployed_fleets[fleets_before:]
+
+    # Moves any fleets
+    def update_fleets(self):
+        for fleet in self.star_map.deployed_fleets:
+            fleet.move()
+
+    # Each system has a random chance to spawn reenforcements.
+    # Player reenforcements can go to a common pool, while all
+    # AI reenforcements remain local.
+    def spawn_reenforcements(self):
+        for loc in self.star_map.locations:
+            if loc.will_spawn_reenforcements(self.hard_mode, self.last_faction_buff, self.rng.events):
+                if loc.faction_type == FactionType.PLAYER and d100(rng=self.rng.events)[0] <= DEFAULT_PLAYER_REENFORCEMENT_POOL_CHANCE_OUT_OF_100:
+                    self.player_reenforcement_pool += 1
+                else:
+                    vets = loc.get_num_vets() 
+                    loc.ships += 1
+                    loc.veterancy_out_of_100 = floor(vets / loc.ships * 100)
+
+    # Finds any two fleets of opposing factions
+    # at the same location, and resolves combats.
+    # For now, there are no deep space interceptions
+    # Friendly arrivals disembark at the destination
+    def resolve_fleet_arrivals(self):
+
+        def is_valid_reenforcement(fleet, loc):
+            return fleet.arrived() and fleet.faction_type == loc.faction_type and fleet.faction_type != FactionType.PIRATES
+
+        def is_valid_combat(fleet, loc):
+            return fleet.arrived() and (fleet.faction_type == FactionType.PIRATES or fleet.faction_type != loc.faction_type)
+
+        def is_last_stand(attackers, defenders):
+            defender_faction = loc.faction_type
+            last_world = not any(x is not loc and x.faction_type == defender_faction for x in self.star_map.locations)
+            return (attackers > defenders and d100(rng=self.rng.combat)[0] <= LAST_STAND_CHANCE_OUT_OF_100) or last_world
+
+        def is_charge(attackers, defenders):
+            nearby_friendly_worlds = [i for i in filter(lambda x: x.faction_type == fleet.faction_type, self.star_map.systems_in_range_of(loc))]
+            nowhere_to_flee = len(nearby_friendly_worlds) == 0
+            return (defenders > attackers and d100(rng=self.rng.combat)[0] <= CHARGE_CHANCE_OUT_OF_100) or nowhere_to_flee
+
+        def can_retreat():
+            nearest_place_to_flee = self.star_map.nearest_friendly_world_to(fleet)
+            if nearest_place_to_flee is not None:
+                if nearest_place_to_flee.ly_to(fleet.pos) <= DEFAULT_FUEL_RANGE_LY:
+                    return True
+            return False
+
+        def push_battle_results_to_console(loc, fleet_name, attackers_won, defenders_won, attacker_faction, defender_faction, retreat, attackers_losses, defenders_losses, rounds, graph):
+            attacker_name = self.star_map.faction_names[attacker_faction]
+            if not (attacker_faction == FactionType.PLAYER or defender_faction == FactionType.PLAYER):
+                return 
+            defensive_total_victory = defenders_won and not retreat
+            if attackers_won:
+                self.console.push("{} of {} conquered {} (losses: {} atk / {} def, {} rounds)".format(fleet_name, attacker_name, loc.name, attackers_losses, defenders_losses, rounds), graph)
+            elif defensive_total_victory:
+                self.console.push("defenders of {} destroyed {} from {} (losses: {} atk / {} def; {} rounds)".format(loc.name, fleet_name, attacker_name, attackers_losses, defenders_losses, rounds), graph)
+            else:
+                self.console.push("defenders of {} forced {} from {} to retreat (losses: {} atk / {} def; {} rounds)".format(loc.name, fleet_name, attacker_name, attackers_losses, defenders_losses, rounds), graph)
+
+        def effects_of_battle_on_game_state(attackers, defenders, tactical_battle, loc, fleet, retreating, attackers_losses, defenders_losses, rounds, graph):  
+            if loc.ships + fleet.ships > self.biggest_battle:
+                self.biggest_battle = loc.ships + fleet.ships
+            attacker_faction = fleet.faction_type
+            defender_faction = loc.faction_type
+            attacker_name = fleet.name
+            attackers_won = False
+            defenders_won = False
+            retreating = retreating
+            if attackers > 0 >= defenders: 
+                # Attackers won:
+                tactical_battle.winner = attacker_faction
+                loc.faction_type = fleet.faction_type
+                loc.ships = attackers
+                fleet.to_be_removed = True
+                attackers_won = True
+                if attacker_faction == FactionType.PIRATES:
+                    self.all_pirates_destroyed = False
+                if attacker_faction == FactionType.EXOGALACTIC_INVASION:
+                    loc.decimate(self.rng.cosmetic)
+            elif attackers <= 0:
+                # defenders won without a retreat
+                tactical_battle.winner = defender_faction
+                loc.ships = defenders
+                fleet.to_be_removed = True
+                defenders_won = True
+                if defender_faction == FactionType.PIRATES:
+                    self.all_pirates_destroyed = False
+
+            # Handle retreats
+            if retreating: 
+                tactical_battle.winner = defender_faction
+                loc.ships = defenders
+                fleet.ships = attackers
+                retreating_to = self.star_map.nearest_friendly_world_to(fleet)
+                if fleet.faction_type == FactionType.PIRATES:
+                    retreating_to = self.star_map.nearest_vulnerable_world_to(fleet)
+                if retreating_to is None:
+                    fleet.to_be_removed = True
+                else:
+                    fleet.destination = retreating_to
+                    fleet.waypoints = [fleet.destination]
+
+            # Handle output if player involved
+            push_battle_results_to_console(loc, attacker_name, attackers_won, defenders_won, attacker_faction, defender_faction, retreating, attackers_losses, defenders_losses, rounds, graph)
+
+            # Handle player-specific effects                
+            if attacker_faction == FactionType.PLAYER or defender_faction == FactionType.PLAYER:
+                self.player_battle_fought(tactical_battle)
+                if attackers_won and attacker_faction == FactionType.PLAYER:
+                    self.battles_won += 1
+                    self.ships_destroyed += defenders_losses
+                    self.ships_lost += attackers_losses
+                else:
+                    self.battles_lost += 1
+                    self.ships_destroyed += defenders_losses
+                    self.ships_lost += attackers_losses
+
+            fleet.veterancy_out_of_100 = 100
+            loc.veterancy_out_of_100 = 100
+
+        def waypoint_handler(fleet):
+            if fleet.destination in fleet.waypoints:
+                fleet.waypoints.remove(fleet.destination)  
+            if len(fleet.waypoints) > 0:
+                fleet.destination = fleet.waypoints[0]
+                return True
+            return False
+
+        def handle_reenforcement(fleet, loc): 
+            if not waypoint_handler(fleet): 
+                loc.mix_fleet(fleet)
+                fleet.to_be_removed = True
+
+        def handle_combat(fleet, loc):
+            graph = BattleGraph(fleet.ships, loc.ships)
+            # A combat begins
+            attackers = fleet.ships
+            attacker_faction = fleet.faction_type
+            defenders = loc.ships
+            defender_faction = loc.faction_type
+            tactical_battle = TacticalBattle(fleet, loc, attacker_faction, defender_faction, attackers, defenders, self.rng.cosmetic)
+            tactical_battle.battle_number = loc.battles
+            last_stand = is_last_stand(attackers, defenders)
+            if last_stand:
+                tactical_battle.last_stand = True 
+            charge = is_charge(attackers, defenders)
+            if charge:
+                tactical_battle.charge = True
+            if charge and d100(rng=self.rng.combat)[0] <= LAST_STAND_CHANCE_OUT_OF_100:
+                last_stand = True
+                tactical_battle.last_stand = True
+            graph.charge = charge
+            graph.last_stand = last_stand
+            graph.xp_bonuses = {"attacker": fleet.get_veterancy_roll_bonus(), "defender": loc.get_veterancy_roll_bonus()}
+            graph_colors = {"attacker": "red", "defender": "red"}
+            if fleet.faction_type == FactionType.PLAYER:
+                graph_colors["attacker"] = "green"
+            else:
+                graph_colors["defender"] = "green"
+            graph.colors = graph_colors
+            graph.battle_name = "{} battle of {}".format(xthify(loc.battles + 1), loc.name)
+            graph.battle_turn = self.turn
+            # Bonuses which hold for every round
+            tactical_battle.attacker_vet_bonus = fleet.get_veterancy_roll_bonus()
+            tactical_battle.defender_vet_bonus = loc.get_veterancy_roll_bonus()
+            attacker_bonus = tactical_battle.attacker_vet_bonus
+            if charge:
+                attacker_bonus += CHARGE_D20_BONUS
+            defender_bonus = tactical_battle.defender_vet_bonus
+            if last_stand:
+                defender_bonus += LAST_STAND_D20_BONUS
+            # Only battles the player might watch need to keep their dice
+            player_involved = attacker_faction == FactionType.PLAYER or defender_faction == FactionType.PLAYER
+            record = resolve_combat(attackers, defenders, attacker_bonus, defender_bonus, charge, can_retreat, self.rng.combat, player_involved,
+                                    self.combat_numpy is not None)
+            tactical_battle.record = record
+            tactical_battle.retreat = record.retreat
+            graph.record = record
+            attackers = record.attackers()
+            defenders = record.defenders()
+            attackers_losses = record.total_attacker_losses()
+            defenders_losses = record.total_defender_losses()
+            retreating = record.retreat
+            rounds = record.num_rounds() + 1
+
+            # Handle the effects of the battle
+            effects_of_battle_on_game_state(attackers, defenders, tactical_battle, loc, fleet, retreating, attackers_losses, defenders_losses, rounds, graph)
+
+        for fleet in self.star_map.deployed_fleets: 
+            loc = fleet.destination
+            if is_valid_reenforcement(fleet, loc): 
+                handle_reenforcement(fleet, loc)
+            elif is_valid_combat(fleet, loc): 
+                handle_combat(fleet, loc)
+                if loc.faction_type == FactionType.PLAYER or fleet.faction_type == FactionType.PLAYER:
+                    loc.battles += 1
+
+    def remove_fleets(self):
+        hits = False
+        while True:
+            hits = False
+            for fleet in self.star_map.deployed_fleets:
+                if fleet.to_be_removed:
+                    hits = True
+                    self.star_map.remove_fleet(fleet)
+                    break
+            if not hits:
+                break
+
+    def stats_check(self):
+        player_systems = [i for i in filter(lambda x: x.faction_type == FactionType.PLAYER, self.star_map.locations)]
+        player_fleets = [i for i in filter(lambda x: x.faction_type == FactionType.PLAYER, self.star_map.deployed_fleets)]
+        player_ships = sum(map(lambda x: x.ships, player_systems))
+        player_ships += sum(map(lambda x: x.ships, player_fleets))
+        vet_ships = sum(map(lambda y: y.get_num_vets(), filter(lambda x: x.faction_type == FactionType.PLAYER, self.star_map.locations)))
+        vet_ships += sum(map(lambda y: y.get_num_vets(), filter(lambda x: x.faction_type == FactionType.PLAYER, self.star_map.deployed_fleets)))
+        enemy_systems = [i for i in filter(lambda x: x.faction_type != FactionType.PLAYER, self.star_map.locations)]
+        enemy_fleets = [i for i in filter(lambda x: x.faction_type != FactionType.PLAYER, self.star_map.deployed_fleets)]
+        player_ships = sum(map(lambda x: x.ships, player_systems))
+        player_ships += sum(map(lambda x: x.ships, player_fleets))
+        enemy_ships = sum(map(lambda x: x.ships, enemy_systems))
+        enemy_ships += sum(map(lambda x: x.ships, enemy_fleets))
+        self.ships_over_time.append(player_ships)
+        self.systems_over_time.append(len(player_systems))
+        self.veteran_ships_over_time.append(vet_ships)
+        self.enemy_ships_over_time.append(enemy_ships)
+        self.deployed_fleets_over_time.append(len(player_fleets))
+        decimated_systems = [i for i in filter(lambda x: x.decimated, self.star_map.locations)]
+        self.decimated_systems_over_time.append(len(decimated_systems))
+
+    def off_map_pirate_raid_check(self):
+        if self.exogalactic_invasion_begun:
+            return
+        if d100(rng=self.rng.raids)[0] <= OFF_MAP_RAID_CHANCE_OUT_OF_100:  
+            targets = []
+            for system in self.star_map.locations:
+                in_range_x = system.pos[0] < DEFAULT_FUEL_RANGE_LY or system.pos[0] > self.star_map.width_px - DEFAULT_FUEL_RANGE_LY
+                in_range_y = system.pos[1] < DEFAULT_FUEL_RANGE_LY or system.pos[1] > self.star_map.height_px - DEFAULT_FUEL_RANGE_LY
+                if in_range_x or in_range_y:
+                    targets.append(system)
+            target = self.rng.raids.choice(targets)
+            pos = target.pos
+            if target.pos[0] < DEFAULT_FUEL_RANGE_LY:
+                pos = (target.pos[0] - DEFAULT_FUEL_RANGE_LY, target.pos[1])
+            elif target.pos[0] > self.star_map.width_px - DEFAULT_FUEL_RANGE_LY:
+                pos = (target.pos[0] + DEFAULT_FUEL_RANGE_LY, target.pos[1])
+            elif target.pos[1] < DEFAULT_FUEL_RANGE_LY:
+                pos = (target.pos[0], target.pos[1] - DEFAULT_FUEL_RANGE_LY)
+            else:
+                pos = (target.pos[0], target.pos[1] + DEFAULT_FUEL_RANGE_LY)
+            num_ships = self.rng.raids.randint(int(target.ships * .9), int(target.ships * 1.1))
+            if num_ships < 1:
+                num_ships = 1
+            fleet = Fleet(self.star_map.name_a_fleet(FactionType.PIRATES), pos, FactionType.PIRATES, num_ships, target, self.rng.raids.randint(0, 100)) 
+            self.star_map.deployed_fleets.append(fleet)
+
+# Plays out an order log (see order_log.py) headless, up to the end of the log or until the given turn
+# is about to be ended, with that turn's orders given. Returns the engine, the first turn on which the
+# AI's orders didn't match the log (or None), and each turn replayed as (turn, recorded seconds,
+# replayed seconds). With profile_path, every turn replayed is profiled to that CSV file.
+def replay_order_log(path, until=None, profile_path=None):
+    engine = None
+    diverged = None
+    turns = []
+    for line in read_order_log(path):
+        if "start" in line:
+            profiler = None
+            if engine is not None:
+                engine.set_ai_workers(0)
+                profiler = engine.profiler
+            engine = TurnEngine(line["debug_mode"], line["seed"], tuple(line["map_size"]))
+            start_from(engine, line)
+            engine.order_log = OrderLog()
+            if profiler is not None:
+                engine.profiler = profiler
+            elif profile_path is not None:
+                engine.start_profiling(profile_path)
+            continue
+        for order in line["orders"]:
+            apply_order(engine, order)
+        if until is not None and line["turn"] >= until:
+            break
+        engine.advance_turn()
+        replayed = engine.order_log.last_line
+        if diverged is None and replayed["ai"] != line["ai"]:
+            diverged = line["turn"]
+        turns.append((line["turn"], line["seconds"], replayed["seconds"]))
+    return engine, diverged, turns
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Runs Sector 34 turns headless, with the player's empire in watch mode.")
+    parser.add_argument("--turns", type=int, default=1000, help="maximum number of turns to run")
+    parser.add_argument("--debug", action="store_true", help="start the map in debug mode")
+    parser.add_argument("--seed", type=int, default=None, help="seed for the game's random numbers (default: random)")
+    parser.add_argument("--stars", type=int, default=None, help="play on a map with about this many stars (default: the standard map)")
+    parser.add_argument("--ai-workers", type=int, default=0, help="plan the AI factions' turns in this many processes (default: one after another)")
+    parser.add_argument("--load", default=None, help="carry on from a saved game instead of starting a new one")
+    parser.add_argument("--save", default=None, help="save the game to this file once the turns have been run")
+    parser.add_argument("--record", default=None, help="record every order given to this file (see order_log.py)")
+    parser.add_argument("--replay", default=None, help="play out an order log recorded with --record (or by sector34.py) instead")
+    parser.add_argument("--until", type=int, default=None, help="with --replay, stop just before this turn is ended")
+    parser.add_argument("--profile", default=None, help="time every turn phase by phase, and write them to this CSV file")
+    args = parser.parse_args()
+    if args.replay is not None:
+        engine, diverged, turns = replay_order_log(args.replay, args.until, args.profile)
+        engine.set_ai_workers(0)
+        if engine.combat_dice_warning is not None:
+            print(engine.combat_dice_warning)
+        print("seed {}, {} stars, replayed to turn {}".format(engine.rng.seed, engine.star_map.num_stars, engine.turn))
+        print("{} turns in {:.2f}s ({:.1f} turns/sec)".format(len(turns), engine.turn_processing_seconds, engine.turns_per_second()))
+        if diverged is None:
+            print("the AI gave the same orders as in the log on every turn")
+        else:
+            print("the AI's orders first differ from the log on turn {}".format(diverged))
+        print("slowest turns (recorded / replayed):")
+        for turn, recorded, replayed in sorted(turns, key=lambda x: x[1], reverse=True)[:5]:
+            print("  turn {}: {:.1f} ms / {:.1f} ms".format(turn, recorded * 1000, replayed * 1000))
+        if args.save is not None:
+            save_game(engine, args.save)
+        if engine.profiler is not None:
+            print("where the time went:")
+            engine.profiler.print_totals()
+            engine.profiler.close()
+    else:
+        map_size = (MAP_WIDTH_PX, MAP_HEIGHT_PX) if args.stars is None else map_size_for_stars(args.stars)
+        engine = TurnEngine(args.debug, args.seed, map_size)
+        if args.load is not None:
+            load_game(engine, args.load)
+            if engine.combat_dice_warning is not None:
+                print(engine.combat_dice_warning)
+        if args.record is not None:
+            engine.record_orders(OrderLog(args.record))
+        if args.profile is not None:
+            engine.start_profiling(args.profile)
+        engine.set_watch_mode(True)
+        engine.set_ai_workers(args.ai_workers)
+        ran = engine.run(args.turns)
+        engine.set_ai_workers(0)
+        if engine.order_log is not None:
+            engine.order_log.close()
+        print("seed {}, {} stars".format(engine.rng.seed, engine.star_map.num_stars))
+        print("{} turns in {:.2f}s ({:.1f} turns/sec)".format(ran, engine.turn_processing_seconds, engine.turns_per_second()))
+        if args.save is not None:
+            save_game(engine, args.save)
+        if engine.profiler is not None:
+            print("where the time went:")
+            engine.profiler.print_totals()
+            engine.profiler.close()
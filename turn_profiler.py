@@ -0,0 +1,88 @@
+import csv
+from faction_type import FactionType
+
+# Times every turn, phase by phase (see TURN_PHASES in turn_engine.py), along with the pirate systems'
+# routine and each faction's run_behavior() inside the AI phase. Each part is kept as [seconds, calls]:
+# how long it took over the turn and how many times it was run (once for a phase or a faction, and
+# once per pirate system for the pirates). With the AI planned in worker processes (see ai_planner.py)
+# the factions can't be told apart, and only the AI phase as a whole is timed.
+#
+# Every turn can be written out as a row of a CSV file, along with a few numbers about the state of the
+# game at the end of it, so that slow turns can be matched up with what was going on. The last turn is
+# also kept in last_turn for Game's profiler overlay, and running totals in totals.
+
+# The state of the game each row of the CSV file ends with
+PROFILE_STATE_COLUMNS = ["fleets", "ai_fleets_deployed", "player_ships", "enemy_ships", "player_systems"]
+
+def faction_routine(faction_type):
+    return "run_behavior:{}".format(faction_type.name)
+
+# The parts of the AI phase which are timed on their own
+PIRATE_ROUTINE = "pirate_system_routine"
+FACTION_ROUTINES = [faction_routine(i) for i in FactionType if i != FactionType.PIRATES and i != FactionType.NON_SPACEFARING]
+
+# A part's name as reported, indented if it's timed inside the AI phase
+def part_label(part):
+    if part == PIRATE_ROUTINE or part in FACTION_ROUTINES:
+        return "  " + part
+    return part
+
+# Adds seconds and calls to what's been timed for part in timings, as {part: [seconds, calls]}
+def tally(timings, part, seconds, calls):
+    timed = timings.get(part)
+    if timed is None:
+        timings[part] = [seconds, calls]
+    else:
+        timed[0] += seconds
+        timed[1] += calls
+
+class TurnProfiler:
+    # parts is every part which can be timed, in the order they're reported in
+    def __init__(self, parts, path=None):
+        self.parts = parts
+        self.current = {}
+        self.totals = {}
+        self.turns = 0
+        # (turn, seconds, {part: [seconds, calls]}) for the last turn
+        self.last_turn = None
+        self.file = None
+        self.writer = None
+        if path is not None:
+            self.file = open(path, "w", newline="")
+            self.writer = csv.writer(self.file)
+            header = ["turn", "total_ms"]
+            for part in parts:
+                header += ["{}_ms".format(part), "{}_calls".format(part)]
+            self.writer.writerow(header + PROFILE_STATE_COLUMNS)
+
+    def add(self, part, seconds, calls=1):
+        tally(self.current, part, seconds, calls)
+
+    def turn_ended(self, engine, turn, seconds):
+        for part, (part_seconds, calls) in self.current.items():
+            tally(self.totals, part, part_seconds, calls)
+        self.turns += 1
+        self.last_turn = (turn, seconds, self.current)
+        if self.writer is not None:
+            row = [turn, round(seconds * 1000, 3)]
+            for part in self.parts:
+                part_seconds, calls = self.current.get(part, (0, 0))
+                row += [round(part_seconds * 1000, 3), calls]
+            row += [len(engine.star_map.deployed_fleets), len(engine.ai_fleets_deployed), engine.ships_over_time[-1],
+                    engine.enemy_ships_over_time[-1], engine.systems_over_time[-1]]
+            self.writer.writerow(row)
+            self.file.flush()
+        self.current = {}
+
+    # Prints the average time each part took per turn, and how many times it was run in all
+    def print_totals(self):
+        for part in self.parts:
+            if part in self.totals:
+                seconds, calls = self.totals[part]
+                print("  {:<38} {:>9.2f} ms/turn {:>9} calls".format(part_label(part), seconds / self.turns * 1000, calls))
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+            self.writer = None
@@ -1,4 +1,4 @@
-from random import randint
+import random
 
 phonetic_alphabet = [  
     "Atlas",       
@@ -218,30 +218,33 @@ def click_and_drag_rect(start, end):
         rect = (x1, y2, x2 - x1, y1 - y2)
     return rect # Uhh might need rect = None again let's find out
 
+# The dice all roll with the random stream they're given (see rng.py), or
+# the global one if they aren't given one.
+
 # returns a list with a number of d20 results
-def d20(num_dice=1, bonus=0):
-    results = [randint(1, 20) + bonus for _ in range(num_dice)]
+def d20(num_dice=1, bonus=0, rng=random):
+    results = [rng.randint(1, 20) + bonus for _ in range(num_dice)]
     results.sort(reverse=True)
     return results
 
-def coin_flip():
-    return d20()[0] <= 5
+def coin_flip(rng=random):
+    return d20(rng=rng)[0] <= 5
 
 # returns a list with a number of d100 results
-def d100(num_dice=1, bonus=0):
-    results = [randint(1, 100) + bonus for _ in range(num_dice)]
+def d100(num_dice=1, bonus=0, rng=random):
+    results = [rng.randint(1, 100) + bonus for _ in range(num_dice)]
     results.sort(reverse=True)
     return results
 
 
 # returns a list with a number of d1000 results
-def d1000(num_dice=1, bonus=0):
-    results = [randint(1, 1000) + bonus for _ in range(num_dice)]
+def d1000(num_dice=1, bonus=0, rng=random):
+    results = [rng.randint(1, 1000) + bonus for _ in range(num_dice)]
     results.sort(reverse=True)
     return results
 
 # returns a list with a number of d10000 results
-def d10000(num_dice=1, bonus=0):
-    results = [randint(1, 10000) + bonus for _ in range(num_dice)]
+def d10000(num_dice=1, bonus=0, rng=random):
+    results = [rng.randint(1, 10000) + bonus for _ in range(num_dice)]
     results.sort(reverse=True)
     return results